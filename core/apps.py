@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Configurazione delle connessioni al database e della cache (manage.py check [--deploy])
+        from django.core import checks
+
+        from core.checks import (
+            check_cache_configuration,
+            check_database_configuration,
+            report_database_configuration,
+        )
+
+        checks.register(check_database_configuration)
+        checks.register(check_cache_configuration, deploy=True)
+        checks.register(report_database_configuration, deploy=True)
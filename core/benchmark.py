@@ -0,0 +1,295 @@
+"""
+Benchmark di query e latenza per le viste del catalogo.
+
+- generate_catalogue(): catalogo sintetico scalabile. Con scala N vengono creati
+  N artisti; il primo ("in evidenza") ha N album e il suo primo album ha N brani,
+  così liste e pagine di dettaglio crescono con N.
+- run_benchmark(): misura numero di query e tempi (p95) di ogni URL di
+  core/urls.py e music/urls.py per ciascuna scala.
+- check_scaling(): segnala le viste il cui numero di query cresce con N (N+1).
+- compare_with_baseline(): confronta con un baseline JSON salvato in precedenza.
+
+I servizi esterni (MusicBrainz, Bandcamp/YouTube) sono sostituiti da stub, così
+si misura solo il codice dell'applicazione.
+"""
+import random
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from core import urls as core_urls
+from music import urls as music_urls
+from music.models import Album, AlbumDesiderato, Artista, Brano, Job, Stile
+from music.services.album_stats import recompute_all_album_stats
+from music.services.search_index import rebuild_search_index
+from music.services.musicbrainz import ReleaseCandidate, ReleaseDetail, TrackCandidate
+
+BENCHMARK_USERNAME = "benchmark-staff"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+GENERI = ["Rock", "Jazz", "Pop", "Classica", "Elettronica"]
+SUPPORTI = ["CD", "Vinile", "Cassetta"]
+STILI = ["Prog", "Fusion", "Barocco", "Ambient", "Psichedelia"]
+
+# Oggetto da usare per il parametro <pk> di ogni URL con nome
+PK_OBJECT = {
+    "artista_view": "artista",
+    "discografia_artista": "artista",
+    "modifica_artista": "artista",
+    "crea_album": "artista",
+    "api_artista": "artista",
+    "album_view": "album",
+    "modifica_album": "album",
+    "elimina_album": "album",
+    "crea_brano": "album",
+    "importa_brani_album": "album",
+    "api_album": "album",
+    "ascolta_brano": "brano",
+    "modifica_brano": "brano",
+    "elimina_brano": "brano",
+    "api_brano": "brano",
+    "modifica_album_desiderato": "desiderato",
+    "elimina_album_desiderato": "desiderato",
+}
+
+
+def clear_catalogue():
+    Artista.objects.all().delete()
+    Stile.objects.all().delete()
+    # Job accodati dalle viste misurate (es. report PDF) alla scala precedente
+    Job.objects.all().delete()
+
+
+def generate_catalogue(scale, *, albums_per_artist=3, tracks_per_album=8, seed=42):
+    """Crea un catalogo sintetico e restituisce gli oggetti "in evidenza"."""
+    rng = random.Random(seed)
+    stili = Stile.objects.bulk_create(Stile(stile=nome) for nome in STILI)
+
+    artisti = Artista.objects.bulk_create(
+        Artista(nome_artista=f"Artista {idx:05d}", profilo=f"Profilo {idx}")
+        for idx in range(scale)
+    )
+
+    albums = []
+    for idx, artista in enumerate(artisti):
+        count = scale if idx == 0 else albums_per_artist
+        for n in range(count):
+            albums.append(
+                Album(
+                    titolo_album=f"Album {idx:05d}-{n:03d}",
+                    artista_appartenenza=artista,
+                    editore=f"Etichetta {rng.randint(1, 20)}",
+                    genere=rng.choice(GENERI),
+                    supporto=rng.choice(SUPPORTI),
+                    data_rilascio=date(rng.randint(1960, 2020), 1, 1),
+                    costo=rng.randint(5, 40),
+                    closed=rng.random() < 0.5,
+                )
+            )
+    albums = Album.objects.bulk_create(albums)
+    Album.objects.all().refresh_catalogue_order()
+
+    through = Album.stili.through
+    through.objects.bulk_create(
+        through(album_id=album.pk, stile_id=stile.pk)
+        for album in albums
+        for stile in rng.sample(stili, 2)
+    )
+
+    brani = []
+    for idx, album in enumerate(albums):
+        count = scale if idx == 0 else tracks_per_album
+        for n in range(1, count + 1):
+            secondi = rng.randint(90, 600)
+            brani.append(
+                Brano(
+                    titolo_brano=f"Brano {idx:05d}-{n:03d}",
+                    album_appartenenza=album,
+                    sezione="a",
+                    progressivo=str(n),
+                    posizione=n,
+                    durata=f"{secondi // 60}:{secondi % 60:02d}",
+                    durata_secondi=secondi,
+                )
+            )
+    Brano.objects.bulk_create(brani, batch_size=1000)
+    recompute_all_album_stats()
+    # bulk_create non emette segnali: indice della ricerca in blocco
+    rebuild_search_index()
+
+    AlbumDesiderato.objects.bulk_create(
+        AlbumDesiderato(artista=artisti[idx % len(artisti)], titolo_album=f"Desiderato {idx}")
+        for idx in range(scale)
+    )
+
+    featured_album = albums[0]
+    return {
+        "artista": artisti[0],
+        "album": featured_album,
+        "brano": featured_album.brani.order_by("pk").first(),
+        "desiderato": AlbumDesiderato.objects.order_by("pk").first(),
+        "username": BENCHMARK_USERNAME,
+    }
+
+
+def _named_patterns():
+    for module in (core_urls, music_urls):
+        for pattern in module.urlpatterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                yield pattern
+
+
+def collect_urls(objects):
+    """
+    Restituisce ({nome: url}, [nomi non mappati]) per tutti gli URL con nome.
+    """
+    urls = {}
+    unmapped = []
+    for pattern in _named_patterns():
+        kwargs = {}
+        for param in pattern.pattern.converters:
+            if param == "username":
+                kwargs[param] = objects["username"]
+            elif param == "pk" and pattern.name in PK_OBJECT:
+                kwargs[param] = objects[PK_OBJECT[pattern.name]].pk
+            else:
+                unmapped.append(pattern.name)
+                break
+        else:
+            urls[pattern.name] = reverse(pattern.name, kwargs=kwargs or None)
+    return urls, unmapped
+
+
+def _external_stubs():
+    release = ReleaseCandidate("bench-release", "Bench", "2000-01-01", "IT", "Label", 1, 1)
+    track = TrackCandidate("Bench", "a", "1", "3:00", None)
+    return [
+        mock.patch("music.views.search_releases", return_value=[release]),
+        mock.patch("music.views.get_release", return_value=ReleaseDetail(release, None, [track])),
+        mock.patch(
+            "music.views.resolve_listen_url",
+            return_value=("https://www.youtube.com/watch?v=bench", "youtube", True),
+        ),
+    ]
+
+
+def _p95(timings):
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=20, method="inclusive")[18]
+
+
+def measure_url(client, url, repeat):
+    timings = []
+    queries = None
+    status = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - start) * 1000
+        timings.append(elapsed)
+        # Il minimo esclude le query una tantum del primo giro (cache, sessione)
+        count = len(ctx.captured_queries)
+        queries = count if queries is None else min(queries, count)
+        status = response.status_code
+    return {
+        "status": status,
+        "queries": queries,
+        "p95_ms": round(_p95(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+    }
+
+
+def _benchmark_client():
+    user, created = User.objects.get_or_create(
+        username=BENCHMARK_USERNAME,
+        defaults={"is_staff": True},
+    )
+    if created or not user.is_staff:
+        user.is_staff = True
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def run_benchmark(scales, *, repeat=5, albums_per_artist=3, tracks_per_album=8, stdout=None):
+    client = _benchmark_client()
+    report = {"backend": connection.vendor, "repeat": repeat, "scales": {}}
+    for scale in scales:
+        clear_catalogue()
+        objects = generate_catalogue(
+            scale,
+            albums_per_artist=albums_per_artist,
+            tracks_per_album=tracks_per_album,
+        )
+        urls, unmapped = collect_urls(objects)
+        results = {}
+        with ExitStack() as stack:
+            for stub in _external_stubs():
+                stack.enter_context(stub)
+            for name, url in sorted(urls.items()):
+                results[name] = measure_url(client, url, repeat)
+                if stdout is not None:
+                    stdout.write(
+                        f"[N={scale}] {name:<28} {results[name]['queries']:>4} query  "
+                        f"p95 {results[name]['p95_ms']:>9.2f} ms  ({results[name]['status']})"
+                    )
+        report["scales"][str(scale)] = {"results": results, "unmapped": unmapped}
+    clear_catalogue()
+    return report
+
+
+def check_scaling(report):
+    """Segnala gli URL con più query alla scala maggiore che a quella minore."""
+    scales = sorted(report["scales"], key=int)
+    if len(scales) < 2:
+        return []
+    small = report["scales"][scales[0]]["results"]
+    large = report["scales"][scales[-1]]["results"]
+    failures = []
+    for name, result in sorted(large.items()):
+        if name in small and result["queries"] > small[name]["queries"]:
+            failures.append(
+                f"{name}: query crescono con N "
+                f"({small[name]['queries']} con N={scales[0]}, "
+                f"{result['queries']} con N={scales[-1]})"
+            )
+    return failures
+
+
+def compare_with_baseline(report, baseline, *, threshold=0.25, min_delta_ms=2.0):
+    """
+    Confronta con un baseline dello stesso backend: regressione se aumentano le query
+    o se il p95 supera il baseline di oltre threshold (e di almeno min_delta_ms).
+    """
+    if baseline.get("backend") != report["backend"]:
+        return []
+    failures = []
+    for scale, data in report["scales"].items():
+        base_results = (baseline.get("scales", {}).get(scale) or {}).get("results", {})
+        for name, result in sorted(data["results"].items()):
+            base = base_results.get(name)
+            if not base:
+                continue
+            if result["queries"] > base["queries"]:
+                failures.append(
+                    f"{name} (N={scale}): {result['queries']} query, baseline {base['queries']}"
+                )
+            limit = max(base["p95_ms"] * (1 + threshold), base["p95_ms"] + min_delta_ms)
+            if result["p95_ms"] > limit:
+                failures.append(
+                    f"{name} (N={scale}): p95 {result['p95_ms']:.2f} ms, "
+                    f"baseline {base['p95_ms']:.2f} ms"
+                )
+    return failures
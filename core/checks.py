@@ -0,0 +1,165 @@
+"""
+Controlli sulla configurazione delle connessioni al database.
+
+database_configuration() riassume la configurazione effettiva (connessioni
+persistenti, health check, pool psycopg3, processi e thread WSGI o worker e
+richieste concorrenti di uvicorn) e il numero massimo di connessioni che
+l'applicazione può aprire. Lo stesso riepilogo è:
+
+- registrato su "dpteca.database" all'avvio di ogni processo (dpteca/wsgi.py, dpteca/asgi.py);
+- mostrato da ``manage.py check --deploy`` (core.I001);
+- verificato da ``manage.py check``: pool senza psycopg_pool (core.E001), totale
+  oltre DB_MAX_CONNECTIONS (core.W001), processi/thread di mod_wsgi diversi da
+  WSGI_PROCESSES/WSGI_THREADS (core.W002), connessioni persistenti sotto ASGI (core.W003).
+
+check_cache_configuration() avvisa (core.W004) se fuori da DEBUG la cache non è
+condivisa tra i processi: le invalidazioni fatte da worker, comandi di import o da
+un altro processo WSGI non raggiungerebbero gli altri. Solo con ``check --deploy``
+(il test runner gira con DEBUG=False) e nel log di avvio dei processi web.
+"""
+import importlib.util
+import logging
+
+from django.conf import settings
+from django.core import checks
+
+logger = logging.getLogger("dpteca.database")
+
+
+def _mod_wsgi():
+    """Il modulo mod_wsgi se il processo gira dentro Apache, altrimenti None."""
+    try:
+        import mod_wsgi
+    except ImportError:
+        return None
+    # "pip install mod_wsgi" installa un pacchetto omonimo senza i dati del processo
+    return mod_wsgi if hasattr(mod_wsgi, "threads_per_process") else None
+
+
+def database_configuration(db: dict) -> dict:
+    """Configurazione effettiva di una voce di DATABASES."""
+    pool = (db.get("OPTIONS") or {}).get("pool")
+    if pool is True:
+        pool = {}
+    asgi = getattr(settings, "SERVER_INTERFACE", "wsgi") == "asgi"
+    # Sotto uvicorn ogni richiesta concorrente ha il suo thread (e la sua connessione)
+    if asgi:
+        processes, threads = settings.ASGI_WORKERS, settings.ASGI_LIMIT_CONCURRENCY
+    else:
+        processes, threads = settings.WSGI_PROCESSES, settings.WSGI_THREADS
+    # Per processo: con il pool al più max_size connessioni, senza una per thread
+    per_process = (pool.get("max_size") or threads) if pool is not None else threads
+    return {
+        "engine": db["ENGINE"].rsplit(".", 1)[-1],
+        "conn_max_age": db.get("CONN_MAX_AGE", 0),
+        "health_checks": db.get("CONN_HEALTH_CHECKS", False),
+        "pool": pool,
+        "asgi": asgi,
+        "processes": processes,
+        "threads": threads,
+        "max_connections": processes * per_process,
+    }
+
+
+def describe(config: dict) -> str:
+    if config["engine"] != "postgresql":
+        return f"Database {config['engine']}: nessun pool né connessioni persistenti da dimensionare"
+    if config["pool"] is not None:
+        pool = config["pool"]
+        connections = f"pool psycopg3 (min {pool.get('min_size', 4)}, max {pool.get('max_size', 'n/d')}, attesa {pool.get('timeout', 30)}s)"
+    elif config["conn_max_age"] is None:
+        connections = "connessioni persistenti senza scadenza"
+    elif config["conn_max_age"]:
+        connections = f"connessioni persistenti per {config['conn_max_age']}s"
+    else:
+        connections = "una connessione per richiesta"
+    health = "health check attivi" if config["health_checks"] else "health check disattivi"
+    if config["asgi"]:
+        server = f"{config['processes']} worker uvicorn x {config['threads']} richieste concorrenti"
+    else:
+        server = f"{config['processes']} processi x {config['threads']} thread"
+    return (
+        f"Database postgresql: {connections}, {health}; "
+        f"{server}, al più {config['max_connections']} connessioni"
+    )
+
+
+def _problems(config: dict) -> list[checks.CheckMessage]:
+    if config["engine"] != "postgresql":
+        return []
+    messages = []
+    if config["pool"] is not None and importlib.util.find_spec("psycopg_pool") is None:
+        messages.append(
+            checks.Error(
+                "DB_POOL=True ma il pacchetto psycopg_pool non è installato.",
+                hint='Installa "psycopg[pool]" oppure imposta DB_POOL=False.',
+                id="core.E001",
+            )
+        )
+    if config["max_connections"] > settings.DB_MAX_CONNECTIONS:
+        messages.append(
+            checks.Warning(
+                f"L'applicazione può aprire {config['max_connections']} connessioni, "
+                f"oltre DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS}.",
+                hint="Riduci processi/thread di WSGIDaemonProcess (ASGI_WORKERS/ASGI_LIMIT_CONCURRENCY "
+                "con uvicorn), DB_POOL_MAX_SIZE o aumenta max_connections di PostgreSQL.",
+                id="core.W001",
+            )
+        )
+    if config["asgi"] and config["pool"] is None and config["conn_max_age"] != 0:
+        messages.append(
+            checks.Warning(
+                f"Sotto ASGI le connessioni persistenti (CONN_MAX_AGE={config['conn_max_age']}) "
+                "non vengono riusate né chiuse: ogni richiesta ne apre una nuova.",
+                hint="Con uvicorn usa DB_CONN_MAX_AGE=0 oppure DB_POOL=True.",
+                id="core.W003",
+            )
+        )
+    mod_wsgi = _mod_wsgi()
+    if not config["asgi"] and mod_wsgi is not None and (mod_wsgi.maximum_processes, mod_wsgi.threads_per_process) != (
+        config["processes"],
+        config["threads"],
+    ):
+        messages.append(
+            checks.Warning(
+                f"mod_wsgi usa {mod_wsgi.maximum_processes} processi x {mod_wsgi.threads_per_process} "
+                f"thread ma WSGI_PROCESSES={config['processes']}, WSGI_THREADS={config['threads']}.",
+                hint="Allinea WSGI_THREADS/WSGI_PROCESSES a WSGIDaemonProcess.",
+                id="core.W002",
+            )
+        )
+    return messages
+
+
+def check_database_configuration(app_configs=None, **kwargs):
+    return _problems(database_configuration(settings.DATABASES["default"]))
+
+
+def check_cache_configuration(app_configs=None, **kwargs):
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.DEBUG or not backend.endswith(("LocMemCache", "DummyCache")):
+        return []
+    return [
+        checks.Warning(
+            "La cache è in memoria per processo: homepage e conteggi dei filtri restano "
+            "vecchi negli altri processi fino alla scadenza (HOMEPAGE_CACHE_TIMEOUT, "
+            "FACET_CACHE_TIMEOUT) dopo modifiche fatte da run_worker, dai comandi di "
+            "import o da un altro processo.",
+            hint="Imposta CACHE_DIR su una directory scrivibile dall'utente di tutti i processi.",
+            id="core.W004",
+        )
+    ]
+
+
+def report_database_configuration(app_configs=None, **kwargs):
+    config = database_configuration(settings.DATABASES["default"])
+    return [checks.Info(describe(config), id="core.I001")]
+
+
+def log_database_configuration() -> None:
+    """Registra all'avvio la configurazione effettiva e gli eventuali problemi (anche della cache)."""
+    config = database_configuration(settings.DATABASES["default"])
+    logger.info(describe(config))
+    for message in _problems(config) + check_cache_configuration():
+        level = logging.ERROR if message.is_serious() else logging.WARNING
+        logger.log(level, "%s: %s %s", message.id, message.msg, message.hint or "")
@@ -0,0 +1,91 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmark import check_scaling, compare_with_baseline, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Misura numero di query e latenza (p95) delle viste del catalogo su un "
+        "database di test con dati sintetici a più scale e segnala le regressioni"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="10,50",
+            help="Scale del catalogo sintetico separate da virgola (default: 10,50)",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Richieste per URL (default: 5)")
+        parser.add_argument("--albums-per-artist", type=int, default=3)
+        parser.add_argument("--tracks-per-album", type=int, default=8)
+        parser.add_argument(
+            "--baseline",
+            help="File JSON di baseline (default: benchmarks/baseline-<backend>.json)",
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Salva i risultati come nuovo baseline invece di confrontarli",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Aumento relativo del p95 oltre il quale è una regressione (default: 0.25)",
+        )
+        parser.add_argument("--output", help="Scrive il report completo in JSON su questo file")
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted({int(value) for value in options["scales"].split(",") if value.strip()})
+        except ValueError:
+            raise CommandError("--scales deve contenere interi separati da virgola")
+        if not scales or min(scales) < 1:
+            raise CommandError("--scales deve contenere interi positivi")
+
+        # Database di test usa e getta: i dati reali non vengono toccati
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = run_benchmark(
+                scales,
+                repeat=options["repeat"],
+                albums_per_artist=options["albums_per_artist"],
+                tracks_per_album=options["tracks_per_album"],
+                stdout=self.stdout,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+        failures = check_scaling(report)
+        for data in report["scales"].values():
+            failures.extend(f"{name}: URL senza parametri di benchmark" for name in data["unmapped"])
+
+        baseline_path = Path(
+            options["baseline"]
+            or Path(settings.BASE_DIR) / "benchmarks" / f"baseline-{report['backend']}.json"
+        )
+        if options["update_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Baseline salvato in {baseline_path}"))
+        elif baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text())
+            failures.extend(compare_with_baseline(report, baseline, threshold=options["threshold"]))
+        else:
+            self.stdout.write(self.style.WARNING(f"Nessun baseline in {baseline_path}"))
+
+        if failures:
+            raise CommandError("Regressioni rilevate:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Nessuna regressione rilevata"))
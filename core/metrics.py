@@ -0,0 +1,320 @@
+"""
+Registro di metriche in formato testo Prometheus, condiviso tra processi.
+
+Ogni processo (es. i daemon mod_wsgi) accumula gli incrementi in memoria e li
+somma ogni METRICS_FLUSH_INTERVAL secondi in un file SQLite comune
+(METRICS_DB_PATH, journal WAL, upsert atomici): la vista /metrics legge il totale
+di tutti i processi. Gli istogrammi sono salvati come serie _bucket/_sum/_count
+già cumulative, quindi la somma tra processi resta corretta.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+)
+"""
+
+
+def _db_path():
+    return str(
+        getattr(settings, "METRICS_DB_PATH", None)
+        or os.path.join(tempfile.gettempdir(), "dpteca-metrics.sqlite3")
+    )
+
+
+def _labels_key(labels):
+    return json.dumps(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._metrics = {}
+        self._last_flush = time.monotonic()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add(self, name, labels, amount):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            return
+        with self._lock:
+            self._pending[(name, _labels_key(labels))] += amount
+            due = time.monotonic() - self._last_flush >= getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+        if due:
+            self.flush()
+
+    def _connect(self):
+        connection = sqlite3.connect(_db_path(), timeout=5)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_SCHEMA)
+        return connection
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        rows = [(name, labels, value) for (name, labels), value in pending.items()]
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value",
+                        rows,
+                    )
+            finally:
+                connection.close()
+        except sqlite3.Error as exc:
+            # Le metriche non devono mai far fallire una richiesta
+            logger.warning("Scrittura metriche fallita: %s", exc)
+
+    def samples(self):
+        """{nome serie: [(coppie etichette, valore)]} sommati su tutti i processi."""
+        self.flush()
+        result = defaultdict(list)
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute("SELECT name, labels, value FROM metric_samples").fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as exc:
+            logger.warning("Lettura metriche fallita: %s", exc)
+            rows = []
+        for name, labels, value in rows:
+            result[name].append(([tuple(pair) for pair in json.loads(labels)], value))
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM metric_samples")
+        finally:
+            connection.close()
+
+    def render(self):
+        samples = self.samples()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for series, labels, value in metric.collect(samples):
+                lines.append(f"{series}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+atexit.register(REGISTRY.flush)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.registry = registry
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, labels, amount)
+
+    def collect(self, samples):
+        for labels, value in sorted(samples.get(self.name, [])):
+            yield self.name, labels, value
+
+
+class Gauge:
+    """Valore derivato al momento della lettura da una funzione dei campioni."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, compute, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.compute = compute
+        registry.register(self)
+
+    def collect(self, samples):
+        value = self.compute(samples)
+        if value is not None:
+            yield self.name, [], value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.registry = registry
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        # Anche i bucket a zero vengono scritti: ogni serie espone tutti i limiti
+        for bound in self.buckets:
+            self.registry.add(
+                f"{self.name}_bucket",
+                {**labels, "le": _format_value(bound)},
+                1 if value <= bound else 0,
+            )
+        self.registry.add(f"{self.name}_sum", labels, value)
+        self.registry.add(f"{self.name}_count", labels, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self, samples):
+        def bucket_order(item):
+            labels, _value = item
+            rest = [pair for pair in labels if pair[0] != "le"]
+            le = dict(labels).get("le")
+            return rest, float("inf") if le == "+Inf" else float(le)
+
+        for labels, value in sorted(samples.get(f"{self.name}_bucket", []), key=bucket_order):
+            yield f"{self.name}_bucket", labels, value
+        for suffix in ("_sum", "_count"):
+            for labels, value in sorted(samples.get(f"{self.name}{suffix}", [])):
+                yield f"{self.name}{suffix}", labels, value
+
+
+def _listen_cache_hit_ratio(samples):
+    totals = {dict(labels).get("result"): value for labels, value in samples.get("dpteca_listen_cache_total", [])}
+    lookups = sum(totals.values())
+    if not lookups:
+        return None
+    return totals.get("hit", 0) / lookups
+
+
+REQUEST_LATENCY = Histogram(
+    "dpteca_request_duration_seconds",
+    "Durata delle richieste HTTP per nome URL.",
+)
+LISTEN_CACHE = Counter(
+    "dpteca_listen_cache_total",
+    "Risoluzioni dei link di ascolto, servite dalla cache (hit) o cercate online (miss).",
+)
+LISTEN_CACHE_HIT_RATIO = Gauge(
+    "dpteca_listen_cache_hit_ratio",
+    "Quota delle risoluzioni dei link di ascolto servite dalla cache.",
+    _listen_cache_hit_ratio,
+)
+EXTERNAL_HTTP_LATENCY = Histogram(
+    "dpteca_external_http_duration_seconds",
+    "Durata delle chiamate HTTP verso servizi esterni per host.",
+)
+EXTERNAL_HTTP_ERRORS = Counter(
+    "dpteca_external_http_errors_total",
+    "Errori delle chiamate HTTP verso servizi esterni per host e tipo.",
+)
+THROTTLE_WAIT = Histogram(
+    "dpteca_musicbrainz_throttle_wait_seconds",
+    "Attesa imposta dal rate limiter di MusicBrainz.",
+    buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 1.0),
+)
+PDF_BUILD = Histogram(
+    "dpteca_pdf_build_duration_seconds",
+    "Durata della generazione del report PDF.",
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+@contextmanager
+def track_external_request(url):
+    """Misura una chiamata HTTP esterna; le eccezioni vengono contate e rilanciate."""
+    host = urlsplit(url).hostname or "sconosciuto"
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        EXTERNAL_HTTP_ERRORS.inc(host=host, kind=type(exc).__name__)
+        raise
+    finally:
+        EXTERNAL_HTTP_LATENCY.observe(time.perf_counter() - start, host=host)
+
+
+class MetricsMiddleware:
+    """Istogramma di latenza per nome URL; va messo in testa a MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, start)
+        return response
+
+    def _observe(self, request, start):
+        match = getattr(request, "resolver_match", None)
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            view=(match.view_name if match else None) or "non_risolto",
+            method=request.method,
+        )
@@ -0,0 +1,240 @@
+"""
+Strumentazione per richiesta: tempo totale, query SQL (numero, tempo, duplicati,
+query lente) e tempo di rendering dei template.
+
+I dati vengono scritti come JSON sul logger ``dpteca.profiling`` ed esposti
+nell'header ``Server-Timing`` solo agli utenti staff (a tutti con
+PROFILING_SERVER_TIMING, ad esempio in sviluppo). Gli utenti staff possono aggiungere ``?_profile=1``
+all'URL per ottenere il profilo della richiesta (pyinstrument se installato,
+altrimenti cProfile) al posto della pagina; il profilo è disponibile solo sotto WSGI.
+"""
+import cProfile
+import hashlib
+import io
+import json
+import logging
+import pstats
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger("dpteca.profiling")
+
+_current_stats = ContextVar("dpteca_request_stats", default=None)
+
+# Letterali e liste IN: due query che differiscono solo per i valori sono la stessa query
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACES_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    normalized = _STRING_RE.sub("?", sql)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    normalized = _SPACES_RE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+class RequestStats:
+    def __init__(self, slow_query_ms):
+        self.slow_query_ms = slow_query_ms
+        self.query_count = 0
+        self.query_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+        self.samples = {}
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wrapper per connection.execute_wrapper()."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record_query(sql, (time.perf_counter() - start) * 1000)
+
+    def record_query(self, sql, elapsed_ms):
+        self.query_count += 1
+        self.query_ms += elapsed_ms
+        key, normalized = fingerprint(sql)
+        self.fingerprints[key] += 1
+        self.samples.setdefault(key, normalized)
+        if elapsed_ms >= self.slow_query_ms:
+            self.slow_queries.append({"ms": round(elapsed_ms, 2), "sql": normalized[:500]})
+
+    def duplicates(self):
+        return [
+            {"fingerprint": key, "count": count, "sql": self.samples[key][:300]}
+            for key, count in self.fingerprints.most_common()
+            if count > 1
+        ]
+
+
+def _install_template_timer():
+    """Misura Template.render del backend Django quando è attiva una richiesta profilata."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "_dpteca_timed", False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        stats = _current_stats.get()
+        if stats is None:
+            return original(self, context, request)
+        # render_to_string annidati (tag, include) non vanno contati due volte
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            stats.template_depth -= 1
+            if stats.template_depth == 0:
+                stats.template_ms += (time.perf_counter() - start) * 1000
+
+    render._dpteca_timed = True
+    Template.render = render
+
+
+def _is_staff(user):
+    return user is not None and user.is_authenticated and user.is_staff
+
+
+def _profile_response(get_response, request):
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            get_response(request)
+        finally:
+            profiler.stop()
+        return HttpResponse(profiler.output_html())
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        get_response(request)
+    finally:
+        profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(60)
+    return HttpResponse(output.getvalue(), content_type="text/plain; charset=utf-8")
+
+
+class RequestProfilingMiddleware:
+    """
+    Va inserito dopo AuthenticationMiddleware (serve request.user per ?_profile=1).
+    Si disattiva con REQUEST_PROFILING = False. Funziona sia sotto WSGI sia sotto
+    ASGI, così le viste asincrone non vengono riportate in un thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "REQUEST_PROFILING", True)
+        self.slow_request_ms = getattr(settings, "PROFILING_SLOW_REQUEST_MS", 500)
+        self.slow_query_ms = getattr(settings, "PROFILING_SLOW_QUERY_MS", 100)
+        self.duplicate_threshold = getattr(settings, "PROFILING_DUPLICATE_THRESHOLD", 5)
+        self.server_timing = getattr(settings, "PROFILING_SERVER_TIMING", False)
+        if self.enabled:
+            _install_template_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = RequestStats(self.slow_query_ms)
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with self._sql_wrappers(stats):
+                if self._wants_profile(request):
+                    response = _profile_response(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        timing = self.server_timing or _is_staff(getattr(request, "user", None))
+        return self._finish(request, response, stats, start, timing)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = RequestStats(self.slow_query_ms)
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        # Django tiene una connessione per thread: l'ORM (e le viste sincrone) girano
+        # nel thread di sync_to_async della richiesta, quindi i wrapper vanno
+        # installati lì e non sulla connessione del thread dell'event loop
+        wrappers = await sync_to_async(self._sql_wrappers, thread_sensitive=True)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close, thread_sensitive=True)()
+            _current_stats.reset(token)
+        timing = self.server_timing or (hasattr(request, "auser") and _is_staff(await request.auser()))
+        return self._finish(request, response, stats, start, timing)
+
+    def _sql_wrappers(self, stats):
+        """Installa i wrapper sulle connessioni del thread corrente."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        return stack
+
+    def _finish(self, request, response, stats, start, timing):
+        total_ms = (time.perf_counter() - start) * 1000
+        self._log(request, response, stats, total_ms)
+        # Tempi e numero di query rivelano dettagli interni: non ai visitatori anonimi
+        if timing:
+            response["Server-Timing"] = (
+                f"app;dur={total_ms:.1f}, "
+                f'db;dur={stats.query_ms:.1f};desc="{stats.query_count} query", '
+                f"tpl;dur={stats.template_ms:.1f}"
+            )
+        return response
+
+    def _wants_profile(self, request):
+        return request.GET.get("_profile") == "1" and _is_staff(getattr(request, "user", None))
+
+    def _log(self, request, response, stats, total_ms):
+        match = getattr(request, "resolver_match", None)
+        duplicates = stats.duplicates()
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "sql_count": stats.query_count,
+            "sql_ms": round(stats.query_ms, 2),
+            "template_ms": round(stats.template_ms, 2),
+            "duplicates": duplicates,
+            "slow_queries": stats.slow_queries,
+        }
+        # Molte ripetizioni della stessa query sono il segno tipico di un N+1
+        n_plus_one = any(item["count"] >= self.duplicate_threshold for item in duplicates)
+        slow = total_ms >= self.slow_request_ms or stats.slow_queries or n_plus_one
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
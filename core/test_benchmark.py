@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from core.benchmark import (
+    check_scaling,
+    collect_urls,
+    compare_with_baseline,
+    generate_catalogue,
+    run_benchmark,
+)
+
+
+class BenchmarkTestCase(TestCase):
+    """Le viste del catalogo devono eseguire un numero di query indipendente da N"""
+
+    def test_query_counts_do_not_grow_with_catalogue_size(self):
+        report = run_benchmark([2, 6], repeat=2, albums_per_artist=2, tracks_per_album=2)
+        self.assertEqual(check_scaling(report), [])
+        for data in report["scales"].values():
+            for name, result in data["results"].items():
+                self.assertLess(result["status"], 500, name)
+
+    def test_every_url_has_benchmark_parameters(self):
+        objects = generate_catalogue(2, albums_per_artist=1, tracks_per_album=1)
+        urls, unmapped = collect_urls(objects)
+        self.assertEqual(unmapped, [])
+        self.assertIn("album_list", urls)
+
+    def test_compare_with_baseline_flags_regressions(self):
+        baseline = {
+            "backend": "sqlite",
+            "scales": {"10": {"results": {"album_list": {"queries": 3, "p95_ms": 10.0}}}},
+        }
+        report = {
+            "backend": "sqlite",
+            "scales": {"10": {"results": {"album_list": {"queries": 4, "p95_ms": 20.0}}}},
+        }
+        self.assertEqual(len(compare_with_baseline(report, baseline)), 2)
+        report["backend"] = "postgresql"
+        self.assertEqual(compare_with_baseline(report, baseline), [])
@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core import checks
+
+POSTGRES = {
+    "ENGINE": "django.db.backends.postgresql",
+    "CONN_MAX_AGE": 60,
+    "CONN_HEALTH_CHECKS": True,
+}
+
+
+@override_settings(WSGI_PROCESSES=2, WSGI_THREADS=15, DB_MAX_CONNECTIONS=90)
+class DatabaseConfigurationTestCase(SimpleTestCase):
+    def test_persistent_connections_are_sized_per_thread(self):
+        config = checks.database_configuration(POSTGRES)
+        self.assertEqual(config["max_connections"], 30)
+        self.assertEqual(
+            checks.describe(config),
+            "Database postgresql: connessioni persistenti per 60s, health check attivi; "
+            "2 processi x 15 thread, al più 30 connessioni",
+        )
+        self.assertEqual(checks._problems(config), [])
+
+    def test_pool_limits_connections_and_requires_psycopg_pool(self):
+        db = dict(POSTGRES, CONN_MAX_AGE=0, OPTIONS={"pool": {"min_size": 2, "max_size": 5, "timeout": 10}})
+        config = checks.database_configuration(db)
+        self.assertEqual(config["max_connections"], 10)
+        self.assertIn("pool psycopg3 (min 2, max 5, attesa 10s)", checks.describe(config))
+        with mock.patch("importlib.util.find_spec", return_value=None):
+            self.assertEqual([message.id for message in checks._problems(config)], ["core.E001"])
+
+    @override_settings(WSGI_PROCESSES=8)
+    def test_warns_when_total_exceeds_server_limit(self):
+        config = checks.database_configuration(POSTGRES)
+        self.assertEqual([message.id for message in checks._problems(config)], ["core.W001"])
+
+    def test_warns_when_mod_wsgi_differs_from_settings(self):
+        mod_wsgi = mock.Mock(maximum_processes=2, threads_per_process=25)
+        with mock.patch.object(checks, "_mod_wsgi", return_value=mod_wsgi):
+            problems = checks._problems(checks.database_configuration(POSTGRES))
+        self.assertEqual([message.id for message in problems], ["core.W002"])
+
+    @override_settings(SERVER_INTERFACE="asgi", ASGI_WORKERS=2, ASGI_LIMIT_CONCURRENCY=20)
+    def test_asgi_is_sized_per_concurrent_request_without_persistent_connections(self):
+        config = checks.database_configuration(POSTGRES)
+        self.assertEqual(config["max_connections"], 40)
+        self.assertIn("2 worker uvicorn x 20 richieste concorrenti", checks.describe(config))
+        self.assertEqual([message.id for message in checks._problems(config)], ["core.W003"])
+
+        config = checks.database_configuration(dict(POSTGRES, CONN_MAX_AGE=0))
+        self.assertEqual(checks._problems(config), [])
+        pool = dict(POSTGRES, OPTIONS={"pool": {"max_size": 5}})
+        with mock.patch("importlib.util.find_spec", return_value=object()):
+            self.assertEqual(checks._problems(checks.database_configuration(pool)), [])
+
+    def test_sqlite_has_nothing_to_size(self):
+        config = checks.database_configuration({"ENGINE": "django.db.backends.sqlite3"})
+        self.assertEqual(checks._problems(config), [])
+        self.assertIn("Database sqlite3", checks.describe(config))
+
+    def test_startup_logs_effective_configuration(self):
+        with self.assertLogs("dpteca.database", "INFO") as logs:
+            checks.log_database_configuration()
+        self.assertIn("Database ", logs.output[0])
+
+
+class CacheConfigurationTestCase(SimpleTestCase):
+    LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    FILE = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp/x"}}
+
+    def test_warns_about_per_process_cache_outside_debug(self):
+        with override_settings(DEBUG=False, CACHES=self.LOCMEM):
+            self.assertEqual([message.id for message in checks.check_cache_configuration()], ["core.W004"])
+        with override_settings(DEBUG=True, CACHES=self.LOCMEM):
+            self.assertEqual(checks.check_cache_configuration(), [])
+        with override_settings(DEBUG=False, CACHES=self.FILE):
+            self.assertEqual(checks.check_cache_configuration(), [])
+
+    @override_settings(DEBUG=False, CACHES=LOCMEM)
+    def test_startup_log_reports_per_process_cache(self):
+        with self.assertLogs("dpteca.database", "WARNING") as logs:
+            checks.log_database_configuration()
+        self.assertIn("core.W004", logs.output[-1])
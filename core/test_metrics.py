@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import (
+    REGISTRY,
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    track_external_request,
+)
+from music.models import Album, Artista, Brano
+from music.services.listening import resolve_listen_url
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        override = override_settings(
+            METRICS_DB_PATH=os.path.join(self.tmpdir, "metrics.sqlite3"),
+            METRICS_FLUSH_INTERVAL=0,
+            METRICS_TOKEN="segreto",
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        REGISTRY.reset()
+
+    def test_registries_in_different_processes_are_summed(self):
+        # Due registri con le stesse metriche simulano due processi mod_wsgi
+        first, second = MetricsRegistry(), MetricsRegistry()
+        counters = [Counter("test_eventi_total", "Eventi.", registry=r) for r in (first, second)]
+        histograms = [Histogram("test_durata_seconds", "Durata.", buckets=(1.0,), registry=r) for r in (first, second)]
+        counters[0].inc(kind="a")
+        counters[1].inc(2, kind="a")
+        histograms[0].observe(0.5)
+        histograms[1].observe(3)
+
+        text = first.render()
+        self.assertIn('test_eventi_total{kind="a"} 3', text)
+        self.assertIn('test_durata_seconds_bucket{le="1"} 1', text)
+        self.assertIn('test_durata_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("test_durata_seconds_count 2", text)
+        self.assertIn("test_durata_seconds_sum 3.5", text)
+
+    def test_external_request_errors_are_counted(self):
+        with self.assertRaises(ValueError):
+            with track_external_request("https://musicbrainz.org/ws/2/release"):
+                raise ValueError("boom")
+        text = REGISTRY.render()
+        self.assertIn(
+            'dpteca_external_http_errors_total{host="musicbrainz.org",kind="ValueError"} 1',
+            text,
+        )
+        self.assertIn('dpteca_external_http_duration_seconds_count{host="musicbrainz.org"} 1', text)
+
+    def test_listen_cache_hit_ratio(self):
+        artista = Artista.objects.create(nome_artista="Pink Floyd")
+        album = Album.objects.create(titolo_album="Animals", artista_appartenenza=artista)
+        brano = Brano.objects.create(
+            titolo_brano="Dogs",
+            album_appartenenza=album,
+            ascolto_url="https://www.youtube.com/watch?v=abc",
+            ascolto_fonte=Brano.ASCOLTO_FONTE_YOUTUBE,
+        )
+        resolve_listen_url(brano)
+        text = REGISTRY.render()
+        self.assertIn('dpteca_listen_cache_total{result="hit"} 1', text)
+        self.assertIn("dpteca_listen_cache_hit_ratio 1", text)
+
+    def test_metrics_view_requires_staff_or_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer segreto")
+        self.assertEqual(response.status_code, 200)
+        # La richiesta precedente è già nell'istogramma di latenza
+        self.assertIn('dpteca_request_duration_seconds_count{method="GET",view="metrics"}', response.content.decode())
+
+        User.objects.create_user(username="staff", password="pwd", is_staff=True)
+        self.client.login(username="staff", password="pwd")
+        self.assertEqual(self.client.get(url).status_code, 200)
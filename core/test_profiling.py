@@ -0,0 +1,78 @@
+import json
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from core.middleware import fingerprint
+from music.models import Album, Artista
+
+
+async def _conteggi(request):
+    artisti = await Artista.objects.acount()
+    album = await Album.objects.acount()
+    return HttpResponse(f"{artisti} {album}")
+
+
+urlpatterns = [path("conteggi/", _conteggi)]
+
+
+class RequestProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        artista = Artista.objects.create(nome_artista="Pink Floyd")
+        Album.objects.create(titolo_album="Animals", artista_appartenenza=artista)
+        self.staff = User.objects.create_user(username="staff", password="pwd", is_staff=True)
+
+    def _record(self, logs):
+        return json.loads(logs.records[-1].getMessage())
+
+    def test_server_timing_header_only_for_staff(self):
+        response = self.client.get(reverse("album_list"))
+        self.assertNotIn("Server-Timing", response)
+
+        self.client.login(username="staff", password="pwd")
+        response = self.client.get(reverse("album_list"))
+        header = response["Server-Timing"]
+        self.assertIn("app;dur=", header)
+        self.assertIn("db;dur=", header)
+        self.assertIn("tpl;dur=", header)
+
+    @override_settings(PROFILING_SERVER_TIMING=True)
+    def test_server_timing_for_everyone_when_enabled(self):
+        self.assertIn("Server-Timing", self.client.get(reverse("album_list")))
+
+    def test_logs_structured_record(self):
+        with self.assertLogs("dpteca.profiling", level="INFO") as logs:
+            self.client.get(reverse("album_list"))
+        record = self._record(logs)
+        self.assertEqual(record["view"], "album_list")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["sql_count"], 0)
+        self.assertGreater(record["template_ms"], 0)
+
+    @override_settings(ROOT_URLCONF="core.test_profiling")
+    async def test_async_view_queries_are_counted(self):
+        # Sotto ASGI le query girano nel thread di sync_to_async, non nell'event loop
+        with self.assertLogs("dpteca.profiling", level="INFO") as logs:
+            response = await self.async_client.get("/conteggi/")
+        self.assertEqual(response.content, b"1 1")
+        self.assertEqual(self._record(logs)["sql_count"], 2)
+
+    def test_fingerprint_ignores_literals(self):
+        first, _ = fingerprint("SELECT * FROM album WHERE id = 1 AND titolo = 'A'")
+        second, _ = fingerprint("SELECT * FROM album WHERE id = 42 AND titolo = 'B'")
+        self.assertEqual(first, second)
+        self.assertEqual(
+            fingerprint("SELECT 1 WHERE id IN (%s, %s)")[0],
+            fingerprint("SELECT 1 WHERE id IN (%s)")[0],
+        )
+
+    def test_profile_only_for_staff(self):
+        response = self.client.get(reverse("album_list"), {"_profile": "1"})
+        self.assertIn("Animals", response.content.decode())
+
+        self.client.login(username="staff", password="pwd")
+        response = self.client.get(reverse("album_list"), {"_profile": "1"})
+        self.assertNotIn("Animals", response.content.decode())
+        self.assertIn("Server-Timing", response)
@@ -1,7 +1,15 @@
-from django.test import TestCase, Client
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from PIL import Image
 from music.models import Artista, Album, Brano
 from datetime import date
+from importlib import import_module
 
 
 class SearchFunctionalityTestCase(TestCase):
@@ -68,78 +76,84 @@ class SearchFunctionalityTestCase(TestCase):
         )
         
         self.client = Client()
+
+    def _count(self, response, tipo):
+        return response.context['results']['conteggi'][tipo]
+
+    def _results(self, response, tipo):
+        return [d.titolo for d in response.context['documenti'] if d.tipo == tipo]
     
     def test_search_artist_by_name(self):
         """Test ricerca artista per nome"""
         response = self.client.get(reverse('search'), {'q': 'Pink Floyd'})
         self.assertEqual(response.status_code, 200)
         self.assertIn('results', response.context)
-        self.assertEqual(response.context['results']['artisti'].count(), 1)
-        self.assertEqual(response.context['results']['artisti'][0].nome_artista, 'Pink Floyd')
+        self.assertEqual(self._count(response, 'artista'), 1)
+        self.assertEqual(self._results(response, 'artista')[0], 'Pink Floyd')
     
     def test_search_artist_by_profile(self):
         """Test ricerca artista per profilo"""
         response = self.client.get(reverse('search'), {'q': 'Liverpool'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['artisti'].count(), 1)
-        self.assertEqual(response.context['results']['artisti'][0].nome_artista, 'The Beatles')
+        self.assertEqual(self._count(response, 'artista'), 1)
+        self.assertEqual(self._results(response, 'artista')[0], 'The Beatles')
     
     def test_search_artist_by_members(self):
         """Test ricerca artista per componenti"""
         response = self.client.get(reverse('search'), {'q': 'Gilmour'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['artisti'].count(), 1)
-        self.assertEqual(response.context['results']['artisti'][0].nome_artista, 'Pink Floyd')
+        self.assertEqual(self._count(response, 'artista'), 1)
+        self.assertEqual(self._results(response, 'artista')[0], 'Pink Floyd')
     
     def test_search_album_by_title(self):
         """Test ricerca album per titolo"""
         response = self.client.get(reverse('search'), {'q': 'Abbey Road'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['album'].count(), 1)
-        self.assertEqual(response.context['results']['album'][0].titolo_album, 'Abbey Road')
+        self.assertEqual(self._count(response, 'album'), 1)
+        self.assertEqual(self._results(response, 'album')[0], 'Abbey Road')
     
     def test_search_album_by_artist_name(self):
         """Test ricerca album per nome artista"""
         response = self.client.get(reverse('search'), {'q': 'Beatles'})
         self.assertEqual(response.status_code, 200)
         # Trova sia l'artista che l'album
-        self.assertGreaterEqual(response.context['results']['album'].count(), 1)
-        self.assertIn('Abbey Road', [a.titolo_album for a in response.context['results']['album']])
+        self.assertGreaterEqual(self._count(response, 'album'), 1)
+        self.assertIn('Abbey Road', self._results(response, 'album'))
     
     def test_search_album_by_label(self):
         """Test ricerca album per etichetta"""
         response = self.client.get(reverse('search'), {'q': 'Harvest'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['album'].count(), 1)
-        self.assertEqual(response.context['results']['album'][0].titolo_album, 'The Dark Side Of The Moon')
+        self.assertEqual(self._count(response, 'album'), 1)
+        self.assertEqual(self._results(response, 'album')[0], 'The Dark Side Of The Moon')
     
     def test_search_album_by_genre(self):
         """Test ricerca album per genere"""
         response = self.client.get(reverse('search'), {'q': 'Prog'})
         self.assertEqual(response.status_code, 200)
-        self.assertGreaterEqual(response.context['results']['album'].count(), 1)
+        self.assertGreaterEqual(self._count(response, 'album'), 1)
     
     def test_search_track_by_title(self):
         """Test ricerca brano per titolo"""
         response = self.client.get(reverse('search'), {'q': 'Money'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['brani'].count(), 1)
-        self.assertEqual(response.context['results']['brani'][0].titolo_brano, 'Money')
+        self.assertEqual(self._count(response, 'brano'), 1)
+        self.assertEqual(self._results(response, 'brano')[0], 'Money')
     
     def test_search_track_by_credits(self):
         """Test ricerca brano per crediti"""
         response = self.client.get(reverse('search'), {'q': 'Lennon-McCartney'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['brani'].count(), 1)
-        self.assertEqual(response.context['results']['brani'][0].titolo_brano, 'Come Together')
+        self.assertEqual(self._count(response, 'brano'), 1)
+        self.assertEqual(self._results(response, 'brano')[0], 'Come Together')
     
     def test_search_multiple_results(self):
         """Test ricerca che trova risultati multipli"""
         response = self.client.get(reverse('search'), {'q': 'Waters'})
         self.assertEqual(response.status_code, 200)
         # Trova l'artista (nei componenti) e i brani (nei crediti)
-        self.assertGreaterEqual(response.context['results']['artisti'].count(), 1)
-        self.assertGreaterEqual(response.context['results']['brani'].count(), 1)
+        self.assertGreaterEqual(self._count(response, 'artista'), 1)
+        self.assertGreaterEqual(self._count(response, 'brano'), 1)
     
     def test_search_case_insensitive(self):
         """Test che la ricerca sia case-insensitive"""
@@ -147,33 +161,33 @@ class SearchFunctionalityTestCase(TestCase):
         response2 = self.client.get(reverse('search'), {'q': 'PINK FLOYD'})
         response3 = self.client.get(reverse('search'), {'q': 'Pink Floyd'})
         
-        self.assertEqual(response1.context['results']['artisti'].count(), 
-                        response2.context['results']['artisti'].count())
-        self.assertEqual(response2.context['results']['artisti'].count(), 
-                        response3.context['results']['artisti'].count())
+        self.assertEqual(self._count(response1, 'artista'), 
+                        self._count(response2, 'artista'))
+        self.assertEqual(self._count(response2, 'artista'), 
+                        self._count(response3, 'artista'))
     
     def test_search_no_results(self):
         """Test ricerca senza risultati"""
         response = self.client.get(reverse('search'), {'q': 'xyz123notfound'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['results']['artisti'].count(), 0)
-        self.assertEqual(response.context['results']['album'].count(), 0)
-        self.assertEqual(response.context['results']['brani'].count(), 0)
+        self.assertEqual(self._count(response, 'artista'), 0)
+        self.assertEqual(self._count(response, 'album'), 0)
+        self.assertEqual(self._count(response, 'brano'), 0)
         self.assertContains(response, 'Nessun risultato trovato')
     
     def test_search_empty_query(self):
         """Test ricerca con query vuota"""
         response = self.client.get(reverse('search'), {'q': ''})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.context['results']['artisti']), 0)
-        self.assertEqual(len(response.context['results']['album']), 0)
+        self.assertEqual(self._count(response, 'artista'), 0)
+        self.assertEqual(self._count(response, 'album'), 0)
     
     def test_search_partial_match(self):
         """Test ricerca con corrispondenza parziale"""
         response = self.client.get(reverse('search'), {'q': 'Pink'})
         self.assertEqual(response.status_code, 200)
-        self.assertGreaterEqual(response.context['results']['artisti'].count(), 1)
-        self.assertEqual(response.context['results']['artisti'][0].nome_artista, 'Pink Floyd')
+        self.assertGreaterEqual(self._count(response, 'artista'), 1)
+        self.assertEqual(self._results(response, 'artista')[0], 'Pink Floyd')
     
     def test_search_results_display(self):
         """Test che i risultati siano visualizzati correttamente"""
@@ -188,3 +202,108 @@ class SearchFunctionalityTestCase(TestCase):
         # Verifica che ci sia un link all'album
         self.assertContains(response, 'The Dark Side Of The Moon')
         self.assertContains(response, 'Vai all\'Album')
+
+    def test_search_results_in_two_queries(self):
+        """Conteggi per tipo e pagina dei risultati: due query, senza join né N+1"""
+        for n in range(40):
+            Brano.objects.create(titolo_brano=f'Waters {n}', album_appartenenza=self.dark_side)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('search'), {'q': 'Waters'})
+        self.assertEqual(self._count(response, 'brano'), 42)
+        self.assertEqual(len(response.context['documenti']), 30)
+        self.assertTrue(response.context['is_paginated'])
+        # Prima gli artisti, poi gli album, poi i brani
+        self.assertEqual(response.context['documenti'][0].tipo, 'artista')
+
+        response = self.client.get(reverse('search'), {'q': 'Waters', 'tipo': 'artista'})
+        self.assertEqual([d.titolo for d in response.context['documenti']], ['Pink Floyd'])
+
+    def test_search_index_follows_changes(self):
+        """I segnali aggiornano l'indice a modifiche e cancellazioni"""
+        self.pink_floyd.nome_artista = 'The Pink Floyd Sound'
+        self.pink_floyd.save()
+        response = self.client.get(reverse('search'), {'q': 'Sound'})
+        self.assertEqual(self._results(response, 'artista'), ['The Pink Floyd Sound'])
+        self.assertEqual(self._results(response, 'album'), ['The Dark Side Of The Moon'])
+        # Il nome dell'artista mostrato accanto ai brani è stato aggiornato
+        response = self.client.get(reverse('search'), {'q': 'Money'})
+        self.assertEqual(response.context['documenti'][0].artista_nome, 'The Pink Floyd Sound')
+
+        self.brano1.delete()
+        response = self.client.get(reverse('search'), {'q': 'Money'})
+        self.assertEqual(self._count(response, 'brano'), 0)
+
+        self.beatles.delete()
+        response = self.client.get(reverse('search'), {'q': 'Abbey'})
+        self.assertEqual(self._count(response, 'album'), 0)
+
+    def test_migration_builds_the_same_index(self):
+        """La copia nella migrazione 0012 produce gli stessi documenti del servizio"""
+        from django.apps import apps
+        from music.models import SearchDocument
+
+        migration = import_module('music.migrations.0012_search_document')
+        fields = ('tipo', 'oggetto_id', 'ordine_tipo', 'titolo', 'artista_nome', 'album_titolo',
+                  'anno', 'crediti', 'durata', 'copertina', 'testo', 'artista_id', 'album_id')
+        atteso = sorted(SearchDocument.objects.values_list(*fields))
+        SearchDocument.objects.all().delete()
+        migration.populate_search_documents(apps, None)
+        self.assertEqual(sorted(SearchDocument.objects.values_list(*fields)), atteso)
+
+
+class HomepageTestCase(TestCase):
+    """Test per la griglia artisti della homepage (indice alfabetico e cache)"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        Artista.objects.bulk_create(Artista(nome_artista=f'Artista {n:02d}') for n in range(30))
+        self.beatles = Artista.objects.create(nome_artista='Beatles')
+        Artista.objects.create(nome_artista='10cc')
+
+    def test_alphabetic_index_and_pagination_per_letter(self):
+        response = self.client.get(reverse('homepage'))
+        self.assertContains(response, 'href="?lettera=B"')
+        self.assertContains(response, 'href="?lettera=%23"')
+        # Senza lettera: la prima dell'indice, 24 artisti per pagina
+        self.assertContains(response, 'Artista 23')
+        self.assertNotContains(response, 'Artista 24')
+        self.assertNotContains(response, 'Beatles</strong>')
+        self.assertContains(response, 'Pagina 1 di 2')
+
+        response = self.client.get(reverse('homepage'), {'lettera': 'a', 'page': 2})
+        self.assertContains(response, 'Artista 29')
+        self.assertNotContains(response, 'Artista 23')
+
+        response = self.client.get(reverse('homepage'), {'lettera': '#'})
+        self.assertContains(response, '10cc')
+        self.assertNotContains(response, 'Artista 00')
+
+    def test_grid_is_cached_until_an_artist_changes(self):
+        self.client.get(reverse('homepage'), {'lettera': 'B'})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('homepage'), {'lettera': 'B'})
+        self.assertContains(response, 'Beatles')
+
+        self.beatles.nome_artista = 'Byrds'
+        self.beatles.save()
+        response = self.client.get(reverse('homepage'), {'lettera': 'B'})
+        self.assertContains(response, 'Byrds')
+        self.assertNotContains(response, 'Beatles')
+
+    def test_photos_are_lazy_thumbnails(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (800, 600), (255, 0, 0, 128)).save(buffer, format='PNG')
+        self.beatles.foto_artista = SimpleUploadedFile('beatles.png', buffer.getvalue())
+        self.beatles.save()
+
+        response = self.client.get(reverse('homepage'), {'lettera': 'B'})
+        self.assertContains(response, 'src="/media/miniature/160/beatles.jpg"')
+        self.assertContains(response, 'loading="lazy"')
+        with Image.open(f'{self.media}/miniature/160/beatles.jpg') as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 120))
@@ -8,4 +8,5 @@ urlpatterns = [
     path('users/', views.UserList.as_view(), name="user_list"),
     path('user/<str:username>/', views.user_profile_view, name="user_profile"),
     path('search/', views.SearchView.as_view(), name="search"),
+    path('metrics', views.metrics_view, name="metrics"),
 ]
@@ -1,56 +1,125 @@
+import hmac
+import logging
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.views.generic.base import TemplateView
 from django.views.generic.list import ListView
-from django.db.models import Q, Case, When, IntegerField
+from django.db import DatabaseError
+from django.db.models import Count, Q
+from django.db.models.functions import Substr, Upper
+
+from music.models import Artista, Album, SearchDocument
+from music.services import facets, search_index
+from music.services.cache_generation import get_generation
+from music.services.thumbnails import thumbnail_url
+
+from .metrics import REGISTRY
 
-from music.models import Artista, Album, Brano
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
-"""
-    utilizzando queryset anzichè model (di ListView ) sarà possibile utilizzare filtri pittosto che ordinamenti
-"""
-class HomeView(ListView):
+# Artisti per pagina della griglia in homepage (per lettera)
+HOMEPAGE_PAGE_SIZE = 24
+# Iniziale usata per i nomi che non iniziano con una lettera
+ALTRO_INIZIALE = "#"
+
+
+def _indice_iniziali():
+    """[(iniziale, numero artisti)] in ordine alfabetico, con una query raggruppata."""
+    conteggi = {}
+    righe = (
+        Artista.objects.annotate(iniziale=Upper(Substr("nome_artista", 1, 1)))
+        .values("iniziale")
+        .annotate(totale=Count("pk"))
+        .order_by("iniziale")
+    )
+    for riga in righe:
+        iniziale = riga["iniziale"] if (riga["iniziale"] or "").isalpha() else ALTRO_INIZIALE
+        conteggi[iniziale] = conteggi.get(iniziale, 0) + riga["totale"]
+    return sorted(conteggi.items(), key=lambda item: (item[0] == ALTRO_INIZIALE, item[0]))
+
+
+def render_griglia_artisti(lettera, numero_pagina):
+    """HTML della griglia artisti per una lettera (indipendente dall'utente, quindi in cache)."""
+    indice = _indice_iniziali()
+    iniziali = [iniziale for iniziale, _totale in indice]
+    if lettera not in iniziali:
+        lettera = iniziali[0] if iniziali else None
+    artisti = Artista.objects.annotate(iniziale=Upper(Substr("nome_artista", 1, 1))).order_by("nome_artista")
+    if lettera == ALTRO_INIZIALE:
+        artisti = artisti.exclude(iniziale__in=[i for i in iniziali if i != ALTRO_INIZIALE])
+    else:
+        artisti = artisti.filter(iniziale=lettera)
+    pagina = Paginator(artisti.only("pk", "nome_artista", "profilo", "foto_artista"), HOMEPAGE_PAGE_SIZE).get_page(
+        numero_pagina
+    )
+    for artista in pagina:
+        artista.miniatura_url = thumbnail_url(artista.foto_artista)
+    return render_to_string(
+        "core/_griglia_artisti.html",
+        {"indice": indice, "lettera": lettera, "pagina": pagina},
+    )
+
+
+class HomeView(TemplateView):
+   """
+   Griglia artisti per iniziale. L'HTML della griglia è in cache per lettera e
+   pagina ed è invalidato (vedi music.signals) solo quando cambia un artista.
+   """
    template_name = "core/homepage.html"
-   context_object_name = "lista_artisti"
-   
-   def get_queryset(self):
-       try:
-           return Artista.objects.all().order_by("nome_artista")
-       except Exception as e:
-           # Se c'è un errore del database, ritorna una lista vuota
-           # Questo permette all'app di partire anche se il database non è pronto
-           import logging
-           logger = logging.getLogger(__name__)
-           logger.error(f"Errore nel caricamento artisti: {e}")
-           return Artista.objects.none()
+
+   def get_context_data(self, **kwargs):
+       context = super().get_context_data(**kwargs)
+       lettera = (self.request.GET.get("lettera") or "").upper()[:1]
+       numero_pagina = self.request.GET.get("page") or "1"
+       if not numero_pagina.isdigit():
+           numero_pagina = "1"
+       key = f"homepage:{get_generation('artisti')}:{lettera}:{numero_pagina}"
+       griglia = cache.get(key)
+       if griglia is None:
+           try:
+               griglia = render_griglia_artisti(lettera, numero_pagina)
+           except DatabaseError as e:
+               # Se il database non è pronto la homepage resta comunque raggiungibile
+               logger.error(f"Errore nel caricamento artisti: {e}")
+               griglia = ""
+           else:
+               cache.set(key, griglia, settings.HOMEPAGE_CACHE_TIMEOUT)
+       context["griglia_artisti"] = griglia
+       return context
 
 class ArtistaView(ListView):
-   queryset = Artista.objects.all().order_by("nome_artista")
+   # Conteggi annotati in un'unica query (evita due COUNT per ogni artista)
+   queryset = Artista.objects.annotate(
+       numero_album=Count("albums"),
+       album_completati=Count("albums", filter=Q(albums__closed=True)),
+   ).order_by("nome_artista")
    template_name = "core/elenco_artisti.html"
    context_object_name = "lista_artisti"
 
 class AlbumView(ListView):
-   queryset = (
-       Album.objects.all()
-       .annotate(
-           classica_in_coda=Case(
-               When(genere__iexact="Classica", then=1),
-               default=0,
-               output_field=IntegerField(),
-           )
-       )
-       .order_by(
-           "classica_in_coda",
-           "-genere",
-           "artista_appartenenza__nome_artista",
-           "supporto",
-           "data_rilascio",
-           "titolo_album",
-       )
-   )
+   """Lista album con filtri (genere, stili, supporto, editore, stato, decennio) e conteggi."""
    template_name = "core/elenco_album.html"
    context_object_name = "lista_album"
+   paginate_by = 50
+
+   def get_queryset(self):
+       self.filtri = facets.parse_filters(self.request.GET)
+       queryset = Album.objects.select_related("artista_appartenenza").catalogue_order()
+       return facets.apply_filters(queryset, self.filtri)
+
+   def get_context_data(self, **kwargs):
+       context = super().get_context_data(**kwargs)
+       context["facets"] = facets.build_facets(self.request.GET, self.filtri)
+       context["filtri_attivi"] = bool(self.filtri)
+       return context
 
 
 class UserList(ListView):
@@ -66,41 +135,47 @@ def user_profile_view(request, username):
 
 
 class SearchView(ListView):
+    """
+    Ricerca globale sulla tabella denormalizzata SearchDocument: una query per i
+    conteggi per tipo e una per la pagina dei risultati, già ordinata per rilevanza
+    e con tutti i campi da mostrare.
+    """
     template_name = "core/search_results.html"
-    context_object_name = "results"
-    
+    context_object_name = "documenti"
+    paginate_by = 30
+
     def get_queryset(self):
-        query = self.request.GET.get('q')
-        if query:
-            # Search in artists - search in name, profile and members
-            artisti = Artista.objects.filter(
-                Q(nome_artista__icontains=query) | 
-                Q(profilo__icontains=query) |
-                Q(componenti__icontains=query)
-            ).distinct()
-            
-            # Search in albums - search in title, artist name, label, genre, and notes
-            album = Album.objects.filter(
-                Q(titolo_album__icontains=query) | 
-                Q(artista_appartenenza__nome_artista__icontains=query) |
-                Q(editore__icontains=query) |
-                Q(genere__icontains=query) |
-                Q(note__icontains=query)
-            ).distinct()
-            
-            # Search in tracks - search in title and credits
-            brani = Brano.objects.filter(
-                Q(titolo_brano__icontains=query) |
-                Q(crediti__icontains=query)
-            ).select_related('album_appartenenza', 'album_appartenenza__artista_appartenenza').distinct()
-            
-            return {
-                'artisti': artisti,
-                'album': album,
-                'brani': brani,
-                'query': query
-            }
-        return {'artisti': [], 'album': [], 'brani': [], 'query': ''}
-
-    
+        self.query = (self.request.GET.get('q') or '').strip()
+        self.tipo = self.request.GET.get('tipo') or ''
+        if self.tipo not in dict(SearchDocument.TIPO_CHOICES):
+            self.tipo = ''
+        self.conteggi = search_index.count_by_type(self.query)
+        return search_index.search_documents(self.query, self.tipo or None)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        # Totale già noto dai conteggi per tipo: evita un COUNT in più
+        paginator.count = self.conteggi[self.tipo] if self.tipo else sum(self.conteggi.values())
+        return paginator
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["results"] = {
+            "query": self.query,
+            "tipo": self.tipo,
+            "conteggi": self.conteggi,
+            "totale": sum(self.conteggi.values()),
+        }
+        return context
+
 
+def metrics_view(request):
+    """Metriche in formato testo Prometheus: solo staff o con METRICS_TOKEN."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and not authorized:
+        authorized = hmac.compare_digest(authorization, f"Bearer {token}")
+    if not authorized:
+        return HttpResponseForbidden("Accesso riservato allo staff.")
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -126,6 +126,15 @@ if [[ "$APACHE_OK" -eq 0 ]]; then
     echo "⚠️  Reload Apache non riuscito: toccato wsgi.py per ricaricare i worker WSGI."
 fi
 
+# Worker dei job in background: riavviato per caricare il nuovo codice
+if command -v systemctl >/dev/null 2>&1 && systemctl is-enabled --quiet dpteca-worker 2>/dev/null; then
+    if sudo systemctl restart dpteca-worker; then
+        echo "✅ Worker dei job riavviato."
+    else
+        echo "⚠️  Riavvio del worker non riuscito: sudo systemctl restart dpteca-worker"
+    fi
+fi
+
 echo ""
 echo "📋 Siti Apache dpteca:"
 for site in "${APACHE_SITES[@]}"; do
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dpteca.settings')
+# Letto da settings.py: sotto ASGI niente connessioni persistenti
+os.environ['DPTECA_SERVER'] = 'asgi'
 
 application = get_asgi_application()
+
+# Configurazione effettiva delle connessioni al database, una volta per processo
+from core.checks import log_database_configuration  # noqa: E402
+
+log_database_configuration()
@@ -70,11 +70,13 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"  # impostazione necessaria pre django_crispy
 
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -102,6 +104,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'dpteca.wsgi.application'
+ASGI_APPLICATION = 'dpteca.asgi.application'
+
+# Viste asincrone per MusicBrainz/Bandcamp/YouTube (richiede httpx; utile con uvicorn)
+ASYNC_LOOKUP_VIEWS = os.environ.get('ASYNC_LOOKUP_VIEWS', 'False') == 'True'
 
 
 # Database
@@ -116,9 +122,89 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Connessioni persistenti: riusate tra le richieste dello stesso thread per
+        # DB_CONN_MAX_AGE secondi, verificate prima del riuso (health check)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Dimensionamento delle connessioni: gli stessi valori di processes/threads della
+# direttiva WSGIDaemonProcess di Apache (default di mod_wsgi: 1 processo, 15 thread).
+# Ogni thread usa al più una connessione, quindi il totale è processi x thread e deve
+# restare sotto DB_MAX_CONNECTIONS (max_connections di PostgreSQL meno le riservate)
+WSGI_PROCESSES = int(os.environ.get('WSGI_PROCESSES', '1'))
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', '15'))
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '90'))
+
+# Profilo ASGI (uvicorn): dpteca/asgi.py imposta DPTECA_SERVER=asgi. Ogni richiesta gira
+# in un thread proprio, quindi una connessione persistente non verrebbe mai riusata né
+# chiusa: sotto ASGI si apre una connessione per richiesta (CONN_MAX_AGE=0) o si usa il
+# pool. Il totale è worker x richieste concorrenti (--workers e --limit-concurrency)
+SERVER_INTERFACE = os.environ.get('DPTECA_SERVER', 'wsgi')
+ASGI_WORKERS = int(os.environ.get('ASGI_WORKERS', '2'))
+ASGI_LIMIT_CONCURRENCY = int(os.environ.get('ASGI_LIMIT_CONCURRENCY', '20'))
+if SERVER_INTERFACE == 'asgi':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# DB_POOL=True: pool psycopg3 per processo (richiede psycopg[pool]). Con il pool le
+# connessioni persistenti vanno disattivate (CONN_MAX_AGE=0), le gestisce il pool
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+if DB_POOL:
+    _pool_max_size = int(os.environ.get(
+        'DB_POOL_MAX_SIZE', str(ASGI_LIMIT_CONCURRENCY if SERVER_INTERFACE == 'asgi' else WSGI_THREADS)
+    ))
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': min(int(os.environ.get('DB_POOL_MIN_SIZE', '2')), _pool_max_size),
+            'max_size': _pool_max_size,
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
+# DB_ENGINE=sqlite: database SQLite locale (sviluppo, test e benchmark senza PostgreSQL)
+if os.environ.get('DB_ENGINE', 'postgresql') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME_SQLITE', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+
+# Cache: con CACHE_DIR una cache su file condivisa tra i processi (mod_wsgi, uvicorn,
+# run_worker, comandi di import), così le invalidazioni di homepage e conteggi dei filtri
+# valgono per tutti. Obbligatoria in produzione: senza, la cache è in memoria per
+# processo e "manage.py check --deploy" avvisa (core.W004) quando DEBUG=False
+CACHE_DIR = os.environ.get('CACHE_DIR', '')
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Conteggi dei filtri della lista album: durata massima in cache (secondi)
+FACET_CACHE_TIMEOUT = int(os.environ.get('FACET_CACHE_TIMEOUT', '600'))
+# Griglia artisti della homepage: invalidata a ogni modifica di un artista
+HOMEPAGE_CACHE_TIMEOUT = int(os.environ.get('HOMEPAGE_CACHE_TIMEOUT', '3600'))
+
+# Job in background (manage.py run_worker): attesa a coda vuota, tentativi con
+# backoff esponenziale (secondi) e secondi senza segnali di vita (report_progress)
+# oltre i quali un job in esecuzione è considerato interrotto e rimesso in coda
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '5'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', '30'))
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', '3600'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -174,6 +260,64 @@ MUSICBRAINZ_USER_AGENT = os.environ.get(
     'MUSICBRAINZ_USER_AGENT',
     'DPTeca/1.0 (https://dpteca.casanausicaa.it)',
 )
+# "api" (musicbrainz.org, 1 richiesta/s) oppure "local": mirror SQLite caricato con
+# ingest_musicbrainz_dump, per abbinare grandi cataloghi senza rete
+MUSICBRAINZ_BACKEND = os.environ.get('MUSICBRAINZ_BACKEND', 'api')
+MUSICBRAINZ_LOCAL_DB = os.environ.get('MUSICBRAINZ_LOCAL_DB', str(BASE_DIR / 'musicbrainz.sqlite3'))
+
+# Profilazione delle richieste (core.middleware.RequestProfilingMiddleware)
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'True') == 'True'
+PROFILING_SLOW_REQUEST_MS = int(os.environ.get('PROFILING_SLOW_REQUEST_MS', '500'))
+PROFILING_SLOW_QUERY_MS = int(os.environ.get('PROFILING_SLOW_QUERY_MS', '100'))
+PROFILING_DUPLICATE_THRESHOLD = int(os.environ.get('PROFILING_DUPLICATE_THRESHOLD', '5'))
+# Header Server-Timing: sempre agli utenti staff, a tutti solo se abilitato (sviluppo)
+PROFILING_SERVER_TIMING = os.environ.get('PROFILING_SERVER_TIMING', 'False') == 'True'
+
+# Metriche Prometheus (/metrics): file SQLite condiviso tra i processi mod_wsgi
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_DB_PATH = os.environ.get('METRICS_DB_PATH', '') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0'))
+# Token opzionale per lo scraping senza sessione (header "Authorization: Bearer <token>")
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'dpteca.profiling': {
+            'handlers': ['console'],
+            'level': os.environ.get('PROFILING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        # Configurazione effettiva delle connessioni, registrata all'avvio di ogni processo
+        'dpteca.database': {
+            'handlers': ['console'],
+            'level': os.environ.get('DB_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
 
 # Chiave YouTube Data API v3 (opzionale): senza chiave si usa la pagina di ricerca.
 YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY', '')
+
+# Link di ascolto: Bandcamp e YouTube interrogati in parallelo entro questa scadenza (secondi)
+LISTEN_LOOKUP_DEADLINE = float(os.environ.get('LISTEN_LOOKUP_DEADLINE', '8'))
+# Thread condivisi per processo dalle ricerche dei link di ascolto (tre fonti per ricerca)
+LISTEN_LOOKUP_WORKERS = int(os.environ.get('LISTEN_LOOKUP_WORKERS', '8'))
+
+# Chiamate HTTP in uscita (music/services/http.py): timeout, retry con backoff
+# esponenziale e jitter, attesa massima accettata da un header Retry-After
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '10'))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', '2'))
+HTTP_BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.environ.get('HTTP_BACKOFF_MAX', '8'))
+HTTP_MAX_RETRY_AFTER = float(os.environ.get('HTTP_MAX_RETRY_AFTER', '10'))
+# Circuit breaker per host: dopo N errori consecutivi l'host è saltato per M secondi.
+# Lo stato è condiviso tra i processi in un file SQLite (default nella cartella temporanea)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '3'))
+CIRCUIT_RESET_TIMEOUT = int(os.environ.get('CIRCUIT_RESET_TIMEOUT', '60'))
+CIRCUIT_DB_PATH = os.environ.get('CIRCUIT_DB_PATH', '')
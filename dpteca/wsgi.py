@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dpteca.settings')
 
 application = get_wsgi_application()
+
+# Configurazione effettiva delle connessioni al database, una volta per processo
+from core.checks import log_database_configuration  # noqa: E402
+
+log_database_configuration()
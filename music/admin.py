@@ -1,26 +1,105 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
 # Register your models here.
-from .models import Artista, Album, Brano, Stile, AlbumDesiderato
+from . import tasks
+from .models import Artista, Album, Brano, Stile, AlbumDesiderato, MusicBrainzMatch, Job
+from .services.jobs import enqueue
+
+# Brani risolti in background dall'azione "Ricalcola link di ascolto": ogni brano
+# interroga le fonti esterne, gli altri vengono risolti al primo "Ascolta"
+LISTEN_RESOLVE_LIMIT = 20
 
 # Register your models here.
 
+# Liste amministrative per cataloghi grandi: FK in join (list_select_related),
+# widget autocomplete al posto delle select con tutte le righe, nessun COUNT
+# dell'intera tabella (show_full_result_count) e filtri solo su campi con pochi
+# valori. Le ricerche sui nomi usano gli indici trigram (migrazione 0015).
+
+
+def _rigenera_miniature(modeladmin, request, queryset, modello):
+    """
+    Accoda la rigenerazione delle miniature selezionate (task rigenera_miniature):
+    le immagini non vengono decodificate durante la richiesta dell'admin.
+    """
+    pks = list(queryset.order_by("pk").values_list("pk", flat=True))
+    job = enqueue(tasks.RIGENERA_MINIATURE, utente=request.user, modello=modello, pks=pks)
+    modeladmin.message_user(
+        request,
+        f"Rigenerazione delle miniature accodata per {len(pks)} elementi (job #{job.pk})",
+        messages.SUCCESS,
+    )
+
+
+@admin.action(description="Rigenera le miniature delle foto")
+def rigenera_miniature_artisti(modeladmin, request, queryset):
+    _rigenera_miniature(modeladmin, request, queryset, "artista")
+
+
+@admin.action(description="Rigenera le miniature delle copertine")
+def rigenera_miniature_album(modeladmin, request, queryset):
+    _rigenera_miniature(modeladmin, request, queryset, "album")
+
+
+def _ricalcola_ascolto(modeladmin, request, brani):
+    """
+    Azzera i link in cache dei brani e accoda la ricerca dei primi
+    LISTEN_RESOLVE_LIMIT (task ricalcola_ascolto): le fonti esterne non
+    vengono interrogate durante la richiesta dell'admin.
+    """
+    azzerati = brani.exclude(ascolto_url="").update(ascolto_url="", ascolto_fonte="")
+    da_risolvere = list(brani.values_list("pk", flat=True)[:LISTEN_RESOLVE_LIMIT])
+    messaggio = f"Link azzerati: {azzerati}"
+    if da_risolvere:
+        job = enqueue(tasks.RICALCOLA_ASCOLTO, utente=request.user, brani=da_risolvere)
+        messaggio += f", ricerca accodata per {len(da_risolvere)} brani (job #{job.pk})"
+    modeladmin.message_user(
+        request,
+        f"{messaggio} (gli altri verranno cercati al primo ascolto)",
+        messages.SUCCESS,
+    )
+
+
+@admin.action(description="Ricalcola i link di ascolto")
+def ricalcola_ascolto_brani(modeladmin, request, queryset):
+    _ricalcola_ascolto(modeladmin, request, Brano.objects.filter(pk__in=queryset.values("pk")).order_by("pk"))
+
+
+@admin.action(description="Ricalcola i link di ascolto dei brani")
+def ricalcola_ascolto_album(modeladmin, request, queryset):
+    brani = Brano.objects.filter(album_appartenenza__in=queryset.values("pk"))
+    _ricalcola_ascolto(modeladmin, request, brani.order_by("album_appartenenza", *Brano.ALBUM_ORDERING))
+
+
 class AlbumModelAdmin(admin.ModelAdmin):
     model = Album
-    list_display = ["titolo_album", "artista_appartenenza", "editore", "catalogo", "closed"]
-    search_fields = ["titolo_album", "artista_appartenenza"]
-    list_filter = ["titolo_album", "artista_appartenenza" ]
+    list_display = ["titolo_album", "artista_appartenenza", "editore", "catalogo", "supporto", "closed"]
+    list_select_related = ["artista_appartenenza"]
+    search_fields = ["titolo_album", "artista_appartenenza__nome_artista"]
+    list_filter = ["closed", "supporto"]
+    autocomplete_fields = ["artista_appartenenza"]
+    show_full_result_count = False
+    actions = [ricalcola_ascolto_album, rigenera_miniature_album]
     
 class BranoModelAdmin(admin.ModelAdmin):
     model = Brano
     list_display = ["titolo_brano", "album_appartenenza", "sezione", "progressivo", "durata", "ascolto_fonte"]
-    search_fields = ["titolo_brano", "album_appartenenza"]
-    list_filter = ["titolo_brano", "album_appartenenza", "ascolto_fonte"]
+    list_select_related = ["album_appartenenza"]
+    search_fields = ["titolo_brano", "album_appartenenza__titolo_album"]
+    list_filter = ["ascolto_fonte"]
+    autocomplete_fields = ["album_appartenenza"]
     readonly_fields = ["ascolto_url", "ascolto_fonte"]
+    show_full_result_count = False
+    actions = [ricalcola_ascolto_brani]
 
 class ArtistaModelAdmin(admin.ModelAdmin):
     model = Artista
     list_display = ["nome_artista", "componenti", "sites"]
+    # Necessario per l'autocomplete degli artisti negli album
+    search_fields = ["nome_artista"]
+    ordering = ["nome_artista"]
+    show_full_result_count = False
+    actions = [rigenera_miniature_artisti]
 
 
 class AlbumDesideratoAdmin(admin.ModelAdmin):
@@ -28,10 +107,30 @@ class AlbumDesideratoAdmin(admin.ModelAdmin):
     list_display = ["titolo_album", "artista", "created_at"]
     search_fields = ["titolo_album", "artista__nome_artista"]
     list_filter = ["artista"]
+
+
+class MusicBrainzMatchAdmin(admin.ModelAdmin):
+    model = MusicBrainzMatch
+    list_display = ["album", "stato", "punteggio", "release_mbid", "brani_creati", "aggiornato_il"]
+    search_fields = ["album__titolo_album", "album__artista_appartenenza__nome_artista", "release_mbid"]
+    list_filter = ["stato"]
+    list_select_related = ["album"]
+    readonly_fields = ["candidati", "aggiornato_il"]
+
+
+class JobAdmin(admin.ModelAdmin):
+    model = Job
+    list_display = ["pk", "nome", "stato", "priorita", "progresso", "tentativi", "creato_il", "completato_il"]
+    list_filter = ["stato", "nome"]
+    list_select_related = ["creato_da"]
+    readonly_fields = ["risultato", "errore", "worker", "creato_il", "avviato_il", "ultimo_segnale_il", "completato_il"]
+    show_full_result_count = False
     
    
 admin.site.register(Stile)
 admin.site.register(Artista, ArtistaModelAdmin)
 admin.site.register(Album, AlbumModelAdmin)
 admin.site.register(Brano, BranoModelAdmin)
-admin.site.register(AlbumDesiderato, AlbumDesideratoAdmin)
\ No newline at end of file
+admin.site.register(AlbumDesiderato, AlbumDesideratoAdmin)
+admin.site.register(MusicBrainzMatch, MusicBrainzMatchAdmin)
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,284 @@
+"""
+API JSON in sola lettura per il catalogo: artisti, album (con stili), brani e
+album desiderati.
+
+- Paginazione a cursore (keyset sulla chiave primaria): ``?cursor=`` e ``?limit=``
+- Selezione dei campi: ``?fields=id,titolo_album``
+- Query a numero costante grazie a select_related/prefetch_related
+- Serializzazione con orjson se disponibile (fallback sul modulo json)
+- ETag calcolato sul corpo della risposta, con risposta 304 su If-None-Match
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from .models import Album, AlbumDesiderato, Artista, Brano
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _file_url(field):
+    return field.url if field else None
+
+
+ARTISTA_FIELDS = {
+    "id": lambda a: a.pk,
+    "nome_artista": lambda a: a.nome_artista,
+    "foto_artista": lambda a: _file_url(a.foto_artista),
+    "profilo": lambda a: a.profilo,
+    "sites": lambda a: a.sites,
+    "componenti": lambda a: a.componenti,
+    "url": lambda a: reverse("artista_view", kwargs={"pk": a.pk}),
+}
+
+ALBUM_FIELDS = {
+    "id": lambda a: a.pk,
+    "titolo_album": lambda a: a.titolo_album,
+    "artista": lambda a: {
+        "id": a.artista_appartenenza_id,
+        "nome_artista": a.artista_appartenenza.nome_artista,
+    },
+    "editore": lambda a: a.editore,
+    "catalogo": lambda a: a.catalogo,
+    "genere": lambda a: a.genere,
+    "stili": lambda a: [stile.stile for stile in a.stili.all()],
+    "supporto": lambda a: a.supporto,
+    "data_rilascio": lambda a: a.data_rilascio.isoformat() if a.data_rilascio else None,
+    "deposito": lambda a: a.deposito,
+    "note": lambda a: a.note,
+    "copertina": lambda a: _file_url(a.copertina),
+    "costo": lambda a: a.costo,
+    "closed": lambda a: a.closed,
+    "numero_brani": lambda a: a.numero_brani,
+    "durata_totale_secondi": lambda a: a.durata_totale_secondi,
+    "numero_dischi": lambda a: a.numero_dischi,
+    "url": lambda a: reverse("album_view", kwargs={"pk": a.pk}),
+}
+
+BRANO_FIELDS = {
+    "id": lambda b: b.pk,
+    "titolo_brano": lambda b: b.titolo_brano,
+    "album": lambda b: {
+        "id": b.album_appartenenza_id,
+        "titolo_album": b.album_appartenenza.titolo_album,
+    },
+    "sezione": lambda b: b.sezione,
+    "progressivo": lambda b: b.progressivo,
+    "crediti": lambda b: b.crediti,
+    "durata": lambda b: b.durata,
+    "durata_secondi": lambda b: b.durata_secondi,
+    "posizione": lambda b: b.posizione,
+    "ascolto_url": lambda b: b.ascolto_url,
+    "ascolto_fonte": lambda b: b.ascolto_fonte,
+    "url": lambda b: reverse("album_view", kwargs={"pk": b.album_appartenenza_id}),
+}
+
+ALBUM_DESIDERATO_FIELDS = {
+    "id": lambda d: d.pk,
+    "titolo_album": lambda d: d.titolo_album,
+    "artista": lambda d: {
+        "id": d.artista_id,
+        "nome_artista": d.artista.nome_artista,
+    },
+    "copertina": lambda d: _file_url(d.copertina),
+    "created_at": lambda d: d.created_at.isoformat(),
+}
+
+
+def _artisti_queryset():
+    return Artista.objects.all()
+
+
+def _album_queryset():
+    return Album.objects.select_related("artista_appartenenza").prefetch_related("stili")
+
+
+def _brani_queryset():
+    return Brano.objects.select_related("album_appartenenza")
+
+
+def _album_desiderati_queryset():
+    return AlbumDesiderato.objects.select_related("artista")
+
+
+def _dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_response(request, payload, status=200):
+    body = _dumps(payload)
+    if status == 200:
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+    response = HttpResponse(body, content_type="application/json", status=status)
+    if status == 200:
+        response["ETag"] = etag
+    return response
+
+
+def _selected_fields(request, available):
+    raw = (request.GET.get("fields") or "").strip()
+    if not raw:
+        return available
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"Campi non disponibili: {', '.join(unknown)}")
+    return {name: available[name] for name in names}
+
+
+def _serialize(obj, fields):
+    return {name: getter(obj) for name, getter in fields.items()}
+
+
+def _encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError("Cursore non valido.")
+
+
+def _parse_limit(request):
+    raw = request.GET.get("limit")
+    if not raw:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError("Parametro limit non valido.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _parse_int_filter(request, name):
+    raw = request.GET.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ApiError(f"Parametro {name} non valido.")
+
+
+def _paginated(request, queryset, fields):
+    fields = _selected_fields(request, fields)
+    limit = _parse_limit(request)
+    cursor = request.GET.get("cursor")
+    if cursor:
+        queryset = queryset.filter(pk__gt=_decode_cursor(cursor))
+
+    # Una riga in più per sapere se esiste una pagina successiva
+    objects = list(queryset.order_by("pk")[: limit + 1])
+    has_next = len(objects) > limit
+    objects = objects[:limit]
+
+    next_url = None
+    if has_next:
+        params = request.GET.copy()
+        params["cursor"] = _encode_cursor(objects[-1].pk)
+        next_url = f"{request.path}?{params.urlencode()}"
+
+    return {
+        "results": [_serialize(obj, fields) for obj in objects],
+        "next": next_url,
+    }
+
+
+def _api_view(view):
+    @require_GET
+    def wrapper(request, *args, **kwargs):
+        try:
+            payload = view(request, *args, **kwargs)
+        except ApiError as exc:
+            return _json_response(request, {"error": str(exc)}, status=exc.status)
+        except Http404:
+            return _json_response(request, {"error": "Risorsa non trovata."}, status=404)
+        return _json_response(request, payload)
+
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+@_api_view
+def api_root(request):
+    return {
+        "artisti": reverse("api_artisti"),
+        "album": reverse("api_album_list"),
+        "brani": reverse("api_brani"),
+        "album_desiderati": reverse("api_album_desiderati"),
+    }
+
+
+@_api_view
+def lista_artisti(request):
+    return _paginated(request, _artisti_queryset(), ARTISTA_FIELDS)
+
+
+@_api_view
+def dettaglio_artista(request, pk):
+    artista = get_object_or_404(_artisti_queryset(), pk=pk)
+    return _serialize(artista, _selected_fields(request, ARTISTA_FIELDS))
+
+
+@_api_view
+def lista_album(request):
+    queryset = _album_queryset()
+    artista_id = _parse_int_filter(request, "artista")
+    if artista_id is not None:
+        queryset = queryset.filter(artista_appartenenza_id=artista_id)
+    return _paginated(request, queryset, ALBUM_FIELDS)
+
+
+@_api_view
+def dettaglio_album(request, pk):
+    album = get_object_or_404(_album_queryset(), pk=pk)
+    return _serialize(album, _selected_fields(request, ALBUM_FIELDS))
+
+
+@_api_view
+def lista_brani(request):
+    queryset = _brani_queryset()
+    album_id = _parse_int_filter(request, "album")
+    if album_id is not None:
+        queryset = queryset.filter(album_appartenenza_id=album_id)
+    return _paginated(request, queryset, BRANO_FIELDS)
+
+
+@_api_view
+def dettaglio_brano(request, pk):
+    brano = get_object_or_404(_brani_queryset(), pk=pk)
+    return _serialize(brano, _selected_fields(request, BRANO_FIELDS))
+
+
+@_api_view
+def lista_album_desiderati(request):
+    return _paginated(request, _album_desiderati_queryset(), ALBUM_DESIDERATO_FIELDS)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MusicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'music'
+
+    def ready(self):
+        # Aggiornamento dell'indice della ricerca globale
+        from music import signals  # noqa: F401
+        # Registro dei task eseguiti da run_worker
+        from music import tasks  # noqa: F401
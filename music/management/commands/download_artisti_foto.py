@@ -3,7 +3,7 @@ from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from music.models import Artista
 from PIL import Image
-import requests
+from music.services import http
 from io import BytesIO
 import time
 import os
@@ -51,8 +51,7 @@ class Command(BaseCommand):
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=10, stream=True)
-            response.raise_for_status()
+            response = http.get(url, headers=headers, timeout=10, stream=True)
             
             # Verifica che sia un'immagine
             content_type = response.headers.get('content-type', '')
@@ -101,8 +100,7 @@ class Command(BaseCommand):
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
                 }
                 
-                response = requests.get(url, headers=headers, timeout=10)
-                response.raise_for_status()
+                response = http.get(url, headers=headers, timeout=10)
                 data = response.json()
                 
                 if data.get('totalHits', 0) > 0:
@@ -1,4 +1,5 @@
 import datetime
+import json
 from pathlib import Path
 
 import openpyxl
@@ -6,11 +7,16 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 
 from music.models import Album, Artista, Stile
+from music.services.import_fingerprint import ImportDiff, changed_fields, fingerprint
+from music.services.import_pipeline import ALBUM_IMPORT_FIELDS, CatalogueIndex
 
 
 class Command(BaseCommand):
     help = "Importa gli album dal file Excel DatiMusica.xlsx"
 
+    # Indice artisti/album condiviso impostato da import_all (altrimenti uno nuovo)
+    index = None
+
     def add_arguments(self, parser):
         parser.add_argument(
             "--file",
@@ -37,7 +43,18 @@ class Command(BaseCommand):
         parser.add_argument(
             "--update-existing",
             action="store_true",
-            help="Aggiorna gli album già presenti con i dati Excel",
+            help="Aggiorna gli album già presenti con i dati Excel (solo le righe modificate)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Con --update-existing riscrive tutti gli album, anche con impronta invariata",
+        )
+        parser.add_argument(
+            "--report",
+            type=str,
+            default=None,
+            help="Salva in questo file JSON le differenze complete (nuovi, modificati, invariati, mancanti)",
         )
 
     @staticmethod
@@ -128,12 +145,58 @@ class Command(BaseCommand):
             return [value.strip()]
         return [str(value).strip()]
 
+    def _row_values(self, data):
+        """Valori normalizzati che la riga scrive sull'album (base dell'impronta)."""
+        stili_list = self._parse_stili(data.get("stili"))
+        values = {
+            "editore": self._truncate(data.get("editore"), Album._meta.get_field("editore").max_length),
+            "catalogo": self._truncate(data.get("catalogo"), Album._meta.get_field("catalogo").max_length),
+            "supporto": self._truncate(data.get("supporto"), Album._meta.get_field("supporto").max_length),
+            "deposito": self._truncate(data.get("deposito"), Album._meta.get_field("deposito").max_length),
+            "note": self._clean_string(data.get("note")),
+            "costo": self._parse_float(data.get("costo")),
+            "closed": self._parse_bool(data.get("closed")),
+            "data_rilascio": self._parse_date(data.get("data_rilascio")),
+            "genere": (
+                self._truncate(stili_list[0], Album._meta.get_field("genere").max_length)
+                if stili_list
+                else None
+            ),
+        }
+        # Senza stili nel foglio quelli dell'album restano invariati
+        if stili_list:
+            max_length = Stile._meta.get_field("stile").max_length
+            values["stili"] = sorted({self._truncate(nome, max_length) for nome in stili_list})
+        return values
+
+    def _stili(self, nomi):
+        stili = []
+        for nome in nomi:
+            if nome not in self._stili_cache:
+                self._stili_cache[nome], _ = Stile.objects.get_or_create(stile=nome)
+            stili.append(self._stili_cache[nome])
+        return stili
+
+    def _write(self, album, values, row_hash, campi):
+        """Scrive solo i campi cambiati (tutti per un album nuovo) e l'impronta della riga."""
+        for name in ALBUM_IMPORT_FIELDS:
+            setattr(album, name, values[name])
+        album.import_hash = row_hash
+        with transaction.atomic():
+            if album.pk is None:
+                album.save()
+            else:
+                album.save(update_fields=[name for name in campi if name != "stili"] + ["import_hash"])
+            if "stili" in campi:
+                album.stili.set(self._stili(values["stili"]))
+
     def handle(self, *args, **options):
         file_path = self._resolve_file(options["file"])
         limit = options.get("limit")
         dry_run = options.get("dry_run")
         skip_existing = options.get("skip_existing")
         update_existing = options.get("update_existing")
+        force = options.get("force")
 
         if skip_existing and update_existing:
             self.stdout.write(
@@ -176,7 +239,15 @@ class Command(BaseCommand):
                     f"[Anteprima {idx}] {data.get('titolo_album')} - "
                     f"{data.get('artista_appartenenza')}"
                 )
-            return
+
+        # Indici in memoria: le righe invariate non fanno nessuna query
+        index = self.index or CatalogueIndex()
+        albums = index.albums
+        artisti = index.artisti
+        self._stili_cache = {}
+        diff = ImportDiff()
+        seen = set()
+        backfill = []
 
         created_count = 0
         updated_count = 0
@@ -192,95 +263,87 @@ class Command(BaseCommand):
                 skipped_count += 1
                 continue
 
-            try:
-                with transaction.atomic():
-                    artista, _ = Artista.objects.get_or_create(
-                        nome_artista=artista_nome
-                    )
-
-                    album_qs = Album.objects.filter(
-                        titolo_album=titolo, artista_appartenenza=artista
-                    )
-
-                    if album_qs.exists():
-                        if skip_existing:
-                            skipped_count += 1
-                            continue
-                        album = album_qs.first()
-                        action = "updated" if update_existing else "existing"
-                    else:
-                        album = Album(titolo_album=titolo, artista_appartenenza=artista)
-                        action = "created"
-
-                    if action == "existing" and not update_existing:
-                        skipped_count += 1
-                        continue
-
-                    album.editore = self._truncate(
-                        data.get("editore"),
-                        Album._meta.get_field("editore").max_length,
-                    )
-                    album.catalogo = self._truncate(
-                        data.get("catalogo"),
-                        Album._meta.get_field("catalogo").max_length,
-                    )
-                    album.supporto = self._truncate(
-                        data.get("supporto"),
-                        Album._meta.get_field("supporto").max_length,
-                    )
-                    album.deposito = self._truncate(
-                        data.get("deposito"),
-                        Album._meta.get_field("deposito").max_length,
-                    )
-                    album.note = self._clean_string(data.get("note"))
-                    album.costo = self._parse_float(data.get("costo"))
-                    album.closed = self._parse_bool(data.get("closed"))
-                    album.data_rilascio = self._parse_date(data.get("data_rilascio"))
-
-                    stili_list = self._parse_stili(data.get("stili"))
-                    album.genere = (
-                        self._truncate(
-                            stili_list[0],
-                            Album._meta.get_field("genere").max_length,
-                        )
-                        if stili_list
-                        else None
-                    )
-
-                    album.save()
-
-                    if stili_list:
-                        stile_objs = []
-                        for stile_name in stili_list:
-                            stile_obj, _ = Stile.objects.get_or_create(
-                                stile=self._truncate(
-                                    stile_name,
-                                    Stile._meta.get_field("stile").max_length,
-                                )
-                            )
-                            stile_objs.append(stile_obj)
-                        album.stili.set(stile_objs)
-
-                    if action == "created":
-                        created_count += 1
-                    else:
-                        updated_count += 1
+            label = f"{titolo} - {artista_nome}"
+            values = self._row_values(data)
+            row_hash = fingerprint(values)
+            current = albums.get((titolo, artista_nome))
+            seen.add((titolo, artista_nome))
+
+            if current is None:
+                diff.added.append(label)
+                campi = list(values)
+            elif current["import_hash"] == row_hash and not force:
+                diff.unchanged += 1
+                skipped_count += 1
+                continue
+            else:
+                campi = changed_fields(current, values)
+                if not campi and not force:
+                    # Import precedente all'impronta: basta salvarla
+                    diff.unchanged += 1
+                    skipped_count += 1
+                    if current["import_hash"] != row_hash:
+                        backfill.append(Album(pk=current["pk"], import_hash=row_hash))
+                    continue
+                if campi:
+                    diff.changed.append((label, campi))
+                else:
+                    diff.unchanged += 1
+                if not update_existing:
+                    skipped_count += 1
+                    continue
+                if force:
+                    campi = list(values)
+
+            if dry_run:
+                continue
 
+            try:
+                if current is None:
+                    if artista_nome not in artisti:
+                        index.add_artista(artista_nome, Artista.objects.get_or_create(nome_artista=artista_nome)[0].pk)
+                    album = Album(titolo_album=titolo, artista_appartenenza_id=artisti[artista_nome])
+                else:
+                    album = Album.objects.select_related("artista_appartenenza").get(pk=current["pk"])
+                self._write(album, values, row_hash, campi)
+                # Righe ripetute nel foglio si confrontano con quanto appena scritto
+                index.add_album(titolo, artista_nome, {
+                    "pk": album.pk, "import_hash": row_hash, "stili": values.get("stili", []), **values
+                })
+                if current is None:
+                    created_count += 1
+                else:
+                    updated_count += 1
             except Exception as exc:
-                errors.append(f"{titolo} - {artista_nome}: {exc}")
+                errors.append(f"{label}: {exc}")
                 skipped_count += 1
 
+        if backfill and not dry_run:
+            Album.objects.bulk_update(backfill, ["import_hash"], batch_size=500)
+        # Con --limit il foglio è letto solo in parte: i mancanti non sono calcolabili
+        if not limit:
+            diff.missing = sorted(f"{titolo} - {artista}" for titolo, artista in albums.keys() - seen)
+
         self.stdout.write("")
         self.stdout.write(self.style.SUCCESS("=" * 50))
-        self.stdout.write(self.style.SUCCESS("IMPORTAZIONE ALBUM COMPLETATA"))
+        self.stdout.write(
+            self.style.SUCCESS("ANALISI ALBUM (DRY RUN)" if dry_run else "IMPORTAZIONE ALBUM COMPLETATA")
+        )
         self.stdout.write(self.style.SUCCESS("=" * 50))
         self.stdout.write(f"Album creati: {created_count}")
         self.stdout.write(f"Album aggiornati: {updated_count}")
         self.stdout.write(f"Album saltati: {skipped_count}")
         self.stdout.write(f"Totale album nel database: {Album.objects.count()}")
+        diff.write(self.stdout, self.style)
+        if diff.changed and not update_existing:
+            self.stdout.write(self.style.WARNING("Album modificati non aggiornati: rilancia con --update-existing"))
+
+        if options.get("report"):
+            with open(options["report"], "w", encoding="utf-8") as report:
+                json.dump(diff.as_dict(), report, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Differenze salvate in {options['report']}")
 
         if errors:
             self.stdout.write(self.style.ERROR("Errori riscontrati:"))
             for err in errors:
                 self.stdout.write(self.style.ERROR(f" - {err}"))
-
@@ -0,0 +1,124 @@
+import io
+
+from django.core.management import call_command, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from music.services.import_pipeline import CatalogueIndex, Step, effective_workers, run_pipeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Import completo del catalogo: artisti, album, brani, copertine e foto "
+        "in ordine di dipendenza, con i passi indipendenti in parallelo"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--artisti-file",
+            type=str,
+            default="elencoArtisti.xlsx",
+            help="File Excel degli artisti (default: elencoArtisti.xlsx)",
+        )
+        parser.add_argument(
+            "--albums-file",
+            type=str,
+            default="DatiMusica.xlsx",
+            help="File Excel degli album (default: DatiMusica.xlsx)",
+        )
+        parser.add_argument(
+            "--brani-file",
+            type=str,
+            default="Brani.xlsx",
+            help="File Excel dei brani (default: Brani.xlsx)",
+        )
+        parser.add_argument(
+            "--covers-dir",
+            type=str,
+            default="Immagini/Album",
+            help="Directory delle copertine (default: Immagini/Album)",
+        )
+        parser.add_argument(
+            "--foto-dir",
+            type=str,
+            default="Immagini/Artisti",
+            help="Directory delle foto degli artisti (default: Immagini/Artisti)",
+        )
+        parser.add_argument(
+            "--update-existing",
+            action="store_true",
+            help="Aggiorna artisti, album e brani già presenti",
+        )
+        parser.add_argument(
+            "--skip-images",
+            action="store_true",
+            help="Non carica copertine e foto",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Passi e partizioni di brani eseguiti in parallelo (default: 4; sempre 1 su SQLite)",
+        )
+
+    def _step(self, name, command_name, index, depends=(), **options):
+        def run():
+            command = load_command_class("music", command_name)
+            command.index = index
+            out = io.StringIO()
+            call_command(command, stdout=out, **options)
+            return out.getvalue()
+
+        return Step(name, run, tuple(depends))
+
+    def _print_step(self, step):
+        if step.skipped:
+            self.stdout.write(self.style.WARNING(f"[{step.name}] saltato: dipendenza non completata"))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(f"[{step.name}] {step.seconds:.2f}s"))
+        for line in step.output.splitlines():
+            if line.strip():
+                self.stdout.write(f"  {line}")
+        if step.error is not None:
+            self.stdout.write(self.style.ERROR(f"  Errore: {step.error}"))
+
+    def handle(self, *args, **options):
+        workers = effective_workers(options["workers"])
+        update = {"update_existing": True} if options["update_existing"] else {}
+        # Indice artisti/album condiviso: caricato una volta, aggiornato dai passi
+        index = CatalogueIndex()
+
+        steps = [
+            self._step("artisti", "import_artisti", index, file=options["artisti_file"], **update),
+            self._step("album", "import_albums", index, ["artisti"], file=options["albums_file"], **update),
+            self._step(
+                "brani", "import_brani", index, ["album"], file=options["brani_file"], workers=workers, **update
+            ),
+        ]
+        if not options["skip_images"]:
+            steps += [
+                self._step("copertine", "load_album_covers", index, ["album"], images_dir=options["covers_dir"]),
+                self._step("foto", "load_artisti_foto", index, ["artisti"], images_dir=options["foto_dir"]),
+            ]
+
+        if workers == 1 and options["workers"] > 1:
+            self.stdout.write(self.style.WARNING(f"Database {connection.vendor}: passi eseguiti in sequenza"))
+
+        result = run_pipeline(steps, workers=workers, on_done=self._print_step)
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("=" * 50))
+        self.stdout.write(self.style.SUCCESS("TEMPI DELL'IMPORT"))
+        self.stdout.write(self.style.SUCCESS("=" * 50))
+        for step in result.steps:
+            if step.skipped:
+                self.stdout.write(f"{step.name:<10} saltato")
+            else:
+                esito = "errore" if step.error is not None else "ok"
+                self.stdout.write(
+                    f"{step.name:<10} avvio {step.started:7.2f}s  durata {step.seconds:7.2f}s  {esito}"
+                )
+        self.stdout.write(f"{'totale':<10} {result.seconds:.2f}s con {workers} worker")
+
+        if result.failed:
+            raise CommandError(f"Passi non completati: {', '.join(result.failed)}")
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from music.models import Artista
+from music.services.import_pipeline import CatalogueIndex
 import openpyxl
 import os
 from pathlib import Path
@@ -9,6 +10,9 @@ from pathlib import Path
 class Command(BaseCommand):
     help = 'Importa artisti dal file Excel elencoArtisti.xlsx'
 
+    # Indice artisti/album condiviso impostato da import_all (altrimenti uno nuovo)
+    index = None
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--file',
@@ -80,34 +84,25 @@ class Command(BaseCommand):
             skipped_count = 0
             errors = []
             
+            # Artisti esistenti dall'indice in memoria: una query invece di una per riga
+            index = self.index or CatalogueIndex()
+            esistenti = index.artisti
+
             with transaction.atomic():
                 for nome_artista in artisti_data:
                     try:
-                        if update_existing:
-                            # Aggiorna o crea
-                            artista, created = Artista.objects.update_or_create(
-                                nome_artista=nome_artista,
-                                defaults={'nome_artista': nome_artista}
-                            )
-                            if created:
-                                created_count += 1
-                            else:
+                        if nome_artista in esistenti:
+                            # Il nome è l'unico dato del foglio: non c'è nulla da aggiornare
+                            if update_existing:
                                 updated_count += 1
-                        else:
-                            # Controlla se esiste già
-                            if skip_existing and Artista.objects.filter(nome_artista=nome_artista).exists():
-                                skipped_count += 1
-                                continue
-                            
-                            # Crea nuovo artista
-                            artista, created = Artista.objects.get_or_create(
-                                nome_artista=nome_artista
-                            )
-                            if created:
-                                created_count += 1
                             else:
                                 skipped_count += 1
-                                
+                            continue
+
+                        artista = Artista.objects.create(nome_artista=nome_artista)
+                        index.add_artista(nome_artista, artista.pk)
+                        created_count += 1
+
                     except Exception as e:
                         errors.append(f"Errore con '{nome_artista}': {str(e)}")
                         self.stdout.write(
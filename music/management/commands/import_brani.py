@@ -1,18 +1,32 @@
 import itertools
 from collections import defaultdict
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import openpyxl
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.models import Count
 
 from music.models import Album, Brano
+from music.services.album_stats import refresh_stats_for_album_ids
+from music.services.import_pipeline import CatalogueIndex, effective_workers, run_in_threads, split_balanced
+
+
+@dataclass
+class AlbumResult:
+    album_id: int
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: list[str] = field(default_factory=list)
 
 
 class Command(BaseCommand):
     help = "Importa i brani dal file Excel Brani.xlsx"
 
+    # Indice artisti/album condiviso impostato da import_all (altrimenti uno nuovo)
+    index = None
+
     def add_arguments(self, parser):
         parser.add_argument(
             "--file",
@@ -41,6 +55,12 @@ class Command(BaseCommand):
             action="store_true",
             help="Aggiorna i brani già presenti",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Thread per l'import, ognuno su album diversi (default: 1; sempre 1 su SQLite)",
+        )
 
     @staticmethod
     def _resolve_file(path):
@@ -60,26 +80,51 @@ class Command(BaseCommand):
         text = str(value).strip()
         return text or None
 
-    def _find_album(self, titolo_album, artista_nome=None, artista_comp=None):
-        if not titolo_album:
-            return None
-
-        base_qs = Album.objects.filter(titolo_album=titolo_album)
-
-        if artista_nome:
-            qs = base_qs.filter(artista_appartenenza__nome_artista=artista_nome)
-            if qs.count() == 1:
-                return qs.first()
-
-        if artista_comp:
-            qs = base_qs.filter(artista_appartenenza__nome_artista=artista_comp)
-            if qs.count() == 1:
-                return qs.first()
+    def _import_album(self, album_id, titoli, *, skip_existing, update_existing):
+        """Importa i brani di un album: una query per i brani esistenti, poi solo scritture."""
+        result = AlbumResult(album_id)
+        album = Album.objects.select_related("artista_appartenenza").get(pk=album_id)
+        brani = list(Brano.objects.filter(album_appartenenza=album).order_by("pk"))
+        esistenti = {}
+        for brano in brani:
+            esistenti.setdefault(brano.titolo_brano, brano)
+        # Il contatore progressivo parte dal numero di brani già presenti
+        progressivo = len(brani)
+        max_titolo_len = Brano._meta.get_field("titolo_brano").max_length
+        max_prog_len = Brano._meta.get_field("progressivo").max_length
+
+        for titolo_brano in titoli:
+            brano = esistenti.get(titolo_brano)
+            if brano is not None:
+                if skip_existing or not update_existing:
+                    result.skipped += 1
+                    continue
+                action = "updated"
+            else:
+                brano = Brano(album_appartenenza=album)
+                action = "created"
 
-        if base_qs.count() == 1:
-            return base_qs.first()
+            progressivo += 1
+            brano.titolo_brano = titolo_brano[:max_titolo_len]
+            brano.progressivo = str(progressivo).zfill(max_prog_len)
+            brano.posizione = progressivo
+            brano.sezione = None
+            brano.crediti = None
+            brano.durata = None
+            brano.durata_secondi = None
 
-        return None
+            try:
+                with transaction.atomic():
+                    brano.save()
+                esistenti.setdefault(titolo_brano, brano)
+                if action == "created":
+                    result.created += 1
+                else:
+                    result.updated += 1
+            except Exception as exc:
+                result.errors.append(f"Errore con '{titolo_brano}': {exc}")
+                result.skipped += 1
+        return result
 
     def handle(self, *args, **options):
         file_path = self._resolve_file(options["file"])
@@ -129,21 +174,13 @@ class Command(BaseCommand):
                 )
             return
 
-        created_count = 0
-        updated_count = 0
         skipped_count = 0
         missing_album = 0
         errors = []
 
-        # Mantiene il contatore progressivo per album (parte dal numero di brani già presenti)
-        album_progressivi = defaultdict(int)
-        existing_counts = (
-            Brano.objects.values("album_appartenenza")
-            .annotate(total=Count("id"))
-        )
-        for entry in existing_counts:
-            album_progressivi[entry["album_appartenenza"]] = entry["total"] or 0
-
+        # Righe raggruppate per album (ordine del file): ogni gruppo è indipendente
+        index = self.index or CatalogueIndex()
+        partitions = defaultdict(list)
         for row in data_rows:
             data = dict(zip(headers, row))
             titolo_album = self._clean(data.get("TitoloAlbum"))
@@ -155,47 +192,31 @@ class Command(BaseCommand):
                 skipped_count += 1
                 continue
 
-            album = self._find_album(titolo_album, artista_nome, artista_comp)
-            if not album:
+            album_id = index.find_album(titolo_album, artista_nome, artista_comp)
+            if not album_id:
                 missing_album += 1
                 errors.append(
                     f"Album non trovato per '{titolo_brano}' "
                     f"({titolo_album} - {artista_nome or artista_comp})"
                 )
                 continue
+            partitions[album_id].append(titolo_brano)
 
-            qs = Brano.objects.filter(titolo_brano=titolo_brano, album_appartenenza=album)
-            if qs.exists():
-                if skip_existing or not update_existing:
-                    skipped_count += 1
-                    continue
-                brano = qs.first()
-                action = "updated"
-            else:
-                brano = Brano(album_appartenenza=album)
-                action = "created"
-
-            album_progressivi.setdefault(album.pk, album.brani.count())
-            album_progressivi[album.pk] += 1
-            progressivo = album_progressivi[album.pk]
+        workers = effective_workers(options["workers"])
+        groups = split_balanced(partitions.items(), lambda item: len(item[1]), workers)
+        results = run_in_threads(
+            lambda item: self._import_album(*item, skip_existing=skip_existing, update_existing=update_existing),
+            groups,
+        )
 
-            brano.titolo_brano = titolo_brano[: Brano._meta.get_field("titolo_brano").max_length]
-            max_prog_len = Brano._meta.get_field("progressivo").max_length
-            brano.progressivo = str(progressivo).zfill(max_prog_len)
-            brano.sezione = None
-            brano.crediti = None
-            brano.durata = None
+        created_count = sum(result.created for result in results)
+        updated_count = sum(result.updated for result in results)
+        skipped_count += sum(result.skipped for result in results)
+        touched_albums = {result.album_id for result in results if result.created or result.updated}
+        for result in results:
+            errors.extend(result.errors)
 
-            try:
-                with transaction.atomic():
-                    brano.save()
-                if action == "created":
-                    created_count += 1
-                else:
-                    updated_count += 1
-            except Exception as exc:
-                errors.append(f"Errore con '{titolo_brano}': {exc}")
-                skipped_count += 1
+        refresh_stats_for_album_ids(touched_albums)
 
         self.stdout.write("")
         self.stdout.write(self.style.SUCCESS("=" * 50))
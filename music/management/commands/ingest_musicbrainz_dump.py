@@ -0,0 +1,63 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from music.models import Artista
+from music.services import musicbrainz_local
+
+
+class Command(BaseCommand):
+    help = (
+        "Carica un dump JSON delle release MusicBrainz (release.tar.xz o file JSON, "
+        "una release per riga) nel mirror SQLite usato con MUSICBRAINZ_BACKEND=local"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dump", help="Percorso del dump (release.tar.xz, .json, .json.gz/.xz/.bz2)")
+        parser.add_argument(
+            "--db",
+            default=None,
+            help="File SQLite di destinazione (default: MUSICBRAINZ_LOCAL_DB)",
+        )
+        parser.add_argument(
+            "--solo-catalogo",
+            action="store_true",
+            help="Tiene solo le release degli artisti presenti in catalogo (estratto ridotto)",
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Ricrea il mirror da zero invece di aggiornarlo",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Release per transazione (default 1000)")
+
+    def handle(self, *args, **options):
+        dump = options["dump"]
+        if not os.path.exists(dump):
+            raise CommandError(f"File non trovato: {dump}")
+        path = options["db"] or musicbrainz_local.db_path()
+
+        if options["reset"] and os.path.exists(path):
+            os.remove(path)
+
+        artists = None
+        if options["solo_catalogo"]:
+            artists = {
+                musicbrainz_local.normalize_name(name)
+                for name in Artista.objects.values_list("nome_artista", flat=True)
+            }
+            self.stdout.write(f"Filtro su {len(artists)} artisti del catalogo")
+
+        started = time.monotonic()
+        count = musicbrainz_local.ingest(
+            musicbrainz_local.iter_dump(dump),
+            path=path,
+            artists=artists,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Release caricate: {count} in {time.monotonic() - started:.1f}s → {path}"
+            )
+        )
@@ -2,9 +2,11 @@ from pathlib import Path
 
 from django.core.files import File
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from django.utils.text import slugify
 
-from music.models import Album
+from music.models import Album, SearchDocument
+from music.services.jobs import enqueue
 
 
 class Command(BaseCommand):
@@ -14,6 +16,8 @@ class Command(BaseCommand):
     )
 
     SUPPORTED_EXTENSIONS = [".png", ".jpg", ".jpeg", ".gif", ".webp"]
+    # Callback (elaborati, totale) impostata dal task in background (music/tasks.py)
+    progress = None
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -43,6 +47,11 @@ class Command(BaseCommand):
             action="store_true",
             help="Mostra cosa verrebbe fatto senza salvare nel database",
         )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Accoda il caricamento come job (eseguito da run_worker) e termina subito",
+        )
 
     def _resolve_dir(self, images_dir: str) -> Path | None:
         dir_path = Path(images_dir)
@@ -106,6 +115,19 @@ class Command(BaseCommand):
             )
             return
 
+        if options["background"]:
+            job = enqueue(
+                "load_album_covers",
+                chiave="load_album_covers",
+                images_dir=str(images_dir.resolve()),
+                overwrite=overwrite,
+                clear=clear,
+                limit=limit,
+                dry_run=dry_run,
+            )
+            self.stdout.write(self.style.SUCCESS(f"Job #{job.pk} accodato: lo esegue 'manage.py run_worker'"))
+            return
+
         self.stdout.write(f"Directory immagini: {images_dir}")
 
         # Elimina tutte le copertine esistenti se richiesto
@@ -114,7 +136,8 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING("[DRY RUN] Eliminerei tutte le copertine esistenti"))
             else:
                 cleared = Album.objects.exclude(copertina='').exclude(copertina__isnull=True).count()
-                Album.objects.all().update(copertina='')
+                Album.objects.all().update(copertina='', aggiornato_il=timezone.now())
+                SearchDocument.objects.filter(tipo=SearchDocument.TIPO_ALBUM).update(copertina='')
                 self.stdout.write(self.style.SUCCESS(f"Eliminate {cleared} copertine esistenti"))
 
         albums = Album.objects.all().order_by("pk")
@@ -130,7 +153,9 @@ class Command(BaseCommand):
         errors = 0
         preview = 0
 
-        for album in albums:
+        for index, album in enumerate(albums, 1):
+            if self.progress and (index % 50 == 0 or index == total):
+                self.progress(index, total)
             image_path = self._find_image_for_album(images_dir, album.titolo_album)
             if not image_path:
                 skipped_missing += 1
@@ -156,7 +181,9 @@ class Command(BaseCommand):
                     f"{slugify(album.titolo_album)}{image_path.suffix.lower()}"
                 )
                 with image_path.open("rb") as img_file:
-                    album.copertina.save(filename, File(img_file), save=True)
+                    album.copertina.save(filename, File(img_file), save=False)
+                # Solo la copertina: import_all carica i brani (e le statistiche) in parallelo
+                album.save(update_fields=["copertina"])
                 updated += 1
             except Exception as exc:
                 errors += 1
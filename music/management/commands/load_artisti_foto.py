@@ -2,9 +2,12 @@ from pathlib import Path
 
 from django.core.files import File
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from django.utils.text import slugify
 
 from music.models import Artista
+from music.services.cache_generation import bump_generation
+from music.services.jobs import enqueue
 
 
 class Command(BaseCommand):
@@ -14,6 +17,8 @@ class Command(BaseCommand):
     )
 
     SUPPORTED_EXTENSIONS = [".png", ".jpg", ".jpeg", ".gif", ".webp"]
+    # Callback (elaborati, totale) impostata dal task in background (music/tasks.py)
+    progress = None
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -43,6 +48,11 @@ class Command(BaseCommand):
             action="store_true",
             help="Mostra cosa verrebbe fatto senza salvare nel database",
         )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Accoda il caricamento come job (eseguito da run_worker) e termina subito",
+        )
 
     def _resolve_dir(self, images_dir: str) -> Path | None:
         dir_path = Path(images_dir)
@@ -106,6 +116,19 @@ class Command(BaseCommand):
             )
             return
 
+        if options["background"]:
+            job = enqueue(
+                "load_artisti_foto",
+                chiave="load_artisti_foto",
+                images_dir=str(images_dir.resolve()),
+                overwrite=overwrite,
+                clear=clear,
+                limit=limit,
+                dry_run=dry_run,
+            )
+            self.stdout.write(self.style.SUCCESS(f"Job #{job.pk} accodato: lo esegue 'manage.py run_worker'"))
+            return
+
         self.stdout.write(f"Directory immagini: {images_dir}")
 
         # Elimina tutte le foto esistenti se richiesto
@@ -114,7 +137,9 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING("[DRY RUN] Eliminerei tutte le foto esistenti"))
             else:
                 cleared = Artista.objects.exclude(foto_artista='').exclude(foto_artista__isnull=True).count()
-                Artista.objects.all().update(foto_artista='')
+                Artista.objects.all().update(foto_artista='', aggiornato_il=timezone.now())
+                # update() non emette segnali: invalida la griglia della homepage
+                bump_generation("artisti")
                 self.stdout.write(self.style.SUCCESS(f"Eliminate {cleared} foto esistenti"))
 
         artisti = Artista.objects.all().order_by("pk")
@@ -130,7 +155,9 @@ class Command(BaseCommand):
         errors = 0
         preview = 0
 
-        for artista in artisti:
+        for index, artista in enumerate(artisti, 1):
+            if self.progress and (index % 50 == 0 or index == total):
+                self.progress(index, total)
             image_path = self._find_image_for_artista(images_dir, artista.nome_artista)
             if not image_path:
                 skipped_missing += 1
@@ -156,7 +183,8 @@ class Command(BaseCommand):
                     f"{slugify(artista.nome_artista)}{image_path.suffix.lower()}"
                 )
                 with image_path.open("rb") as img_file:
-                    artista.foto_artista.save(filename, File(img_file), save=True)
+                    artista.foto_artista.save(filename, File(img_file), save=False)
+                    artista.save(update_fields=["foto_artista"])
                 updated += 1
             except Exception as exc:
                 errors += 1
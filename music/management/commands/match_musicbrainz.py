@@ -0,0 +1,140 @@
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from music.models import MusicBrainzMatch
+from music.services.circuit import host_breaker
+from music.services.matching import (
+    DEFAULT_MARGIN,
+    DEFAULT_THRESHOLD,
+    albums_to_match,
+    match_album,
+)
+from music.services.musicbrainz import MUSICBRAINZ_API_URL
+
+# Stati definitivi: questi album vengono saltati alla ripresa, salvo --retry
+FINAL_STATES = {
+    MusicBrainzMatch.STATO_ABBINATO,
+    MusicBrainzMatch.STATO_AMBIGUO,
+    MusicBrainzMatch.STATO_NESSUNO,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Abbina in blocco gli album senza brani (o con durate mancanti) alle release "
+        "MusicBrainz e ne importa i brani. Le decisioni sono salvate: se interrotto, "
+        "rilanciando riprende dagli album non ancora elaborati"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Numero massimo di album da elaborare")
+        parser.add_argument("--album", type=int, nargs="+", default=None, help="Elabora solo questi album (pk)")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f"Punteggio minimo per accettare una release (default {DEFAULT_THRESHOLD})",
+        )
+        parser.add_argument(
+            "--margin",
+            type=float,
+            default=DEFAULT_MARGIN,
+            help=f"Distacco minimo dal secondo candidato (default {DEFAULT_MARGIN})",
+        )
+        parser.add_argument(
+            "--retry",
+            nargs="+",
+            choices=sorted(FINAL_STATES),
+            default=[],
+            help="Rielabora anche gli album già decisi con questi stati",
+        )
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            default=20,
+            help="Interrompe dopo N errori MusicBrainz consecutivi (default 20)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Mostra le decisioni senza importare brani né salvarle",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        skip_states = FINAL_STATES - set(options["retry"])
+
+        albums = albums_to_match().exclude(musicbrainz_match__stato__in=skip_states)
+        if options["album"]:
+            albums = albums.filter(pk__in=options["album"])
+        if options["limit"]:
+            albums = albums[: options["limit"]]
+        album_ids = list(albums.values_list("pk", flat=True))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN - nessun dato sarà scritto"))
+        self.stdout.write(f"Album da elaborare: {len(album_ids)}")
+
+        breaker = host_breaker(urlsplit(MUSICBRAINZ_API_URL).hostname)
+        totals = Counter()
+        consecutive_errors = 0
+        started = time.monotonic()
+        try:
+            for index, album_id in enumerate(album_ids, start=1):
+                # Ricaricato a ogni giro: la lista può essere lunga e l'album modificato nel frattempo
+                album = albums_to_match().filter(pk=album_id).first()
+                if album is None:
+                    continue
+                match = match_album(
+                    album,
+                    threshold=options["threshold"],
+                    margin=options["margin"],
+                    dry_run=dry_run,
+                )
+                totals[match.stato] += 1
+                totals["creati"] += match.brani_creati
+                totals["aggiornati"] += match.brani_aggiornati
+                self._report(index, len(album_ids), album, match, started)
+
+                if match.stato != MusicBrainzMatch.STATO_ERRORE:
+                    consecutive_errors = 0
+                    continue
+                consecutive_errors += 1
+                if consecutive_errors >= options["max_errors"]:
+                    raise CommandError(
+                        f"{consecutive_errors} errori MusicBrainz consecutivi: interrotto. "
+                        "Rilancia il comando per riprendere."
+                    )
+                if breaker.is_open:
+                    # MusicBrainz non risponde: inutile consumare album, si attende la riapertura
+                    wait = getattr(settings, "CIRCUIT_RESET_TIMEOUT", 60)
+                    self.stdout.write(self.style.WARNING(f"Circuito MusicBrainz aperto, attendo {wait}s"))
+                    time.sleep(wait)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrotto: rilancia il comando per riprendere."))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Abbinati: {totals[MusicBrainzMatch.STATO_ABBINATO]}, "
+                f"ambigui: {totals[MusicBrainzMatch.STATO_AMBIGUO]}, "
+                f"senza risultati: {totals[MusicBrainzMatch.STATO_NESSUNO]}, "
+                f"errori: {totals[MusicBrainzMatch.STATO_ERRORE]} - "
+                f"brani creati: {totals['creati']}, aggiornati: {totals['aggiornati']}"
+            )
+        )
+
+    def _report(self, index, total, album, match, started):
+        elapsed = time.monotonic() - started
+        remaining = elapsed / index * (total - index)
+        line = (
+            f"[{index}/{total}, ~{remaining / 60:.0f} min] "
+            f"{album.artista_appartenenza.nome_artista} - {album.titolo_album}: "
+            f"{match.get_stato_display()} ({match.punteggio:.2f})"
+        )
+        if match.messaggio:
+            line += f" - {match.messaggio}"
+        self.stdout.write(line)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from music.services.search_index import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Ricostruisce l'indice della ricerca globale (SearchDocument) da artisti, "
+        "album e brani; da eseguire dopo import o update() in blocco"
+    )
+
+    def handle(self, *args, **options):
+        counts = rebuild_search_index()
+        for tipo, count in counts.items():
+            self.stdout.write(f"Documenti {tipo}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Indice ricostruito: {sum(counts.values())} documenti"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from music.services.album_stats import recompute_all_album_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Ricalcola le statistiche denormalizzate degli album "
+        "(numero brani, durata totale, numero dischi) e corregge quelle disallineate"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Mostra gli album disallineati senza salvare nel database",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        drifted = recompute_all_album_stats(dry_run=dry_run)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN - nessun dato sarà scritto"))
+            for album in drifted[:20]:
+                self.stdout.write(
+                    f"[Anteprima] album {album.pk}: {album.numero_brani} brani, "
+                    f"{album.durata_totale_secondi}s, {album.numero_dischi} dischi"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Album disallineati: {len(drifted)}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from music.models import Album
+
+
+class Command(BaseCommand):
+    help = (
+        "Ricalcola la chiave di ordinamento materializzata degli album "
+        "(Classica in coda + nome artista), utile dopo update massivi che non passano da save()"
+    )
+
+    def handle(self, *args, **options):
+        updated = Album.objects.all().refresh_catalogue_order()
+        self.stdout.write(self.style.SUCCESS(f"Album aggiornati: {updated}"))
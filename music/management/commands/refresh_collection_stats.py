@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from music.services.collection_stats import refresh_collection_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Ricalcola il riepilogo delle statistiche della collezione (spesa, album "
+        "completati per anno, editore, supporto, deposito e genere); da pianificare con cron"
+    )
+
+    def handle(self, *args, **options):
+        righe = refresh_collection_stats()
+        self.stdout.write(self.style.SUCCESS(f"Statistiche aggiornate: {righe} righe"))
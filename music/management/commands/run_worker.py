@@ -0,0 +1,81 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from music.models import Job
+from music.services.jobs import claim_next, requeue_stale, run_job, worker_name
+
+
+def _close_old_connections():
+    # Dentro una transazione (test) la connessione non va chiusa
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Esegue i job in background (report PDF, import brani, caricamento immagini) "
+        "presi dalla tabella Job; da avviare come servizio (systemd)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Esegue i job pronti e termina invece di restare in attesa",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=None,
+            help="Secondi di attesa quando la coda è vuota (default: JOB_POLL_INTERVAL)",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Termina dopo aver eseguito questo numero di job",
+        )
+
+    def _stop(self, signum, frame):
+        # Il job in corso viene completato, poi il worker esce
+        self.stdout.write(f"Segnale {signum}: arresto dopo il job corrente")
+        self.stopping.set()
+
+    def handle(self, *args, **options):
+        sleep = settings.JOB_POLL_INTERVAL if options["sleep"] is None else options["sleep"]
+        max_jobs = options["max_jobs"]
+        worker = worker_name()
+        self.stopping = threading.Event()
+        previous = {sig: signal.signal(sig, self._stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Rimessi in coda {requeued} job interrotti"))
+        if not options["once"]:
+            self.stdout.write(f"Worker {worker} in attesa di job")
+
+        eseguiti = 0
+        try:
+            while not self.stopping.is_set() and (max_jobs is None or eseguiti < max_jobs):
+                # Connessioni scadute o interrotte (CONN_MAX_AGE) chiuse tra un job e l'altro
+                _close_old_connections()
+                job = claim_next(worker)
+                if job is None:
+                    if options["once"]:
+                        break
+                    self.stopping.wait(sleep)
+                    requeue_stale()
+                    continue
+                run_job(job)
+                eseguiti += 1
+                style = self.style.SUCCESS if job.stato == Job.STATO_COMPLETATO else self.style.WARNING
+                self.stdout.write(style(f"Job #{job.pk} {job.nome}: {job.get_stato_display()} {job.messaggio}".rstrip()))
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            _close_old_connections()
+        self.stdout.write(f"Job eseguiti: {eseguiti}")
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:09
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def _parse_duration(value):
+    parts = str(value or "").strip().split(":")
+    if not all(part.isdigit() for part in parts) or len(parts) > 3:
+        return 0
+    total = 0
+    for part in parts:
+        total = total * 60 + int(part)
+    return total
+
+
+def backfill_album_stats(apps, schema_editor):
+    Album = apps.get_model("music", "Album")
+    Brano = apps.get_model("music", "Brano")
+
+    rows_by_album = defaultdict(list)
+    for album_id, durata, sezione in Brano.objects.values_list(
+        "album_appartenenza_id", "durata", "sezione"
+    ).iterator():
+        rows_by_album[album_id].append((durata, sezione))
+
+    albums = []
+    for album in Album.objects.filter(pk__in=rows_by_album.keys()).iterator():
+        rows = rows_by_album[album.pk]
+        sezioni = {s.strip().lower() for _, s in rows if s and s.strip()}
+        album.numero_brani = len(rows)
+        album.durata_totale_secondi = sum(_parse_duration(d) for d, _ in rows)
+        album.numero_dischi = len(sezioni) or 1
+        albums.append(album)
+    Album.objects.bulk_update(
+        albums,
+        ["numero_brani", "durata_totale_secondi", "numero_dischi"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0005_brano_ascolto_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='durata_totale_secondi',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='numero_brani',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='numero_dischi',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_album_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:11
+
+from django.db import migrations, models
+
+
+def _parse_duration(value):
+    parts = str(value or "").strip().split(":")
+    if not all(part.isdigit() for part in parts) or len(parts) > 3:
+        return None
+    total = 0
+    for part in parts:
+        total = total * 60 + int(part)
+    return total
+
+
+def backfill_numeric_fields(apps, schema_editor):
+    Brano = apps.get_model("music", "Brano")
+    batch = []
+    for brano in Brano.objects.only("pk", "durata", "progressivo").iterator():
+        progressivo = (brano.progressivo or "").strip()
+        brano.durata_secondi = _parse_duration(brano.durata)
+        brano.posizione = int(progressivo) if progressivo.isdigit() else None
+        batch.append(brano)
+        if len(batch) >= 1000:
+            Brano.objects.bulk_update(batch, ["durata_secondi", "posizione"])
+            batch = []
+    if batch:
+        Brano.objects.bulk_update(batch, ["durata_secondi", "posizione"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0006_album_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brano',
+            name='durata_secondi',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='brano',
+            name='posizione',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_numeric_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='brano',
+            index=models.Index(fields=['album_appartenenza', 'sezione', 'posizione'], name='brano_album_ordine_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:12
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0007_brano_durata_secondi_posizione'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(fields=['titolo_album', 'artista_appartenenza'], name='album_titolo_artista_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(condition=models.Q(('closed', True)), fields=['artista_appartenenza'], name='album_closed_artista_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(django.db.models.functions.text.Lower('genere'), name='album_genere_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artista',
+            index=models.Index(fields=['nome_artista'], name='artista_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='brano',
+            index=models.Index(models.F('album_appartenenza'), django.db.models.functions.text.Lower('titolo_brano'), name='brano_album_titolo_lower_idx'),
+        ),
+    ]
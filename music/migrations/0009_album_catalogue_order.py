@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:13
+
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+from django.db.models.functions import Lower, Trim
+from django.db.models.lookups import Exact
+
+
+def backfill_catalogue_order(apps, schema_editor):
+    Album = apps.get_model("music", "Album")
+    Artista = apps.get_model("music", "Artista")
+    Album.objects.update(
+        classica_in_coda=Case(
+            When(Exact(Lower(Trim("genere")), "classica"), then=Value(True)),
+            default=Value(False),
+        ),
+        artista_ordinamento=Subquery(
+            Artista.objects.filter(pk=OuterRef("artista_appartenenza")).values("nome_artista")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='artista_ordinamento',
+            field=models.CharField(default='', editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='classica_in_coda',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_catalogue_order, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(models.F('classica_in_coda'), models.OrderBy(models.F('genere'), descending=True), models.F('artista_ordinamento'), models.F('supporto'), models.F('data_rilascio'), models.F('titolo_album'), name='album_catalogo_ordine_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0009_album_catalogue_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MusicBrainzMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stato', models.CharField(choices=[('abbinato', 'Abbinato'), ('ambiguo', 'Ambiguo'), ('nessuno', 'Nessun risultato'), ('errore', 'Errore')], max_length=10)),
+                ('release_mbid', models.CharField(blank=True, default='', max_length=36)),
+                ('punteggio', models.FloatField(default=0)),
+                ('candidati', models.JSONField(blank=True, default=list)),
+                ('messaggio', models.CharField(blank=True, default='', max_length=255)),
+                ('brani_creati', models.PositiveIntegerField(default=0)),
+                ('brani_aggiornati', models.PositiveIntegerField(default=0)),
+                ('aggiornato_il', models.DateTimeField(auto_now=True)),
+                ('album', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='musicbrainz_match', to='music.album')),
+            ],
+            options={
+                'verbose_name': 'Abbinamento MusicBrainz',
+                'verbose_name_plural': 'Abbinamenti MusicBrainz',
+                'indexes': [models.Index(fields=['stato'], name='mbmatch_stato_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_musicbrainz_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='mb_release_id',
+            field=models.CharField(blank=True, default='', editable=False, max_length=36),
+        ),
+        migrations.AddField(
+            model_name='artista',
+            name='mb_artist_id',
+            field=models.CharField(blank=True, default='', editable=False, max_length=36),
+        ),
+        migrations.AddField(
+            model_name='brano',
+            name='mb_recording_id',
+            field=models.CharField(blank=True, default='', editable=False, max_length=36),
+        ),
+    ]
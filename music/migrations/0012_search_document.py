@@ -0,0 +1,147 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia della logica di music.services.search_index al momento della migrazione:
+# la migrazione lavora sui modelli storici e non deve dipendere dal codice attuale
+
+VECTOR_SQL = [
+    """
+    ALTER TABLE music_searchdocument ADD COLUMN vettore tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(titolo, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(testo, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX searchdocument_vettore_gin ON music_searchdocument USING GIN (vettore)",
+]
+
+
+def add_search_vector(apps, schema_editor):
+    # Colonna tsvector generata e indice GIN: solo PostgreSQL
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for statement in VECTOR_SQL:
+        schema_editor.execute(statement)
+
+
+def _text(*values):
+    return " ".join(str(value).strip() for value in values if value).lower()
+
+
+def _artist_documents(Artista):
+    for row in Artista.objects.values("pk", "nome_artista", "profilo", "componenti").iterator():
+        yield dict(
+            tipo="artista",
+            ordine_tipo=0,
+            oggetto_id=row["pk"],
+            artista_id=row["pk"],
+            titolo=row["nome_artista"],
+            artista_nome=row["nome_artista"],
+            testo=_text(row["nome_artista"], row["profilo"], row["componenti"]),
+        )
+
+
+def _album_documents(Album):
+    fields = (
+        "pk",
+        "titolo_album",
+        "editore",
+        "genere",
+        "note",
+        "data_rilascio",
+        "copertina",
+        "artista_appartenenza",
+        "artista_appartenenza__nome_artista",
+    )
+    for row in Album.objects.values(*fields).iterator():
+        artista_nome = row["artista_appartenenza__nome_artista"]
+        yield dict(
+            tipo="album",
+            ordine_tipo=1,
+            oggetto_id=row["pk"],
+            artista_id=row["artista_appartenenza"],
+            album_id=row["pk"],
+            titolo=row["titolo_album"],
+            artista_nome=artista_nome,
+            album_titolo=row["titolo_album"],
+            anno=row["data_rilascio"].year if row["data_rilascio"] else None,
+            copertina=row["copertina"] or "",
+            testo=_text(row["titolo_album"], artista_nome, row["editore"], row["genere"], row["note"]),
+        )
+
+
+def _track_documents(Brano):
+    fields = (
+        "pk",
+        "titolo_brano",
+        "crediti",
+        "durata",
+        "album_appartenenza",
+        "album_appartenenza__titolo_album",
+        "album_appartenenza__artista_appartenenza",
+        "album_appartenenza__artista_appartenenza__nome_artista",
+    )
+    for row in Brano.objects.values(*fields).iterator():
+        yield dict(
+            tipo="brano",
+            ordine_tipo=2,
+            oggetto_id=row["pk"],
+            artista_id=row["album_appartenenza__artista_appartenenza"],
+            album_id=row["album_appartenenza"],
+            titolo=row["titolo_brano"],
+            artista_nome=row["album_appartenenza__artista_appartenenza__nome_artista"],
+            album_titolo=row["album_appartenenza__titolo_album"],
+            crediti=row["crediti"] or "",
+            durata=row["durata"] or "",
+            testo=_text(row["titolo_brano"], row["crediti"]),
+        )
+
+
+def populate_search_documents(apps, schema_editor):
+    SearchDocument = apps.get_model("music", "SearchDocument")
+    documents = (
+        _artist_documents(apps.get_model("music", "Artista")),
+        _album_documents(apps.get_model("music", "Album")),
+        _track_documents(apps.get_model("music", "Brano")),
+    )
+    for rows in documents:
+        SearchDocument.objects.bulk_create((SearchDocument(**row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_musicbrainz_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('artista', 'Artista'), ('album', 'Album'), ('brano', 'Brano')], max_length=7)),
+                ('oggetto_id', models.PositiveBigIntegerField()),
+                ('ordine_tipo', models.PositiveSmallIntegerField(default=0)),
+                ('titolo', models.CharField(max_length=150)),
+                ('artista_nome', models.CharField(max_length=120)),
+                ('album_titolo', models.CharField(blank=True, default='', max_length=140)),
+                ('anno', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('crediti', models.CharField(blank=True, default='', max_length=100)),
+                ('durata', models.CharField(blank=True, default='', max_length=5)),
+                ('copertina', models.CharField(blank=True, default='', max_length=255)),
+                ('testo', models.TextField()),
+                ('album', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='music.album')),
+                ('artista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='music.artista')),
+            ],
+            options={
+                'verbose_name': 'Documento di ricerca',
+                'verbose_name_plural': 'Documenti di ricerca',
+                'indexes': [models.Index(fields=['ordine_tipo', 'titolo'], name='searchdocument_ordine_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'oggetto_id'), name='searchdocument_oggetto_unique')],
+            },
+        ),
+        migrations.RunPython(add_search_vector, migrations.RunPython.noop),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
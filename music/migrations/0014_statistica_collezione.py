@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0013_album_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticaCollezione',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimensione', models.CharField(choices=[('totale', 'Totale'), ('anno', 'Anno di rilascio'), ('editore', 'Editore'), ('supporto', 'Supporto'), ('deposito', 'Deposito'), ('genere', 'Genere')], max_length=10)),
+                ('valore', models.CharField(blank=True, default='', max_length=40)),
+                ('numero_album', models.PositiveIntegerField(default=0)),
+                ('album_completati', models.PositiveIntegerField(default=0)),
+                ('spesa_totale', models.FloatField(default=0, help_text='in EU €')),
+                ('aggiornato_il', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Statistica collezione',
+                'verbose_name_plural': 'Statistiche collezione',
+                'constraints': [models.UniqueConstraint(fields=('dimensione', 'valore'), name='statistica_dimensione_valore_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Ricerche dell'admin (icontains = UPPER(col::text) LIKE UPPER('%...%')): solo un
+# indice trigram sulla stessa espressione evita la scansione dell'intera tabella.
+TRIGRAM_INDEXES = [
+    ("artista_nome_trgm_idx", "music_artista", "nome_artista"),
+    ("album_titolo_trgm_idx", "music_album", "titolo_album"),
+    ("brano_titolo_trgm_idx", "music_brano", "titolo_brano"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING GIN (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _table, _column in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0014_statistica_collezione'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0015_admin_search_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('parametri', models.JSONField(blank=True, default=dict)),
+                ('chiave', models.CharField(blank=True, db_index=True, default='', max_length=200)),
+                ('stato', models.CharField(choices=[('in_coda', 'In coda'), ('in_esecuzione', 'In esecuzione'), ('completato', 'Completato'), ('fallito', 'Fallito')], default='in_coda', max_length=15)),
+                ('priorita', models.SmallIntegerField(default=0)),
+                ('tentativi', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativi', models.PositiveSmallIntegerField(default=3)),
+                ('esegui_dopo', models.DateTimeField()),
+                ('progresso', models.PositiveSmallIntegerField(default=0, help_text='percentuale')),
+                ('messaggio', models.CharField(blank=True, default='', max_length=255)),
+                ('risultato', models.JSONField(blank=True, null=True)),
+                ('errore', models.TextField(blank=True, default='')),
+                ('file', models.FileField(blank=True, upload_to='job/')),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('creato_il', models.DateTimeField(auto_now_add=True)),
+                ('avviato_il', models.DateTimeField(blank=True, null=True)),
+                ('completato_il', models.DateTimeField(blank=True, null=True)),
+                ('creato_da', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Job',
+                'ordering': ['-creato_il'],
+                'indexes': [models.Index(fields=['stato', '-priorita', 'esegui_dopo'], name='job_coda_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0016_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
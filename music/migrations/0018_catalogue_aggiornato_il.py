@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0017_album_import_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='aggiornato_il',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='artista',
+            name='aggiornato_il',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
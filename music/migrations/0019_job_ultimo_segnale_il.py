@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+def backfill_ultimo_segnale(apps, schema_editor):
+    # I job già avviati partono dall'ora di avvio, come misurava requeue_stale
+    Job = apps.get_model("music", "Job")
+    Job.objects.filter(avviato_il__isnull=False).update(ultimo_segnale_il=models.F("avviato_il"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0018_catalogue_aggiornato_il'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='ultimo_segnale_il',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_ultimo_segnale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:35
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+from django.db.models.functions import Lower, Trim
+from django.db.models.lookups import Exact
+
+
+def ricalcola_classica_in_coda(apps, schema_editor):
+    # Generi come " Classica " erano classificati in modo diverso da save(),
+    # refresh_catalogue_order e dal backfill della 0009
+    Album = apps.get_model("music", "Album")
+    Album.objects.update(
+        classica_in_coda=Case(
+            When(Exact(Lower(Trim("genere")), "classica"), then=Value(True)),
+            default=Value(False),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0019_job_ultimo_segnale_il'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='album',
+            name='album_genere_lower_idx',
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('genere')), name='album_genere_lower_idx'),
+        ),
+        migrations.RunPython(ricalcola_classica_in_coda, migrations.RunPython.noop),
+    ]
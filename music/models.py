@@ -1,5 +1,12 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Case, F, OuterRef, Prefetch, Q, Subquery, Value, When
+from django.db.models.functions import Lower, Trim
+from django.db.models.lookups import Exact
 from django.urls import reverse
+
+from music.services.durations import format_duration, parse_duration
+
 # Create your models here.
 
 """ il modello generico di un Autore """
@@ -9,6 +16,10 @@ class Artista(models.Model):
     profilo = models.TextField(blank=True, null=True)
     sites = models.CharField(max_length=100, blank=True, null=True)
     componenti = models.CharField(max_length=300, blank=True, null=True, default=None)
+    # Identificativo MusicBrainz, salvato al primo import per evitare nuove ricerche
+    mb_artist_id = models.CharField(max_length=36, blank=True, default="", editable=False)
+    # Ultima modifica: insieme ai conteggi dà la versione del catalogo (report PDF)
+    aggiornato_il = models.DateTimeField(auto_now=True, db_index=True)
    
     def __str__(self):
         return self.nome_artista
@@ -22,9 +33,22 @@ class Artista(models.Model):
     def get_absolute_url(self):
         return reverse("artista_view", kwargs={"pk": self.pk})
 
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"aggiornato_il"}
+        super().save(*args, **kwargs)
+        # Mantiene allineata la chiave di ordinamento denormalizzata degli album
+        self.albums.exclude(artista_ordinamento=self.nome_artista).update(
+            artista_ordinamento=self.nome_artista
+        )
+
     class Meta:
         verbose_name = "Artista"
         verbose_name_plural = "Artisti"
+        indexes = [
+            # Ordinamento alfabetico di tutte le liste
+            models.Index(fields=["nome_artista"], name="artista_nome_idx"),
+        ]
 
 class Stile(models.Model):
     stile = models.CharField(max_length=20)
@@ -37,6 +61,56 @@ class Stile(models.Model):
         verbose_name_plural = "Stili"
 
 
+# Definizione unica di "Classica in coda", in SQL e in Python: genere senza spazi
+# iniziali e finali, senza distinzione tra maiuscole e minuscole
+GENERE_CLASSICA = "classica"
+
+
+def genere_normalizzato(genere: str | None) -> str:
+    return (genere or "").strip(" ").lower()
+
+
+def genere_normalizzato_sql(campo: str = "genere"):
+    return Lower(Trim(campo))
+
+
+class AlbumQuerySet(models.QuerySet):
+    # "Classica" in coda, poi genere (Z->A), artista, supporto, anno, titolo
+    CATALOGUE_ORDERING = (
+        "classica_in_coda",
+        "-genere",
+        "artista_ordinamento",
+        "supporto",
+        "data_rilascio",
+        "titolo_album",
+    )
+
+    def catalogue_order(self):
+        return self.order_by(*self.CATALOGUE_ORDERING)
+
+    def with_detail(self):
+        """
+        Pagina di dettaglio: artista in join, brani in ordine di posizione e stili
+        precaricati; album.brani.all() e album.stili.all() non fanno altre query.
+        """
+        return self.select_related("artista_appartenenza").prefetch_related(
+            Prefetch("brani", queryset=Brano.objects.order_by(*Brano.ALBUM_ORDERING)),
+            Prefetch("stili", queryset=Stile.objects.order_by("stile")),
+        )
+
+    def refresh_catalogue_order(self):
+        """Ricalcola in SQL la chiave di ordinamento (backfill dopo update massivi)."""
+        return self.update(
+            classica_in_coda=Case(
+                When(Exact(genere_normalizzato_sql(), GENERE_CLASSICA), then=Value(True)),
+                default=Value(False),
+            ),
+            artista_ordinamento=Subquery(
+                Artista.objects.filter(pk=OuterRef("artista_appartenenza")).values("nome_artista")[:1]
+            ),
+        )
+
+
 class Album(models.Model):
     titolo_album = models.CharField(max_length=140)
     editore = models.CharField(max_length=40, blank=True, null=True)
@@ -51,22 +125,94 @@ class Album(models.Model):
     artista_appartenenza = models.ForeignKey(Artista, on_delete=models.CASCADE, related_name="albums")
     costo = models.FloatField(help_text="in EU €", default=0)
     closed = models.BooleanField(default=False)
+    # Release MusicBrainz scelta: import e aggiornamenti usano il lookup diretto per MBID
+    mb_release_id = models.CharField(max_length=36, blank=True, default="", editable=False)
+    # Impronta della riga di DatiMusica.xlsx da cui è stato importato (import_albums)
+    import_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
+    # Statistiche denormalizzate, aggiornate da music.services.album_stats
+    numero_brani = models.PositiveIntegerField(default=0, editable=False)
+    durata_totale_secondi = models.PositiveIntegerField(default=0, editable=False)
+    numero_dischi = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Chiave di ordinamento "Classica in coda" materializzata (vedi AlbumQuerySet)
+    classica_in_coda = models.BooleanField(default=False, editable=False)
+    artista_ordinamento = models.CharField(max_length=120, default="", editable=False)
+    # Ultima modifica: insieme ai conteggi dà la versione del catalogo (report PDF)
+    aggiornato_il = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = AlbumQuerySet.as_manager()
     
     def __str__(self):
         return self.titolo_album
 
+    def sync_catalogue_order(self):
+        self.classica_in_coda = genere_normalizzato(self.genere) == GENERE_CLASSICA
+        self.artista_ordinamento = self.artista_appartenenza.nome_artista
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = kwargs["update_fields"] = set(update_fields) | {"aggiornato_il"}
+        if update_fields is None or {"genere", "artista_appartenenza"} & update_fields:
+            self.sync_catalogue_order()
+            if update_fields is not None:
+                kwargs["update_fields"] = update_fields | {"classica_in_coda", "artista_ordinamento"}
+        super().save(*args, **kwargs)
+
     def get_stili(self):
         return self.stili.all()
 
+    @property
+    def durata_totale(self):
+        if not self.durata_totale_secondi:
+            return None
+        hours, rest = divmod(self.durata_totale_secondi, 3600)
+        minutes, seconds = divmod(rest, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        return f"{minutes}:{seconds:02d}"
+
     def get_absolute_url(self):
         return reverse("album_view", kwargs={"pk": self.pk})        
 
     class Meta:
         verbose_name = "Album"
         verbose_name_plural = "Albums"
+        indexes = [
+            # Lookup titolo + artista degli import Excel
+            models.Index(
+                fields=["titolo_album", "artista_appartenenza"],
+                name="album_titolo_artista_idx",
+            ),
+            # Conteggio album completati per artista (indice parziale)
+            models.Index(
+                fields=["artista_appartenenza"],
+                condition=Q(closed=True),
+                name="album_closed_artista_idx",
+            ),
+            # Genere normalizzato ("Classica in coda", genere_normalizzato_sql)
+            models.Index(Lower(Trim("genere")), name="album_genere_lower_idx"),
+            # Ordinamento di catalogo (AlbumQuerySet.catalogue_order)
+            models.Index(
+                "classica_in_coda",
+                F("genere").desc(),
+                "artista_ordinamento",
+                "supporto",
+                "data_rilascio",
+                "titolo_album",
+                name="album_catalogo_ordine_idx",
+            ),
+            # Filtri della lista album (music.services.facets)
+            models.Index(fields=["genere"], name="album_genere_idx"),
+            models.Index(fields=["supporto"], name="album_supporto_idx"),
+            models.Index(fields=["editore"], name="album_editore_idx"),
+            models.Index(fields=["data_rilascio"], name="album_data_rilascio_idx"),
+        ]
 
 
 class Brano(models.Model):
+    # Ordine dei brani nella pagina dell'album (lato, posizione numerica, progressivo)
+    ALBUM_ORDERING = ("sezione", "posizione", "progressivo")
+
     ASCOLTO_FONTE_BANDCAMP = "bandcamp"
     ASCOLTO_FONTE_YOUTUBE = "youtube"
     ASCOLTO_FONTE_CHOICES = [
@@ -79,6 +225,9 @@ class Brano(models.Model):
     progressivo = models.CharField(max_length=3, blank=True, null=True)    
     crediti = models.CharField(max_length=100, blank=True, null=True)
     durata = models.CharField(max_length=5, blank=True, null=True)
+    # Colonne numeriche derivate da durata/progressivo (o dai dati MusicBrainz)
+    durata_secondi = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    posizione = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
     album_appartenenza = models.ForeignKey(Album, on_delete=models.CASCADE, related_name="brani")
     ascolto_url = models.URLField(max_length=500, blank=True, null=True)
     ascolto_fonte = models.CharField(
@@ -87,6 +236,8 @@ class Brano(models.Model):
         blank=True,
         null=True,
     )
+    # Registrazione MusicBrainz: i link di ascolto la consultano prima delle ricerche testuali
+    mb_recording_id = models.CharField(max_length=36, blank=True, default="", editable=False)
 
     def __str__(self):
         return self.titolo_brano
@@ -94,9 +245,36 @@ class Brano(models.Model):
     def get_absolute_url(self):
         return reverse("album_view", kwargs={"pk": self.album_appartenenza.pk})       
 
+    def sync_numeric_fields(self):
+        """
+        Allinea durata_secondi e posizione ai campi testuali.
+        Un valore già impostato (es. da MusicBrainz) viene mantenuto se coerente.
+        """
+        if self.durata_secondi is None or format_duration(self.durata_secondi * 1000) != self.durata:
+            self.durata_secondi = parse_duration(self.durata)
+        progressivo = (self.progressivo or "").strip()
+        if progressivo.isdigit():
+            self.posizione = int(progressivo)
+
+    def save(self, *args, **kwargs):
+        self.sync_numeric_fields()
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Brano"
         verbose_name_plural = "Brani"
+        indexes = [
+            models.Index(
+                fields=["album_appartenenza", "sezione", "posizione"],
+                name="brano_album_ordine_idx",
+            ),
+            # Ricerca case-insensitive del titolo durante l'import MusicBrainz
+            models.Index(
+                F("album_appartenenza"),
+                Lower("titolo_brano"),
+                name="brano_album_titolo_lower_idx",
+            ),
+        ]
 
 
 class AlbumDesiderato(models.Model):
@@ -115,3 +293,194 @@ class AlbumDesiderato(models.Model):
 
 
 
+
+
+class MusicBrainzMatch(models.Model):
+    """Decisione del matching automatico album → release MusicBrainz (match_musicbrainz)."""
+
+    STATO_ABBINATO = "abbinato"
+    STATO_AMBIGUO = "ambiguo"
+    STATO_NESSUNO = "nessuno"
+    STATO_ERRORE = "errore"
+    STATO_CHOICES = [
+        (STATO_ABBINATO, "Abbinato"),
+        (STATO_AMBIGUO, "Ambiguo"),
+        (STATO_NESSUNO, "Nessun risultato"),
+        (STATO_ERRORE, "Errore"),
+    ]
+
+    album = models.OneToOneField(Album, on_delete=models.CASCADE, related_name="musicbrainz_match")
+    stato = models.CharField(max_length=10, choices=STATO_CHOICES)
+    release_mbid = models.CharField(max_length=36, blank=True, default="")
+    punteggio = models.FloatField(default=0)
+    # Migliori candidati con il loro punteggio, per la revisione manuale
+    candidati = models.JSONField(default=list, blank=True)
+    messaggio = models.CharField(max_length=255, blank=True, default="")
+    brani_creati = models.PositiveIntegerField(default=0)
+    brani_aggiornati = models.PositiveIntegerField(default=0)
+    aggiornato_il = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.album} → {self.get_stato_display()}"
+
+    class Meta:
+        verbose_name = "Abbinamento MusicBrainz"
+        verbose_name_plural = "Abbinamenti MusicBrainz"
+        indexes = [models.Index(fields=["stato"], name="mbmatch_stato_idx")]
+
+
+class SearchDocument(models.Model):
+    """
+    Documento della ricerca globale: una riga per artista, album o brano con il
+    testo indicizzato e i campi da mostrare, così la pagina dei risultati non fa
+    altre query. Mantenuto da music.signals; su PostgreSQL la colonna tsvector
+    "vettore" (generata dal database, indice GIN) è aggiunta dalla migrazione.
+    """
+
+    TIPO_ARTISTA = "artista"
+    TIPO_ALBUM = "album"
+    TIPO_BRANO = "brano"
+    TIPO_CHOICES = [
+        (TIPO_ARTISTA, "Artista"),
+        (TIPO_ALBUM, "Album"),
+        (TIPO_BRANO, "Brano"),
+    ]
+
+    tipo = models.CharField(max_length=7, choices=TIPO_CHOICES)
+    oggetto_id = models.PositiveBigIntegerField()
+    # A parità di rilevanza: prima gli artisti, poi gli album, poi i brani
+    ordine_tipo = models.PositiveSmallIntegerField(default=0)
+    artista = models.ForeignKey(Artista, on_delete=models.CASCADE, related_name="+")
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name="+", null=True, blank=True)
+    titolo = models.CharField(max_length=150)
+    artista_nome = models.CharField(max_length=120)
+    album_titolo = models.CharField(max_length=140, blank=True, default="")
+    anno = models.PositiveSmallIntegerField(blank=True, null=True)
+    crediti = models.CharField(max_length=100, blank=True, default="")
+    durata = models.CharField(max_length=5, blank=True, default="")
+    copertina = models.CharField(max_length=255, blank=True, default="")
+    testo = models.TextField()
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.titolo}"
+
+    class Meta:
+        verbose_name = "Documento di ricerca"
+        verbose_name_plural = "Documenti di ricerca"
+        constraints = [
+            models.UniqueConstraint(fields=["tipo", "oggetto_id"], name="searchdocument_oggetto_unique"),
+        ]
+        indexes = [models.Index(fields=["ordine_tipo", "titolo"], name="searchdocument_ordine_idx")]
+
+
+class StatisticaCollezione(models.Model):
+    """
+    Riepilogo materializzato della collezione (numero album, completati, spesa)
+    per anno di rilascio, editore, supporto, deposito e genere. Ricalcolato da
+    ``manage.py refresh_collection_stats``: la pagina delle statistiche legge
+    solo questa tabella, senza aggregare gli album a ogni richiesta.
+    """
+
+    DIMENSIONE_TOTALE = "totale"
+    DIMENSIONE_ANNO = "anno"
+    DIMENSIONE_EDITORE = "editore"
+    DIMENSIONE_SUPPORTO = "supporto"
+    DIMENSIONE_DEPOSITO = "deposito"
+    DIMENSIONE_GENERE = "genere"
+    DIMENSIONE_CHOICES = [
+        (DIMENSIONE_TOTALE, "Totale"),
+        (DIMENSIONE_ANNO, "Anno di rilascio"),
+        (DIMENSIONE_EDITORE, "Editore"),
+        (DIMENSIONE_SUPPORTO, "Supporto"),
+        (DIMENSIONE_DEPOSITO, "Deposito"),
+        (DIMENSIONE_GENERE, "Genere"),
+    ]
+
+    dimensione = models.CharField(max_length=10, choices=DIMENSIONE_CHOICES)
+    # Valore della dimensione ("" = non indicato)
+    valore = models.CharField(max_length=40, blank=True, default="")
+    numero_album = models.PositiveIntegerField(default=0)
+    album_completati = models.PositiveIntegerField(default=0)
+    spesa_totale = models.FloatField(help_text="in EU €", default=0)
+    aggiornato_il = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.get_dimensione_display()}: {self.valore or '-'}"
+
+    @property
+    def percentuale_completati(self):
+        if not self.numero_album:
+            return 0
+        return round(100 * self.album_completati / self.numero_album)
+
+    class Meta:
+        verbose_name = "Statistica collezione"
+        verbose_name_plural = "Statistiche collezione"
+        constraints = [
+            models.UniqueConstraint(fields=["dimensione", "valore"], name="statistica_dimensione_valore_unique"),
+        ]
+
+
+class Job(models.Model):
+    """
+    Lavoro in background (report PDF, import da MusicBrainz, caricamento
+    immagini) eseguito da ``manage.py run_worker``. La coda è questa tabella:
+    nessun broker esterno. Vedi music/services/jobs.py.
+    """
+
+    STATO_IN_CODA = "in_coda"
+    STATO_IN_ESECUZIONE = "in_esecuzione"
+    STATO_COMPLETATO = "completato"
+    STATO_FALLITO = "fallito"
+    STATO_CHOICES = [
+        (STATO_IN_CODA, "In coda"),
+        (STATO_IN_ESECUZIONE, "In esecuzione"),
+        (STATO_COMPLETATO, "Completato"),
+        (STATO_FALLITO, "Fallito"),
+    ]
+
+    PRIORITA_BASSA = -10
+    PRIORITA_NORMALE = 0
+    PRIORITA_ALTA = 10
+
+    # Nome del task registrato (music/tasks.py)
+    nome = models.CharField(max_length=100)
+    parametri = models.JSONField(default=dict, blank=True)
+    # Job equivalenti già in coda o in esecuzione non vengono duplicati
+    chiave = models.CharField(max_length=200, blank=True, default="", db_index=True)
+    stato = models.CharField(max_length=15, choices=STATO_CHOICES, default=STATO_IN_CODA)
+    # Valori più alti vengono eseguiti prima
+    priorita = models.SmallIntegerField(default=PRIORITA_NORMALE)
+    tentativi = models.PositiveSmallIntegerField(default=0)
+    max_tentativi = models.PositiveSmallIntegerField(default=3)
+    esegui_dopo = models.DateTimeField()
+    progresso = models.PositiveSmallIntegerField(default=0, help_text="percentuale")
+    messaggio = models.CharField(max_length=255, blank=True, default="")
+    risultato = models.JSONField(null=True, blank=True)
+    errore = models.TextField(blank=True, default="")
+    file = models.FileField(upload_to="job/", blank=True)
+    worker = models.CharField(max_length=100, blank=True, default="")
+    creato_da = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    creato_il = models.DateTimeField(auto_now_add=True)
+    avviato_il = models.DateTimeField(null=True, blank=True)
+    # Ultimo segno di vita del worker (claim e report_progress): misura se il job è interrotto
+    ultimo_segnale_il = models.DateTimeField(null=True, blank=True)
+    completato_il = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.nome} ({self.get_stato_display()})"
+
+    @property
+    def attivo(self):
+        return self.stato in (self.STATO_IN_CODA, self.STATO_IN_ESECUZIONE)
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Job"
+        ordering = ["-creato_il"]
+        indexes = [
+            # Prossimo job da eseguire: stato + priorità + data
+            models.Index(fields=["stato", "-priorita", "esegui_dopo"], name="job_coda_idx"),
+        ]
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from music.models import Album, Brano
+
+STATS_FIELDS = ["numero_brani", "durata_totale_secondi", "numero_dischi"]
+
+# Aggregati calcolati in SQL: i dischi sono le sezioni distinte (case-insensitive)
+_AGGREGATES = {
+    "numero": Count("id"),
+    "durata": Sum("durata_secondi"),
+    "dischi": Count(Lower("sezione"), distinct=True, filter=Q(sezione__gt="")),
+}
+
+
+@dataclass(frozen=True)
+class AlbumStats:
+    numero_brani: int = 0
+    durata_totale_secondi: int = 0
+    numero_dischi: int = 0
+
+    @classmethod
+    def from_aggregate(cls, row: dict) -> "AlbumStats":
+        numero = row.get("numero") or 0
+        # Un album con brani ma senza sezione conta comunque 1 disco
+        dischi = row.get("dischi") or (1 if numero else 0)
+        return cls(numero, row.get("durata") or 0, dischi)
+
+
+def compute_album_stats(album: Album) -> AlbumStats:
+    row = Brano.objects.filter(album_appartenenza=album).aggregate(**_AGGREGATES)
+    return AlbumStats.from_aggregate(row)
+
+
+def _apply(album: Album, stats: AlbumStats) -> bool:
+    changed = False
+    for field in STATS_FIELDS:
+        value = getattr(stats, field)
+        if getattr(album, field) != value:
+            setattr(album, field, value)
+            changed = True
+    return changed
+
+
+def refresh_album_stats(album: Album) -> bool:
+    """Ricalcola e salva le statistiche di un album. Restituisce True se sono cambiate."""
+    if not _apply(album, compute_album_stats(album)):
+        return False
+    album.save(update_fields=STATS_FIELDS)
+    return True
+
+
+def refresh_stats_for_album_ids(album_ids: Iterable[int]) -> int:
+    updated = 0
+    for album in Album.objects.filter(pk__in=set(album_ids)):
+        if refresh_album_stats(album):
+            updated += 1
+    return updated
+
+
+def recompute_all_album_stats(*, dry_run: bool = False, batch_size: int = 500) -> list[Album]:
+    """
+    Ricalcola le statistiche di tutti gli album con una sola query aggregata
+    raggruppata per album e aggiorna in blocco solo quelli disallineati.
+    """
+    stats_by_album = {
+        row["album_appartenenza"]: AlbumStats.from_aggregate(row)
+        for row in Brano.objects.values("album_appartenenza").annotate(**_AGGREGATES).order_by()
+    }
+
+    drifted = []
+    for album in Album.objects.only("pk", *STATS_FIELDS).iterator():
+        if _apply(album, stats_by_album.get(album.pk, AlbumStats())):
+            drifted.append(album)
+
+    if drifted and not dry_run:
+        now = timezone.now()
+        for album in drifted:
+            album.aggiornato_il = now
+        Album.objects.bulk_update(drifted, [*STATS_FIELDS, "aggiornato_il"], batch_size=batch_size)
+    return drifted
@@ -0,0 +1,44 @@
+"""
+Client httpx.AsyncClient condiviso dalle versioni asincrone dei servizi esterni
+(MusicBrainz, Bandcamp, YouTube): connessioni in keep-alive riusate tra richieste.
+
+Un AsyncClient è legato all'event loop in cui viene usato: sotto uvicorn c'è un
+solo loop per worker, mentre con le viste async servite via WSGI ogni richiesta
+ha il suo loop. Per questo viene creato un client per ciascun loop attivo.
+"""
+import asyncio
+import weakref
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+REQUEST_TIMEOUT = 15
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client() -> "httpx.AsyncClient":
+    if httpx is None:
+        raise ImproperlyConfigured("Le viste asincrone richiedono httpx: pip install httpx")
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """Chiude il client del loop corrente (es. allo shutdown del worker)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
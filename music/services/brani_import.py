@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 
 from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
 
 from music.models import Album, Brano
-from music.services.musicbrainz import TrackCandidate
+from music.services.album_stats import refresh_album_stats
+from music.services.musicbrainz import ReleaseDetail, TrackCandidate
 
 
 @dataclass
@@ -25,6 +28,12 @@ def _apply_track_position(brano: Brano, track: TrackCandidate) -> bool:
     if brano.progressivo != track.progressivo:
         brano.progressivo = track.progressivo
         changed = True
+    if track.posizione is not None and brano.posizione != track.posizione:
+        brano.posizione = track.posizione
+        changed = True
+    if track.recording_mbid and brano.mb_recording_id != track.recording_mbid:
+        brano.mb_recording_id = track.recording_mbid
+        changed = True
     return changed
 
 
@@ -43,6 +52,7 @@ def _apply_track_metadata(
             changed = True
         if brano.durata != track.durata:
             brano.durata = track.durata
+            brano.durata_secondi = track.durata_secondi
             changed = True
         if brano.crediti != track.crediti:
             brano.crediti = track.crediti
@@ -54,6 +64,7 @@ def _apply_track_metadata(
 
     if _is_empty(brano.durata) and not _is_empty(track.durata):
         brano.durata = track.durata
+        brano.durata_secondi = track.durata_secondi
         changed = True
     if _is_empty(brano.crediti) and not _is_empty(track.crediti):
         brano.crediti = track.crediti
@@ -71,10 +82,14 @@ def import_tracks_for_album(
     result = ImportResult()
 
     for track in tracks:
-        existing = Brano.objects.filter(
-            album_appartenenza=album,
-            titolo_brano__iexact=track.titolo_brano,
-        ).first()
+        # lower(titolo_brano) usa l'indice brano_album_titolo_lower_idx; anche il
+        # titolo cercato passa da LOWER() in SQL, così i due lati coincidono
+        # anche per i caratteri non ASCII
+        existing = (
+            Brano.objects.alias(titolo_lower=Lower("titolo_brano"))
+            .filter(album_appartenenza=album, titolo_lower=Lower(Value(track.titolo_brano)))
+            .first()
+        )
 
         if existing:
             brano = existing
@@ -99,11 +114,28 @@ def import_tracks_for_album(
             titolo_brano=track.titolo_brano,
             sezione=track.sezione,
             progressivo=track.progressivo,
+            posizione=track.posizione,
             durata=track.durata,
+            durata_secondi=track.durata_secondi,
             crediti=track.crediti,
+            mb_recording_id=track.recording_mbid or "",
         )
         with transaction.atomic():
             brano.save()
         result.created += 1
 
+    if result.created or result.updated:
+        refresh_album_stats(album)
+
     return result
+
+
+def remember_release(album: Album, detail: ReleaseDetail) -> None:
+    """Salva gli MBID della release scelta (e dell'artista, se mancante) per i lookup futuri."""
+    if album.mb_release_id != detail.release.mbid:
+        album.mb_release_id = detail.release.mbid
+        album.save(update_fields=["mb_release_id"])
+    artista = album.artista_appartenenza
+    if detail.artist_mbid and not artista.mb_artist_id:
+        artista.mb_artist_id = detail.artist_mbid
+        artista.save(update_fields=["mb_artist_id"])
@@ -0,0 +1,25 @@
+"""
+Invalidazione della cache per "generazione": le chiavi includono un contatore
+che i segnali incrementano a ogni scrittura, così tutte le voci precedenti
+diventano irraggiungibili senza doverle elencare (scadono da sole).
+"""
+from django.core.cache import cache
+
+
+def _key(name: str) -> str:
+    return f"generation:{name}"
+
+
+def get_generation(name: str) -> int:
+    generation = cache.get(_key(name))
+    if generation is None:
+        generation = 1
+        cache.add(_key(name), generation, None)
+    return generation
+
+
+def bump_generation(name: str) -> None:
+    try:
+        cache.incr(_key(name))
+    except ValueError:
+        cache.set(_key(name), 2, None)
@@ -0,0 +1,171 @@
+"""
+Circuit breaker per i servizi esterni: dopo CIRCUIT_FAILURE_THRESHOLD errori
+consecutivi la fonte viene saltata per CIRCUIT_RESET_TIMEOUT secondi, poi si
+lascia passare una sola richiesta di prova (half-open): se va a buon fine il
+circuito si richiude, altrimenti si riapre.
+
+Lo stato è condiviso tra i processi (daemon mod_wsgi, worker uvicorn) in un file
+SQLite (CIRCUIT_DB_PATH) aggiornato con transazioni IMMEDIATE; non passa dal
+database Django, così può essere aggiornato anche dai thread del resolver
+concorrente. Se il file non è accessibile il circuito resta chiuso.
+
+Il caso comune (circuito chiuso, nessun errore) è una sola lettura senza lock di
+scrittura: le transazioni IMMEDIATE servono solo ai cambi di stato e agli errori.
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS circuit_state (
+    name TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL DEFAULT 0,
+    opened_at REAL,
+    trial_at REAL
+)
+"""
+
+
+def _db_path():
+    return str(
+        getattr(settings, "CIRCUIT_DB_PATH", None)
+        or os.path.join(tempfile.gettempdir(), "dpteca-circuits.sqlite3")
+    )
+
+
+CLOSED = (0, None, None)
+
+
+@contextmanager
+def _connect():
+    connection = sqlite3.connect(_db_path(), timeout=5, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(_SCHEMA)
+        yield connection
+    finally:
+        connection.close()
+
+
+@contextmanager
+def _transaction():
+    with _connect() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold or getattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 3)
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout or getattr(settings, "CIRCUIT_RESET_TIMEOUT", 60)
+
+    def _read(self, connection):
+        row = connection.execute(
+            "SELECT failures, opened_at, trial_at FROM circuit_state WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        return row or CLOSED
+
+    def _state(self):
+        """Stato letto senza lock di scrittura (con WAL non attende gli scrittori)."""
+        with _connect() as connection:
+            return self._read(connection)
+
+    def _write(self, connection, failures, opened_at, trial_at):
+        connection.execute(
+            "INSERT INTO circuit_state (name, failures, opened_at, trial_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET failures = excluded.failures, "
+            "opened_at = excluded.opened_at, trial_at = excluded.trial_at",
+            (self.name, failures, opened_at, trial_at),
+        )
+
+    @property
+    def is_open(self):
+        try:
+            return self._state()[1] is not None
+        except sqlite3.Error as exc:
+            logger.warning("Stato circuito %s non leggibile: %s", self.name, exc)
+            return False
+
+    def allow(self):
+        """True se la fonte può essere interrogata adesso."""
+        try:
+            if self._state()[1] is None:
+                return True
+            with _transaction() as connection:
+                failures, opened_at, trial_at = self._read(connection)
+                if opened_at is None:
+                    return True
+                now = time.time()
+                if now - opened_at < self.reset_timeout:
+                    return False
+                # Una sola prova alla volta; scade se il processo che la fa muore
+                if trial_at is not None and now - trial_at < self.reset_timeout:
+                    return False
+                self._write(connection, failures, opened_at, now)
+                return True
+        except sqlite3.Error as exc:
+            logger.warning("Stato circuito %s non leggibile: %s", self.name, exc)
+            return True
+
+    def record_success(self):
+        try:
+            # Circuito già chiuso e senza errori: niente da scrivere
+            if self._state() == CLOSED:
+                return
+            with _transaction() as connection:
+                if self._read(connection) != CLOSED:
+                    self._write(connection, 0, None, None)
+        except sqlite3.Error as exc:
+            logger.warning("Stato circuito %s non aggiornato: %s", self.name, exc)
+
+    def record_failure(self):
+        try:
+            with _transaction() as connection:
+                failures, opened_at, trial_at = self._read(connection)
+                failures += 1
+                if trial_at is not None or failures >= self.failure_threshold:
+                    opened_at = time.time()
+                self._write(connection, failures, opened_at, None)
+        except sqlite3.Error as exc:
+            logger.warning("Stato circuito %s non aggiornato: %s", self.name, exc)
+
+    def reset(self):
+        self.record_success()
+
+
+def get_breaker(name):
+    return CircuitBreaker(name)
+
+
+def host_breaker(host):
+    return CircuitBreaker(f"host:{host}")
+
+
+def reset_all():
+    try:
+        with _transaction() as connection:
+            connection.execute("DELETE FROM circuit_state")
+    except sqlite3.Error as exc:
+        logger.warning("Reset dei circuiti fallito: %s", exc)
@@ -0,0 +1,87 @@
+"""
+Statistiche della collezione materializzate in StatisticaCollezione.
+
+refresh_collection_stats() esegue una query raggruppata per dimensione e
+sostituisce l'intero riepilogo in una transazione, così la pagina non vede mai
+un riepilogo a metà. Va eseguito periodicamente (cron) o dopo import in blocco.
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from music.models import Album, StatisticaCollezione
+
+_AGGREGATES = {
+    "numero": Count("pk"),
+    "completati": Count("pk", filter=Q(closed=True)),
+    "spesa": Sum("costo"),
+}
+
+# Dimensione -> espressione raggruppata (None = totale dell'intera collezione)
+DIMENSIONI = OrderedDict(
+    [
+        (StatisticaCollezione.DIMENSIONE_TOTALE, None),
+        (StatisticaCollezione.DIMENSIONE_ANNO, ExtractYear("data_rilascio")),
+        (StatisticaCollezione.DIMENSIONE_EDITORE, "editore"),
+        (StatisticaCollezione.DIMENSIONE_SUPPORTO, "supporto"),
+        (StatisticaCollezione.DIMENSIONE_DEPOSITO, "deposito"),
+        (StatisticaCollezione.DIMENSIONE_GENERE, "genere"),
+    ]
+)
+
+
+def _rows(expression):
+    albums = Album.objects.order_by()
+    if expression is None:
+        yield "", albums.aggregate(**_AGGREGATES)
+        return
+    if not isinstance(expression, str):
+        albums = albums.annotate(valore_dimensione=expression)
+        expression = "valore_dimensione"
+    for row in albums.values(expression).annotate(**_AGGREGATES):
+        value = row[expression]
+        yield ("" if value is None else str(value).strip()), row
+
+
+def compute_collection_stats(now=None) -> list[StatisticaCollezione]:
+    now = now or timezone.now()
+    stats = {}
+    for dimensione, expression in DIMENSIONI.items():
+        for valore, row in _rows(expression):
+            # Valori che differiscono solo per spazi finiscono nella stessa riga
+            stat = stats.setdefault(
+                (dimensione, valore[:40]),
+                StatisticaCollezione(dimensione=dimensione, valore=valore[:40], aggiornato_il=now),
+            )
+            stat.numero_album += row["numero"] or 0
+            stat.album_completati += row["completati"] or 0
+            stat.spesa_totale += row["spesa"] or 0
+    return list(stats.values())
+
+
+def refresh_collection_stats() -> int:
+    """Ricalcola il riepilogo e restituisce il numero di righe scritte."""
+    stats = compute_collection_stats()
+    with transaction.atomic():
+        StatisticaCollezione.objects.all().delete()
+        StatisticaCollezione.objects.bulk_create(stats)
+    return len(stats)
+
+
+def load_collection_stats() -> dict:
+    """Riepilogo per la pagina: {"totale": riga, "dimensioni": [(etichetta, righe)], "aggiornato_il"}."""
+    by_dimension = OrderedDict((dimensione, []) for dimensione in DIMENSIONI)
+    for stat in StatisticaCollezione.objects.order_by("dimensione", "-spesa_totale", "valore"):
+        by_dimension[stat.dimensione].append(stat)
+    # Anni in ordine cronologico, le altre dimensioni per spesa decrescente
+    by_dimension[StatisticaCollezione.DIMENSIONE_ANNO].sort(key=lambda stat: stat.valore or "9999")
+    totale = (by_dimension.pop(StatisticaCollezione.DIMENSIONE_TOTALE) or [None])[0]
+    labels = dict(StatisticaCollezione.DIMENSIONE_CHOICES)
+    return {
+        "totale": totale,
+        "dimensioni": [(labels[dimensione], rows) for dimensione, rows in by_dimension.items()],
+        "aggiornato_il": totale.aggiornato_il if totale else None,
+    }
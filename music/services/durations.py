@@ -0,0 +1,27 @@
+"""
+Conversione delle durate dei brani tra testo ("m:ss") e secondi/millisecondi.
+Senza dipendenze: la usano sia i modelli sia il client MusicBrainz.
+"""
+from typing import Optional
+
+
+def format_duration(length_ms: Optional[int]) -> Optional[str]:
+    if not length_ms:
+        return None
+    total_seconds = max(int(length_ms // 1000), 0)
+    minutes, seconds = divmod(total_seconds, 60)
+    formatted = f"{minutes}:{seconds:02d}"
+    return formatted[:5]
+
+
+def parse_duration(value: Optional[str]) -> Optional[int]:
+    """Converte una durata "m:ss" (o "h:mm:ss") in secondi."""
+    if value is None:
+        return None
+    parts = str(value).strip().split(":")
+    if not parts or not all(part.strip().isdigit() for part in parts) or len(parts) > 3:
+        return None
+    total = 0
+    for part in parts:
+        total = total * 60 + int(part)
+    return total
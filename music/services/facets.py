@@ -0,0 +1,166 @@
+"""
+Filtri della lista album (genere, stili, supporto, editore, stato, decennio)
+con i conteggi per ogni valore.
+
+I conteggi seguono la logica "a faccette": per ogni filtro si contano gli album
+che rispettano tutti gli ALTRI filtri attivi, così si vede quanti album
+restano scegliendo un valore diverso. Ogni filtro costa una query raggruppata;
+il risultato è in cache per combinazione di filtri e invalidato (cambiando la
+generazione) a ogni salvataggio o cancellazione di album e stili, vedi
+music.signals.
+
+Più valori dello stesso filtro sono in OR (?genere=Rock&genere=Jazz), filtri
+diversi in AND.
+"""
+import hashlib
+from datetime import date
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, QuerySet
+from django.db.models.functions import Cast, ExtractYear
+
+from music.models import Album
+from music.services.cache_generation import bump_generation, get_generation
+
+# Parametro GET -> etichetta mostrata
+FACETS = {
+    "genere": "Genere",
+    "stile": "Stile",
+    "supporto": "Supporto",
+    "editore": "Editore",
+    "stato": "Stato",
+    "decennio": "Decennio",
+}
+
+STATI = {"completato": True, "in_corso": False}
+STATI_LABEL = {"completato": "Completato", "in_corso": "In corso"}
+
+# Valori mostrati per filtro (i più frequenti, più quelli selezionati)
+MAX_VALUES = 15
+
+
+def parse_filters(params) -> dict[str, list[str]]:
+    """Filtri validi dalla query string (QueryDict), scartando i valori malformati."""
+    selected = {}
+    for name in FACETS:
+        values = [value for value in params.getlist(name) if value != ""]
+        if name == "stile":
+            values = [value for value in values if value.isdigit()]
+        elif name == "decennio":
+            values = [value for value in values if value.isdigit() and int(value) % 10 == 0]
+        elif name == "stato":
+            values = [value for value in values if value in STATI]
+        if values:
+            selected[name] = sorted(set(values))
+    return selected
+
+
+def apply_filters(queryset: QuerySet, selected: dict[str, list[str]], exclude: Optional[str] = None) -> QuerySet:
+    """Applica i filtri selezionati (tranne ``exclude``) a un queryset di Album."""
+    for name, values in selected.items():
+        if name == exclude:
+            continue
+        if name in ("genere", "supporto", "editore"):
+            queryset = queryset.filter(**{f"{name}__in": values})
+        elif name == "stile":
+            # Exists invece di una join: nessun duplicato con più stili selezionati
+            through = Album.stili.through.objects.filter(album=OuterRef("pk"), stile__in=values)
+            queryset = queryset.filter(Exists(through))
+        elif name == "stato":
+            queryset = queryset.filter(closed__in={STATI[value] for value in values})
+        elif name == "decennio":
+            # Intervalli di date: usano l'indice su data_rilascio
+            ranges = Q()
+            for decade in map(int, values):
+                ranges |= Q(data_rilascio__gte=date(decade, 1, 1), data_rilascio__lt=date(decade + 10, 1, 1))
+            queryset = queryset.filter(ranges)
+    return queryset
+
+
+def _grouped_counts(name: str, queryset: QuerySet) -> list[tuple[str, str, int]]:
+    """(valore, etichetta, conteggio) per un filtro, con una query raggruppata."""
+    if name == "stile":
+        rows = (
+            Album.stili.through.objects.filter(album__in=queryset.values("pk"))
+            .values("stile_id", "stile__stile")
+            .annotate(totale=Count("album_id"))
+            .order_by("-totale", "stile__stile")
+        )
+        return [(str(row["stile_id"]), row["stile__stile"], row["totale"]) for row in rows]
+    if name == "decennio":
+        rows = (
+            queryset.exclude(data_rilascio=None)
+            # Cast: su PostgreSQL EXTRACT restituisce numeric e la divisione non sarebbe intera
+            .annotate(decennio=Cast(ExtractYear("data_rilascio"), IntegerField()) / 10 * 10)
+            .values("decennio")
+            .annotate(totale=Count("pk"))
+            .order_by("-decennio")
+        )
+        return [(str(row["decennio"]), f"Anni {row['decennio']}", row["totale"]) for row in rows]
+    if name == "stato":
+        rows = queryset.values("closed").annotate(totale=Count("pk")).order_by("-closed")
+        stati = {closed: value for value, closed in STATI.items()}
+        return [(stati[row["closed"]], STATI_LABEL[stati[row["closed"]]], row["totale"]) for row in rows]
+    rows = (
+        queryset.exclude(**{f"{name}__isnull": True})
+        .exclude(**{name: ""})
+        .values(name)
+        .annotate(totale=Count("pk"))
+        .order_by("-totale", name)
+    )
+    return [(row[name], row[name], row["totale"]) for row in rows]
+
+
+def compute_facet_counts(selected: dict[str, list[str]]) -> dict[str, list[tuple[str, str, int]]]:
+    base = Album.objects.order_by()
+    return {name: _grouped_counts(name, apply_filters(base, selected, exclude=name)) for name in FACETS}
+
+
+def invalidate_facet_counts() -> None:
+    """Invalida tutti i conteggi in cache (chiamata dai segnali a ogni scrittura)."""
+    bump_generation("album_facets")
+
+
+def facet_counts(selected: dict[str, list[str]]) -> dict[str, list[tuple[str, str, int]]]:
+    """Conteggi per la combinazione di filtri, dalla cache se ancora validi."""
+    signature = "&".join(f"{name}={','.join(values)}" for name, values in sorted(selected.items()))
+    key = f"album_facets:{get_generation('album_facets')}:{hashlib.md5(signature.encode()).hexdigest()}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute_facet_counts(selected)
+        cache.set(key, counts, settings.FACET_CACHE_TIMEOUT)
+    return counts
+
+
+def build_facets(params, selected: dict[str, list[str]]) -> list[dict]:
+    """
+    Struttura per il template: per ogni filtro i valori con conteggio, stato di
+    selezione e query string che attiva/disattiva il valore (tornando a pagina 1).
+    """
+    counts = facet_counts(selected)
+    facets = []
+    for name, label in FACETS.items():
+        chosen = set(selected.get(name, []))
+        values = []
+        for value, value_label, count in counts[name]:
+            if len(values) >= MAX_VALUES and value not in chosen:
+                continue
+            query = params.copy()
+            query.pop("page", None)
+            current = [item for item in query.getlist(name) if item != value]
+            if value not in chosen:
+                current.append(value)
+            query.setlist(name, current)
+            values.append(
+                {
+                    "value": value,
+                    "label": value_label,
+                    "count": count,
+                    "selected": value in chosen,
+                    "query": query.urlencode(),
+                }
+            )
+        facets.append({"name": name, "label": label, "values": values, "active": bool(chosen)})
+    return facets
@@ -0,0 +1,307 @@
+"""
+Livello comune per le chiamate HTTP in uscita (MusicBrainz, Bandcamp, YouTube,
+Pixabay):
+
+- sessioni requests con pool di connessioni (una per thread)
+- retry con backoff esponenziale e jitter per le GET, che sono idempotenti
+- rispetto dell'header Retry-After (429/503), entro HTTP_MAX_RETRY_AFTER secondi
+- circuit breaker per host condiviso tra processi (vedi circuit.py); i rate limit
+  (429, 503 con Retry-After) non contano come errori dell'host
+- metriche di latenza ed errori per host (core.metrics)
+
+Per i test, ``fake_http()`` sostituisce la rete con risposte predefinite.
+"""
+import asyncio
+import io
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from core.metrics import track_external_request
+
+from .async_client import get_async_client, httpx
+from .circuit import host_breaker, reset_all
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """L'host ha fallito di recente: la richiesta non viene nemmeno tentata."""
+
+
+class DeadlineExceeded(requests.Timeout):
+    """La scadenza del chiamante è passata: la richiesta non viene (più) tentata."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class SessionTransport:
+    """Trasporto reale: una requests.Session con pool per ciascun thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=_setting("HTTP_POOL_CONNECTIONS", 10),
+                pool_maxsize=_setting("HTTP_POOL_MAXSIZE", 10),
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+        return session
+
+    def send(self, url, **kwargs):
+        return self._session().get(url, **kwargs)
+
+    async def asend(self, url, **kwargs):
+        kwargs.pop("stream", None)
+        return await get_async_client().get(url, **kwargs)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    async def asleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+_transport = SessionTransport()
+
+
+def _backoff(attempt):
+    """Full jitter: attesa casuale tra 0 e base * 2^tentativo (con tetto)."""
+    base = _setting("HTTP_BACKOFF_BASE", 0.5)
+    cap = _setting("HTTP_BACKOFF_MAX", 8.0)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(response):
+    value = (response.headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max((parsedate_to_datetime(value).timestamp() - time.time()), 0.0)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def retry_delay(response, attempt):
+    """Attesa prima di ritentare una risposta con stato ritentabile, None se non conviene."""
+    retry_after = _retry_after(response)
+    if retry_after is None:
+        return _backoff(attempt)
+    if retry_after > _setting("HTTP_MAX_RETRY_AFTER", 10.0):
+        return None
+    return retry_after
+
+
+def _is_upstream_failure(status):
+    return status in RETRY_STATUSES
+
+
+def _is_rate_limited(response):
+    """429, o 503 con Retry-After: l'host chiede di rallentare, non è guasto."""
+    return response.status_code == 429 or (
+        response.status_code == 503 and "Retry-After" in response.headers
+    )
+
+
+def _fits(deadline, delay):
+    """True se dopo un'attesa di ``delay`` secondi resta tempo prima della scadenza."""
+    return deadline is None or time.monotonic() + delay < deadline
+
+
+def pause(seconds):
+    """Attesa tra due tentativi gestiti dal chiamante (registrata da fake_http)."""
+    _transport.sleep(seconds)
+
+
+async def apause(seconds):
+    await _transport.asleep(seconds)
+
+
+def get(url, *, params=None, headers=None, timeout=None, retries=None, stream=False, deadline=None):
+    """
+    GET con retry, backoff e circuit breaker per host. Solleva le eccezioni di
+    requests (CircuitOpenError inclusa) e HTTPError per gli stati di errore.
+
+    ``deadline`` (istante di time.monotonic()) limita l'intera chiamata: il timeout
+    di ogni tentativo si accorcia al tempo rimasto e non si ritenta oltre la
+    scadenza, così il lavoro abbandonato dal chiamante termina con essa.
+    """
+    host = urlsplit(url).hostname or ""
+    if deadline is not None and deadline <= time.monotonic():
+        raise DeadlineExceeded(f"Scadenza superata prima della richiesta a {host}")
+    breaker = host_breaker(host)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuito aperto per {host}")
+
+    timeout = timeout or _setting("HTTP_TIMEOUT", 10)
+    retries = _setting("HTTP_RETRIES", 2) if retries is None else retries
+    transport = _transport
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        attempt_timeout = timeout
+        if deadline is not None:
+            attempt_timeout = min(timeout, max(deadline - time.monotonic(), 0.001))
+        try:
+            with track_external_request(url):
+                response = transport.send(
+                    url, params=params, headers=headers, timeout=attempt_timeout, stream=stream
+                )
+                if _is_upstream_failure(response.status_code) and not last:
+                    delay = retry_delay(response, attempt)
+                    if delay is not None and _fits(deadline, delay):
+                        response.close()
+                        transport.sleep(delay)
+                        continue
+                response.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout):
+            delay = _backoff(attempt)
+            if last or not _fits(deadline, delay):
+                breaker.record_failure()
+                raise
+            transport.sleep(delay)
+            continue
+        except requests.HTTPError as exc:
+            # Un 4xx è un errore della richiesta, non dell'host; un rate limit non apre
+            # il circuito: il chiamante rallenta (es. il throttle di MusicBrainz)
+            if _is_rate_limited(exc.response):
+                raise
+            if _is_upstream_failure(exc.response.status_code):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return response
+
+
+async def aget(url, *, params=None, headers=None, timeout=None, retries=None):
+    """Come get(), sul client httpx asincrono; solleva le eccezioni di httpx."""
+    if httpx is None:
+        raise ImproperlyConfigured("Le chiamate asincrone richiedono httpx: pip install httpx")
+    host = urlsplit(url).hostname or ""
+    breaker = host_breaker(host)
+    # Il circuito vive in un file SQLite: le sue letture e scritture non girano nell'event loop
+    if not await asyncio.to_thread(breaker.allow):
+        raise CircuitOpenError(f"Circuito aperto per {host}")
+
+    timeout = timeout or _setting("HTTP_TIMEOUT", 10)
+    retries = _setting("HTTP_RETRIES", 2) if retries is None else retries
+    transport = _transport
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        try:
+            with track_external_request(url):
+                response = await transport.asend(url, params=params, headers=headers, timeout=timeout)
+                if _is_upstream_failure(response.status_code) and not last:
+                    delay = retry_delay(response, attempt)
+                    if delay is not None:
+                        await transport.asleep(delay)
+                        continue
+                response.raise_for_status()
+        except httpx.TransportError:
+            if last:
+                await asyncio.to_thread(breaker.record_failure)
+                raise
+            await transport.asleep(_backoff(attempt))
+            continue
+        except httpx.HTTPStatusError as exc:
+            if _is_rate_limited(exc.response):
+                raise
+            if _is_upstream_failure(exc.response.status_code):
+                await asyncio.to_thread(breaker.record_failure)
+            else:
+                await asyncio.to_thread(breaker.record_success)
+            raise
+        await asyncio.to_thread(breaker.record_success)
+        return response
+
+
+class FakeTransport:
+    """
+    Test double: risposte predefinite per URL (senza query string), in coda.
+    Le richieste vengono registrate in ``requests`` e le attese in ``sleeps``,
+    senza dormire davvero.
+    """
+
+    def __init__(self):
+        self.routes = defaultdict(deque)
+        self.requests = []
+        self.sleeps = []
+
+    def add(self, url, *, status=200, json_data=None, body=b"", headers=None, exc=None):
+        headers = dict(headers or {})
+        if json_data is not None:
+            body = json.dumps(json_data).encode()
+            headers.setdefault("Content-Type", "application/json")
+        self.routes[url].append((status, body, headers, exc))
+        return self
+
+    def _next(self, url, kwargs):
+        self.requests.append({"url": url, **kwargs})
+        key = url.split("?", 1)[0]
+        queue = self.routes.get(key)
+        if not queue:
+            raise AssertionError(f"Nessuna risposta finta per {key}")
+        # L'ultima risposta resta valida per le richieste successive
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def send(self, url, **kwargs):
+        status, body, headers, exc = self._next(url, kwargs)
+        if exc is not None:
+            raise exc
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.raw = io.BytesIO(body)
+        response.headers = CaseInsensitiveDict(headers)
+        response.url = url
+        response.reason = "Fake"
+        return response
+
+    async def asend(self, url, **kwargs):
+        status, body, headers, exc = self._next(url, kwargs)
+        if exc is not None:
+            raise exc
+        return httpx.Response(status, content=body, headers=headers, request=httpx.Request("GET", url))
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+    async def asleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+@contextmanager
+def fake_http():
+    """Sostituisce la rete con un FakeTransport e riparte con i circuiti chiusi."""
+    global _transport
+    previous = _transport
+    fake = FakeTransport()
+    _transport = fake
+    reset_all()
+    try:
+        yield fake
+    finally:
+        _transport = previous
+        reset_all()
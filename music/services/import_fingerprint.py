@@ -0,0 +1,66 @@
+"""
+Impronte delle righe importate dai fogli Excel e differenze rispetto al database.
+
+Ogni record importato salva l'impronta (SHA-1) dei valori scritti dalla sua
+riga. Rilanciando l'import, una riga con la stessa impronta è invariata e viene
+saltata senza query; solo le righe nuove o modificate toccano il database.
+I valori sono quelli già normalizzati dal comando (date, numeri, stili), così
+differenze di solo formato nel foglio non contano come modifiche.
+
+Cambiare FINGERPRINT_VERSION quando cambia il modo in cui una riga viene
+interpretata: tutte le impronte precedenti smettono di coincidere.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+FINGERPRINT_VERSION = 1
+
+
+def fingerprint(values: dict) -> str:
+    payload = json.dumps({"v": FINGERPRINT_VERSION, **values}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def changed_fields(current: dict, values: dict) -> list[str]:
+    """Campi di ``values`` diversi dai valori attuali del record."""
+    return [name for name, value in values.items() if current.get(name) != value]
+
+
+@dataclass
+class ImportDiff:
+    """Esito riga per riga di un import: nuovi, modificati (con i campi), invariati, mancanti."""
+
+    added: list[str] = field(default_factory=list)
+    changed: list[tuple[str, list[str]]] = field(default_factory=list)
+    unchanged: int = 0
+    # Record presenti nel database ma non nel foglio (None se non calcolato, es. con --limit)
+    missing: list[str] | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "nuovi": self.added,
+            "modificati": [{"record": label, "campi": campi} for label, campi in self.changed],
+            "invariati": self.unchanged,
+            "mancanti": self.missing,
+        }
+
+    def write(self, stdout, style, *, detail_limit=20) -> None:
+        missing = "n/d" if self.missing is None else len(self.missing)
+        stdout.write(
+            f"Differenze: {len(self.added)} nuovi, {len(self.changed)} modificati, "
+            f"{self.unchanged} invariati, {missing} mancanti nel file"
+        )
+        sections = [
+            ("Nuovi", self.added),
+            ("Modificati", [f"{label} ({', '.join(campi)})" for label, campi in self.changed]),
+            ("Presenti nel database ma non nel file", self.missing or []),
+        ]
+        for title, rows in sections:
+            if not rows:
+                continue
+            stdout.write(style.MIGRATE_HEADING(f"{title}:"))
+            for row in rows[:detail_limit]:
+                stdout.write(f" - {row}")
+            if len(rows) > detail_limit:
+                stdout.write(f" ... altri {len(rows) - detail_limit}")
@@ -0,0 +1,224 @@
+"""
+Import completo del catalogo dai fogli Excel (``manage.py import_all``).
+
+- CatalogueIndex: artisti e album in memoria, caricati una volta e aggiornati
+  dai comandi man mano che creano record. import_artisti, import_albums e
+  import_brani lo ricevono dall'orchestratore (attributo ``index`` del comando)
+  invece di interrogare il database riga per riga.
+- run_in_threads(): esegue gruppi di lavoro indipendenti in thread, ognuno con
+  la propria connessione al database chiusa al termine.
+- run_pipeline(): esegue i passi appena le loro dipendenze sono completate,
+  quelli indipendenti in parallelo, e misura la durata di ciascuno.
+
+Su SQLite le scritture concorrenti si bloccano a vicenda: effective_workers()
+riduce i thread a uno.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from django.db import connection, connections
+
+from music.models import Album, Artista
+
+# Campi di Album scritti da import_albums (oltre agli stili)
+ALBUM_IMPORT_FIELDS = (
+    "editore", "catalogo", "supporto", "deposito", "note", "costo", "closed", "data_rilascio", "genere",
+)
+
+
+def effective_workers(workers: int) -> int:
+    return 1 if connection.vendor == "sqlite" else max(1, workers)
+
+
+class CatalogueIndex:
+    """Indici in memoria di artisti e album, condivisi tra i passi dell'import."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._artisti = None
+        self._albums = None
+        self._by_title = None
+
+    @property
+    def artisti(self) -> dict[str, int]:
+        """{nome_artista: pk}"""
+        with self._lock:
+            if self._artisti is None:
+                self._artisti = dict(Artista.objects.values_list("nome_artista", "pk"))
+        return self._artisti
+
+    @property
+    def albums(self) -> dict[tuple[str, str], dict]:
+        """{(titolo, nome_artista): valori importati}, per album duplicati vale il primo."""
+        self._load_albums()
+        return self._albums
+
+    def _load_albums(self) -> None:
+        with self._lock:
+            if self._albums is not None:
+                return
+            albums, by_pk, by_title = {}, {}, {}
+            rows = Album.objects.order_by("pk").values(
+                "pk", "titolo_album", "artista_appartenenza__nome_artista", "import_hash", *ALBUM_IMPORT_FIELDS
+            )
+            for row in rows:
+                artista = row["artista_appartenenza__nome_artista"]
+                by_title.setdefault(row["titolo_album"], []).append((row["pk"], artista))
+                if (row["titolo_album"], artista) not in albums:
+                    row["stili"] = []
+                    albums[(row["titolo_album"], artista)] = by_pk[row["pk"]] = row
+            for album_id, stile in Album.stili.through.objects.values_list("album_id", "stile__stile"):
+                if album_id in by_pk:
+                    by_pk[album_id]["stili"].append(stile)
+            for row in by_pk.values():
+                row["stili"].sort()
+            self._albums, self._by_title = albums, by_title
+
+    def add_artista(self, nome: str, pk: int) -> None:
+        self.artisti[nome] = pk
+
+    def add_album(self, titolo: str, artista: str, row: dict) -> None:
+        self._load_albums()
+        if (titolo, artista) not in self._albums:
+            self._by_title.setdefault(titolo, []).append((row["pk"], artista))
+        self._albums[(titolo, artista)] = row
+
+    def find_album(self, titolo: str, artista: Optional[str] = None, artista_comp: Optional[str] = None) -> Optional[int]:
+        """
+        pk dell'album con questo titolo: quello dell'artista (o dell'artista della
+        compilation) se unico, altrimenti l'unico album con quel titolo.
+        """
+        if not titolo:
+            return None
+        self._load_albums()
+        candidati = self._by_title.get(titolo, [])
+        for nome in (artista, artista_comp):
+            if nome:
+                trovati = [pk for pk, nome_artista in candidati if nome_artista == nome]
+                if len(trovati) == 1:
+                    return trovati[0]
+        if len(candidati) == 1:
+            return candidati[0][0]
+        return None
+
+
+def run_in_threads(func: Callable, groups: list[list]) -> list:
+    """
+    Esegue ``func(item)`` per ogni elemento, un thread per gruppo; restituisce i
+    risultati nell'ordine dei gruppi. Con un solo gruppo lavora nel thread corrente.
+    """
+    if len(groups) <= 1:
+        return [func(item) for group in groups for item in group]
+
+    def run_group(group):
+        try:
+            return [func(item) for item in group]
+        finally:
+            # Ogni thread ha le proprie connessioni: vanno chiuse qui
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        return [result for results in executor.map(run_group, groups) for result in results]
+
+
+def split_balanced(items: Iterable, weights: Callable, parts: int) -> list[list]:
+    """Divide gli elementi in ``parts`` gruppi di peso simile (il più pesante al gruppo più leggero)."""
+    groups = [[] for _ in range(max(1, parts))]
+    totals = [0] * len(groups)
+    for item in sorted(items, key=weights, reverse=True):
+        lightest = totals.index(min(totals))
+        groups[lightest].append(item)
+        totals[lightest] += weights(item)
+    return [group for group in groups if group]
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[], str]
+    depends: tuple[str, ...] = ()
+    # Valorizzati da run_pipeline
+    output: str = ""
+    error: Optional[BaseException] = None
+    skipped: bool = False
+    started: float = 0.0
+    finished: float = 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class PipelineResult:
+    steps: list[Step]
+    seconds: float
+    failed: list[str] = field(default_factory=list)
+
+
+def run_pipeline(steps: list[Step], workers: int = 1, on_done: Optional[Callable[[Step], None]] = None) -> PipelineResult:
+    """
+    Esegue i passi rispettando ``depends``: ogni passo parte appena le sue
+    dipendenze sono completate. Se un passo fallisce, quelli che ne dipendono
+    vengono saltati.
+    """
+    by_name = {step.name: step for step in steps}
+    pending = list(steps)
+    done, failed = set(), set()
+    start = time.perf_counter()
+
+    def execute(step):
+        step.started = time.perf_counter() - start
+        try:
+            step.output = step.run() or ""
+        except Exception as exc:
+            step.error = exc
+        finally:
+            step.finished = time.perf_counter() - start
+            if workers > 1:
+                connections.close_all()
+        return step
+
+    def ready():
+        for step in list(pending):
+            if any(dep in failed for dep in step.depends):
+                pending.remove(step)
+                step.skipped = True
+                failed.add(step.name)
+                if on_done:
+                    on_done(step)
+            elif all(dep in done for dep in step.depends):
+                pending.remove(step)
+                yield step
+
+    def finish(step):
+        (failed if step.error is not None else done).add(step.name)
+        if on_done:
+            on_done(step)
+
+    if workers <= 1:
+        while pending:
+            batch = list(ready())
+            if not batch and pending:
+                raise ValueError(f"Dipendenze non risolvibili: {[step.name for step in pending]}")
+            for step in batch:
+                finish(execute(step))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = set()
+            while pending or running:
+                running |= {executor.submit(execute, step) for step in ready()}
+                if not running:
+                    raise ValueError(f"Dipendenze non risolvibili: {[step.name for step in pending]}")
+                completed, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    finish(future.result())
+
+    return PipelineResult(
+        steps=[by_name[step.name] for step in steps],
+        seconds=time.perf_counter() - start,
+        failed=[step.name for step in steps if step.name in failed],
+    )
@@ -0,0 +1,185 @@
+"""
+Coda di lavori in background su database (modello Job), senza broker esterno.
+
+- @task("nome") registra una funzione ``fn(job, **parametri)``; i task del
+  catalogo sono in music/tasks.py.
+- enqueue() inserisce un job e ritorna subito; con ``chiave`` un job equivalente
+  già in coda o in esecuzione viene riusato invece di duplicarlo.
+- claim_next() prende il prossimo job (priorità più alta, poi il più vecchio)
+  con SELECT ... FOR UPDATE SKIP LOCKED su PostgreSQL, così più worker non
+  eseguono lo stesso job.
+- run_job() esegue il job: in caso di eccezione lo rimette in coda con attesa
+  crescente (JOB_RETRY_BACKOFF * 2^tentativi) fino a max_tentativi, poi lo
+  segna come fallito con il traceback. JobError fa fallire subito il job
+  (errori che un nuovo tentativo non risolve).
+- report_progress() aggiorna progresso e messaggio, visibili subito nella
+  pagina dei job perché il task non gira in una transazione, e il segnale di
+  vita del job (ultimo_segnale_il).
+- requeue_stale() rimette in coda i job senza segnali da JOB_STALE_AFTER
+  secondi: i task lunghi devono chiamare report_progress() più spesso. Un job
+  che ha già esaurito i tentativi (ad esempio perché il worker viene ucciso
+  ogni volta per memoria esaurita) viene segnato come fallito.
+
+Il worker è ``manage.py run_worker``.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from music.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS: dict[str, Callable] = {}
+
+
+class JobError(Exception):
+    """Errore definitivo: il job fallisce senza altri tentativi."""
+
+
+class UnknownTask(JobError):
+    pass
+
+
+def task(name: str):
+    """Registra una funzione come task eseguibile dal worker."""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(
+    nome: str,
+    *,
+    priorita: int = Job.PRIORITA_NORMALE,
+    chiave: str = "",
+    utente=None,
+    max_tentativi: Optional[int] = None,
+    **parametri,
+) -> Job:
+    """Accoda un job e lo restituisce (o quello equivalente già attivo con la stessa chiave)."""
+    if nome not in TASKS:
+        raise UnknownTask(nome)
+    if chiave:
+        attivo = Job.objects.filter(
+            chiave=chiave, stato__in=(Job.STATO_IN_CODA, Job.STATO_IN_ESECUZIONE)
+        ).first()
+        if attivo is not None:
+            return attivo
+    return Job.objects.create(
+        nome=nome,
+        parametri=parametri,
+        chiave=chiave,
+        priorita=priorita,
+        max_tentativi=max_tentativi or settings.JOB_MAX_ATTEMPTS,
+        esegui_dopo=timezone.now(),
+        creato_da=utente if utente is not None and utente.is_authenticated else None,
+    )
+
+
+def claim_next(worker: str = "") -> Optional[Job]:
+    """Segna come in esecuzione il prossimo job pronto e lo restituisce (None se la coda è vuota)."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(stato=Job.STATO_IN_CODA, esegui_dopo__lte=now)
+            .order_by("-priorita", "esegui_dopo", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+        job.stato = Job.STATO_IN_ESECUZIONE
+        job.tentativi += 1
+        job.avviato_il = job.ultimo_segnale_il = now
+        job.worker = worker
+        job.save(update_fields=["stato", "tentativi", "avviato_il", "ultimo_segnale_il", "worker"])
+    return job
+
+
+def report_progress(job: Job, progresso: int, messaggio: str = "") -> None:
+    job.progresso = max(0, min(100, int(progresso)))
+    job.messaggio = messaggio[:255]
+    job.ultimo_segnale_il = timezone.now()
+    Job.objects.filter(pk=job.pk).update(
+        progresso=job.progresso, messaggio=job.messaggio, ultimo_segnale_il=job.ultimo_segnale_il
+    )
+
+
+def run_job(job: Job) -> Job:
+    func = TASKS.get(job.nome)
+    try:
+        if func is None:
+            raise UnknownTask(job.nome)
+        risultato = func(job, **job.parametri)
+    except Exception as exc:
+        job.errore = traceback.format_exc()
+        job.messaggio = str(exc)[:255]
+        if job.tentativi < job.max_tentativi and not isinstance(exc, JobError):
+            job.stato = Job.STATO_IN_CODA
+            job.esegui_dopo = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_BACKOFF * 2 ** (job.tentativi - 1)
+            )
+            logger.warning("Job %s fallito (tentativo %s/%s), riprovo", job, job.tentativi, job.max_tentativi)
+        else:
+            job.stato = Job.STATO_FALLITO
+            job.completato_il = timezone.now()
+            logger.error("Job %s fallito definitivamente", job)
+        job.save(update_fields=["stato", "esegui_dopo", "errore", "messaggio", "completato_il"])
+        return job
+    job.stato = Job.STATO_COMPLETATO
+    job.risultato = risultato
+    job.progresso = 100
+    job.errore = ""
+    job.completato_il = timezone.now()
+    job.save(update_fields=["stato", "risultato", "progresso", "errore", "completato_il", "file", "messaggio"])
+    return job
+
+
+def requeue_stale(timeout: Optional[float] = None) -> int:
+    """
+    Rimette in coda i job in esecuzione senza segnali di vita oltre il limite
+    (worker terminato a metà) e restituisce quanti; quelli che hanno esaurito
+    i tentativi falliscono invece di ripartire all'infinito.
+    """
+    timeout = settings.JOB_STALE_AFTER if timeout is None else timeout
+    now = timezone.now()
+    interrotti = Job.objects.filter(
+        stato=Job.STATO_IN_ESECUZIONE, ultimo_segnale_il__lt=now - timedelta(seconds=timeout)
+    )
+    falliti = interrotti.filter(tentativi__gte=F("max_tentativi")).update(
+        stato=Job.STATO_FALLITO,
+        completato_il=now,
+        worker="",
+        messaggio="Worker interrotto durante l'esecuzione: tentativi esauriti",
+    )
+    if falliti:
+        logger.error("%s job interrotti falliti definitivamente: tentativi esauriti", falliti)
+    return interrotti.update(stato=Job.STATO_IN_CODA, esegui_dopo=now, worker="")
+
+
+def run_pending(worker: str = "", max_jobs: Optional[int] = None) -> int:
+    """Esegue i job pronti finché la coda è vuota (o fino a max_jobs); restituisce quanti."""
+    eseguiti = 0
+    while max_jobs is None or eseguiti < max_jobs:
+        job = claim_next(worker)
+        if job is None:
+            break
+        run_job(job)
+        eseguiti += 1
+    return eseguiti
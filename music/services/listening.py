@@ -1,11 +1,24 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Optional
 from urllib.parse import quote_plus
 
 import requests
 from django.conf import settings
 
+from core.metrics import LISTEN_CACHE
 from music.models import Brano
 
+from . import http
+from .async_client import httpx
+from .musicbrainz import MusicBrainzError, aget_recording_urls, get_recording_urls
+
+logger = logging.getLogger(__name__)
+
 REQUEST_TIMEOUT = 15
 
 
@@ -21,30 +34,83 @@ def _youtube_api_key() -> str:
     return (getattr(settings, "YOUTUBE_API_KEY", None) or "").strip()
 
 
-def find_bandcamp_url(artist: str, album: str, track: str) -> Optional[str]:
+BANDCAMP_SEARCH_URL = "https://bandcamp.com/api/fuzzysearch/1/app_autocomplete"
+YOUTUBE_SEARCH_API_URL = "https://www.googleapis.com/youtube/v3/search"
+
+
+def _bandcamp_request(artist: str, album: str, track: str) -> dict:
+    query = f"{artist} {album} {track}".strip()
+    return {
+        "params": {"q": query, "item_type": "t"},
+        "headers": {
+            "User-Agent": _user_agent(),
+            "Accept": "application/json",
+            "Referer": "https://bandcamp.com/",
+        },
+    }
+
+
+def _parse_bandcamp(payload: dict) -> Optional[str]:
+    for result in payload.get("results") or []:
+        if result.get("itemtype") == "t" and result.get("url"):
+            return result["url"]
+    return None
+
+
+def _youtube_request(api_key: str, artist: str, album: str, track: str) -> dict:
     query = f"{artist} {album} {track}".strip()
+    return {
+        "params": {
+            "part": "snippet",
+            "type": "video",
+            "maxResults": 1,
+            "q": query,
+            "key": api_key,
+        },
+        "headers": {
+            "User-Agent": _user_agent(),
+            "Accept": "application/json",
+        },
+    }
+
+
+def _parse_youtube(payload: dict) -> Optional[str]:
+    items = payload.get("items") or []
+    if not items:
+        return None
+    video_id = (items[0].get("id") or {}).get("videoId")
+    if not video_id:
+        return None
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def find_bandcamp_url(artist: str, album: str, track: str, *, deadline: Optional[float] = None) -> Optional[str]:
     try:
-        response = requests.get(
-            "https://bandcamp.com/api/fuzzysearch/1/app_autocomplete",
-            params={"q": query, "item_type": "t"},
-            headers={
-                "User-Agent": _user_agent(),
-                "Accept": "application/json",
-                "Referer": "https://bandcamp.com/",
-            },
+        response = http.get(
+            BANDCAMP_SEARCH_URL,
+            **_bandcamp_request(artist, album, track),
             timeout=REQUEST_TIMEOUT,
+            deadline=deadline,
         )
-        response.raise_for_status()
         if "application/json" not in response.headers.get("Content-Type", ""):
             return None
-        payload = response.json()
+        return _parse_bandcamp(response.json())
     except (requests.RequestException, ValueError):
         return None
 
-    for result in payload.get("results") or []:
-        if result.get("itemtype") == "t" and result.get("url"):
-            return result["url"]
-    return None
+
+async def afind_bandcamp_url(artist: str, album: str, track: str) -> Optional[str]:
+    try:
+        response = await http.aget(
+            BANDCAMP_SEARCH_URL,
+            **_bandcamp_request(artist, album, track),
+            timeout=REQUEST_TIMEOUT,
+        )
+        if "application/json" not in response.headers.get("Content-Type", ""):
+            return None
+        return _parse_bandcamp(response.json())
+    except (http.CircuitOpenError, httpx.HTTPError, ValueError):
+        return None
 
 
 def youtube_search_url(artist: str, album: str, track: str) -> str:
@@ -52,7 +118,9 @@ def youtube_search_url(artist: str, album: str, track: str) -> str:
     return f"https://www.youtube.com/results?search_query={query}"
 
 
-def find_youtube_watch_url(artist: str, album: str, track: str) -> Optional[str]:
+def find_youtube_watch_url(
+    artist: str, album: str, track: str, *, deadline: Optional[float] = None
+) -> Optional[str]:
     """
     Cerca il primo video YouTube pertinente via Data API.
     Richiede YOUTUBE_API_KEY; senza chiave restituisce None.
@@ -61,35 +129,64 @@ def find_youtube_watch_url(artist: str, album: str, track: str) -> Optional[str]
     if not api_key:
         return None
 
-    query = f"{artist} {album} {track}".strip()
     try:
-        response = requests.get(
-            "https://www.googleapis.com/youtube/v3/search",
-            params={
-                "part": "snippet",
-                "type": "video",
-                "maxResults": 1,
-                "q": query,
-                "key": api_key,
-            },
-            headers={
-                "User-Agent": _user_agent(),
-                "Accept": "application/json",
-            },
+        response = http.get(
+            YOUTUBE_SEARCH_API_URL,
+            **_youtube_request(api_key, artist, album, track),
             timeout=REQUEST_TIMEOUT,
+            deadline=deadline,
         )
-        response.raise_for_status()
-        payload = response.json()
+        return _parse_youtube(response.json())
     except (requests.RequestException, ValueError):
         return None
 
-    items = payload.get("items") or []
-    if not items:
+
+async def afind_youtube_watch_url(artist: str, album: str, track: str) -> Optional[str]:
+    api_key = _youtube_api_key()
+    if not api_key:
         return None
-    video_id = (items[0].get("id") or {}).get("videoId")
-    if not video_id:
+
+    try:
+        response = await http.aget(
+            YOUTUBE_SEARCH_API_URL,
+            **_youtube_request(api_key, artist, album, track),
+            timeout=REQUEST_TIMEOUT,
+        )
+        return _parse_youtube(response.json())
+    except (http.CircuitOpenError, httpx.HTTPError, ValueError):
         return None
-    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+# Relazioni url-rels della registrazione MusicBrainz: un lookup per MBID, niente ricerca
+FONTE_MUSICBRAINZ = "musicbrainz"
+
+
+def _listen_url_from_relations(urls: list[str]) -> Optional[str]:
+    for source in (Brano.ASCOLTO_FONTE_BANDCAMP, Brano.ASCOLTO_FONTE_YOUTUBE):
+        for url in urls:
+            if is_cacheable_listen_url(url, source):
+                return url
+    return None
+
+
+def find_musicbrainz_listen_url(recording_mbid: str) -> Optional[str]:
+    try:
+        return _listen_url_from_relations(get_recording_urls(recording_mbid))
+    except MusicBrainzError:
+        return None
+
+
+async def afind_musicbrainz_listen_url(recording_mbid: str) -> Optional[str]:
+    try:
+        return _listen_url_from_relations(await aget_recording_urls(recording_mbid))
+    except MusicBrainzError:
+        return None
+
+
+def _source_for_url(url: str) -> str:
+    if is_cacheable_listen_url(url, Brano.ASCOLTO_FONTE_BANDCAMP):
+        return Brano.ASCOLTO_FONTE_BANDCAMP
+    return Brano.ASCOLTO_FONTE_YOUTUBE
 
 
 def is_cacheable_listen_url(url: str, source: str) -> bool:
@@ -112,6 +209,100 @@ def cache_listen_url(brano: Brano, url: str, source: str) -> None:
     brano.save(update_fields=["ascolto_url", "ascolto_fonte"])
 
 
+async def acache_listen_url(brano: Brano, url: str, source: str) -> None:
+    if not is_cacheable_listen_url(url, source):
+        return
+    if brano.ascolto_url == url and brano.ascolto_fonte == source:
+        return
+    brano.ascolto_url = url
+    brano.ascolto_fonte = source
+    await brano.asave(update_fields=["ascolto_url", "ascolto_fonte"])
+
+
+def _deadline() -> float:
+    return float(getattr(settings, "LISTEN_LOOKUP_DEADLINE", 8.0))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _listen_executor() -> ThreadPoolExecutor:
+    """Pool condiviso dalle ricerche: i thread (e le loro sessioni HTTP) vengono riusati."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(getattr(settings, "LISTEN_LOOKUP_WORKERS", 8)),
+                thread_name_prefix="listen",
+            )
+        return _executor
+
+
+def _race(
+    finders, artist: str, album: str, track: str, end: Optional[float] = None
+) -> Optional[tuple[str, str]]:
+    """
+    Avvia tutte le fonti in parallelo e restituisce (fonte, url) della prima fonte,
+    in ordine di priorità, che trova un risultato entro la scadenza globale.
+    Le fonti ricevono la scadenza e la passano a http.get(), così quelle abbandonate
+    smettono di ritentare quando scade; quelle non ancora partite vengono annullate.
+    Il circuito di ogni fonte è gestito da http.get(): con il circuito aperto la
+    ricerca termina subito senza risultato. ``end`` (time.monotonic()) permette di
+    condividere la scadenza tra più gare.
+    """
+    end = end if end is not None else time.monotonic() + _deadline()
+    executor = _listen_executor()
+    futures = [
+        (fonte, executor.submit(finder, artist, album, track, deadline=end))
+        for fonte, finder in finders
+    ]
+    try:
+        for fonte, future in futures:
+            try:
+                url = future.result(timeout=max(end - time.monotonic(), 0))
+            except FutureTimeoutError:
+                continue
+            except Exception:
+                logger.exception("Ricerca %s fallita", fonte)
+                continue
+            if url:
+                return fonte, url
+        return None
+    finally:
+        for _fonte, future in futures:
+            future.cancel()
+
+
+async def _arace(
+    finders, artist: str, album: str, track: str, end: Optional[float] = None
+) -> Optional[tuple[str, str]]:
+    """Come _race(), con task asyncio: le fonti abbandonate vengono cancellate."""
+    loop = asyncio.get_running_loop()
+    end = end if end is not None else loop.time() + _deadline()
+    tasks = [
+        (fonte, asyncio.ensure_future(finder(artist, album, track)))
+        for fonte, finder in finders
+    ]
+    try:
+        for fonte, task in tasks:
+            try:
+                # Con timeout a zero wait_for restituisce subito i task già conclusi
+                url = await asyncio.wait_for(task, timeout=max(end - loop.time(), 0))
+            except asyncio.TimeoutError:
+                continue
+            except Exception:
+                logger.exception("Ricerca %s fallita", fonte)
+                continue
+            if url:
+                return fonte, url
+        return None
+    finally:
+        for _fonte, task in tasks:
+            if not task.done():
+                task.cancel()
+
+
 def resolve_listen_url(
     brano: Brano,
     *,
@@ -119,10 +310,18 @@ def resolve_listen_url(
 ) -> tuple[str, str, bool]:
     """
     Restituisce (url, fonte, from_cache).
-    Ordine: cache → Bandcamp → YouTube watch (API) → YouTube search.
+    Priorità: cache → Bandcamp → YouTube watch (API) → link della registrazione
+    MusicBrainz (se il brano ha l'MBID) → YouTube search.
+    Bandcamp e YouTube vengono interrogati in parallelo con una scadenza globale
+    (LISTEN_LOOKUP_DEADLINE); le fonti che falliscono di continuo vengono saltate.
+    MusicBrainz passa dal rate limiter (1 richiesta/s) e raramente ha un link
+    ascoltabile: viene interrogato solo se le altre fonti non trovano nulla, entro
+    la stessa scadenza.
     """
     if not refresh and brano.ascolto_url and brano.ascolto_fonte:
+        LISTEN_CACHE.inc(result="hit")
         return brano.ascolto_url, brano.ascolto_fonte, True
+    LISTEN_CACHE.inc(result="miss")
 
     album = brano.album_appartenenza
     artista = album.artista_appartenenza
@@ -130,15 +329,66 @@ def resolve_listen_url(
     album_title = album.titolo_album
     track_title = brano.titolo_brano
 
-    bandcamp_url = find_bandcamp_url(artist_name, album_title, track_title)
-    if bandcamp_url:
-        cache_listen_url(brano, bandcamp_url, Brano.ASCOLTO_FONTE_BANDCAMP)
-        return bandcamp_url, Brano.ASCOLTO_FONTE_BANDCAMP, False
+    finders = [
+        (Brano.ASCOLTO_FONTE_BANDCAMP, find_bandcamp_url),
+        (Brano.ASCOLTO_FONTE_YOUTUBE, find_youtube_watch_url),
+    ]
+    end = time.monotonic() + _deadline()
+    winner = _race(finders, artist_name, album_title, track_title, end)
+    if not winner and brano.mb_recording_id and time.monotonic() < end:
+        musicbrainz = [
+            (FONTE_MUSICBRAINZ, lambda *_args, **_kwargs: find_musicbrainz_listen_url(brano.mb_recording_id))
+        ]
+        winner = _race(musicbrainz, artist_name, album_title, track_title, end)
+    if winner:
+        fonte, url = winner
+        if fonte == FONTE_MUSICBRAINZ:
+            fonte = _source_for_url(url)
+        cache_listen_url(brano, url, fonte)
+        return url, fonte, False
+
+    return (
+        youtube_search_url(artist_name, album_title, track_title),
+        Brano.ASCOLTO_FONTE_YOUTUBE,
+        False,
+    )
+
+
+async def aresolve_listen_url(
+    brano: Brano,
+    *,
+    refresh: bool = False,
+) -> tuple[str, str, bool]:
+    """
+    Versione asincrona di resolve_listen_url(), stesso contratto e stesse priorità.
+    Il brano deve avere album e artista già caricati (select_related).
+    """
+    if not refresh and brano.ascolto_url and brano.ascolto_fonte:
+        LISTEN_CACHE.inc(result="hit")
+        return brano.ascolto_url, brano.ascolto_fonte, True
+    LISTEN_CACHE.inc(result="miss")
+
+    album = brano.album_appartenenza
+    artist_name = album.artista_appartenenza.nome_artista
+    album_title = album.titolo_album
+    track_title = brano.titolo_brano
 
-    youtube_watch = find_youtube_watch_url(artist_name, album_title, track_title)
-    if youtube_watch:
-        cache_listen_url(brano, youtube_watch, Brano.ASCOLTO_FONTE_YOUTUBE)
-        return youtube_watch, Brano.ASCOLTO_FONTE_YOUTUBE, False
+    finders = [
+        (Brano.ASCOLTO_FONTE_BANDCAMP, afind_bandcamp_url),
+        (Brano.ASCOLTO_FONTE_YOUTUBE, afind_youtube_watch_url),
+    ]
+    loop = asyncio.get_running_loop()
+    end = loop.time() + _deadline()
+    winner = await _arace(finders, artist_name, album_title, track_title, end)
+    if not winner and brano.mb_recording_id and loop.time() < end:
+        musicbrainz = [(FONTE_MUSICBRAINZ, lambda *_: afind_musicbrainz_listen_url(brano.mb_recording_id))]
+        winner = await _arace(musicbrainz, artist_name, album_title, track_title, end)
+    if winner:
+        fonte, url = winner
+        if fonte == FONTE_MUSICBRAINZ:
+            fonte = _source_for_url(url)
+        await acache_listen_url(brano, url, fonte)
+        return url, fonte, False
 
     return (
         youtube_search_url(artist_name, album_title, track_title),
@@ -0,0 +1,197 @@
+"""
+Matching automatico album → release MusicBrainz, usato da match_musicbrainz.
+
+Ogni candidato restituito da search_releases() riceve un punteggio tra 0 e 1
+dato da titolo, anno, etichetta e numero di brani; i criteri per cui l'album
+non ha dati (es. anno mancante) non contano. Il migliore viene accettato se
+supera la soglia e si distacca abbastanza dal secondo; le ristampe con la
+stessa tracklist non rendono ambiguo il risultato (si sceglie la più vecchia).
+"""
+import unicodedata
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Optional
+
+from django.db.models import Exists, OuterRef
+
+from music.models import Album, Brano, MusicBrainzMatch
+from music.services.brani_import import import_tracks_for_album, remember_release
+from music.services.musicbrainz import (
+    MusicBrainzError,
+    ReleaseCandidate,
+    get_release,
+    search_releases,
+)
+
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_MARGIN = 0.1
+MAX_STORED_CANDIDATES = 5
+
+WEIGHT_TITLE = 0.5
+WEIGHT_YEAR = 0.2
+WEIGHT_LABEL = 0.15
+WEIGHT_TRACKS = 0.15
+
+# Suffissi frequenti nei titoli delle ristampe, ignorati nel confronto
+_TITLE_NOISE = ("remaster", "remix", "deluxe", "edition", "expanded", "anniversary", "bonus")
+
+
+@dataclass(frozen=True)
+class ScoredCandidate:
+    candidate: ReleaseCandidate
+    score: float
+
+
+def _normalize(value: Optional[str]) -> str:
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char)).lower()
+    for opening in "([":
+        start = value.find(opening)
+        if start > 0 and any(noise in value[start:] for noise in _TITLE_NOISE):
+            value = value[:start]
+    return " ".join("".join(char if char.isalnum() else " " for char in value).split())
+
+
+def _similarity(left: Optional[str], right: Optional[str]) -> float:
+    left, right = _normalize(left), _normalize(right)
+    if not left or not right:
+        return 0.0
+    if left == right:
+        return 1.0
+    return SequenceMatcher(None, left, right).ratio()
+
+
+def _year(value) -> Optional[int]:
+    text = str(value or "")[:4]
+    return int(text) if text.isdigit() else None
+
+
+def score_candidate(album: Album, candidate: ReleaseCandidate, local_tracks: int = 0) -> float:
+    """Punteggio 0..1 di un candidato per l'album; local_tracks è il numero di brani già in catalogo."""
+    parts = [(WEIGHT_TITLE, _similarity(album.titolo_album, candidate.title))]
+
+    album_year = _year(album.data_rilascio)
+    if album_year:
+        release_year = _year(candidate.date)
+        if release_year is None:
+            year_score = 0.0
+        else:
+            year_score = max(1.0 - abs(album_year - release_year) / 2, 0.0)
+        parts.append((WEIGHT_YEAR, year_score))
+
+    if (album.editore or "").strip():
+        parts.append((WEIGHT_LABEL, _similarity(album.editore, candidate.label)))
+
+    if local_tracks and candidate.track_count:
+        difference = abs(local_tracks - candidate.track_count)
+        parts.append((WEIGHT_TRACKS, max(1.0 - difference / max(local_tracks, 1), 0.0)))
+
+    total_weight = sum(weight for weight, _value in parts)
+    return round(sum(weight * value for weight, value in parts) / total_weight, 4)
+
+
+def rank_candidates(album: Album, candidates: list[ReleaseCandidate], local_tracks: int = 0) -> list[ScoredCandidate]:
+    scored = [ScoredCandidate(candidate, score_candidate(album, candidate, local_tracks)) for candidate in candidates]
+    # A parità di punteggio vince la release più vecchia (di solito l'originale)
+    return sorted(scored, key=lambda item: (-item.score, item.candidate.date or "9999"))
+
+
+def choose_release(
+    ranked: list[ScoredCandidate],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    margin: float = DEFAULT_MARGIN,
+) -> tuple[str, Optional[ScoredCandidate]]:
+    """Restituisce (stato, candidato scelto) secondo soglia e distacco dal secondo."""
+    if not ranked:
+        return MusicBrainzMatch.STATO_NESSUNO, None
+    best = ranked[0]
+    if best.score < threshold:
+        return MusicBrainzMatch.STATO_AMBIGUO, None
+    for other in ranked[1:]:
+        if best.score - other.score >= margin:
+            break
+        # Ristampa con la stessa tracklist: scegliere l'una o l'altra è indifferente
+        if other.candidate.track_count != best.candidate.track_count:
+            return MusicBrainzMatch.STATO_AMBIGUO, None
+    return MusicBrainzMatch.STATO_ABBINATO, best
+
+
+def albums_to_match():
+    """Album senza brani o con almeno un brano senza durata, in ordine di pk (per riprendere)."""
+    brani = Brano.objects.filter(album_appartenenza=OuterRef("pk"))
+    return (
+        Album.objects.select_related("artista_appartenenza")
+        .filter(~Exists(brani) | Exists(brani.filter(durata_secondi__isnull=True)))
+        .order_by("pk")
+    )
+
+
+def _candidate_summary(item: ScoredCandidate) -> dict:
+    candidate = item.candidate
+    return {
+        "mbid": candidate.mbid,
+        "title": candidate.title,
+        "date": candidate.date,
+        "label": candidate.label,
+        "track_count": candidate.track_count,
+        "score": item.score,
+    }
+
+
+def _import_release(match: MusicBrainzMatch, album: Album, release_mbid: str) -> None:
+    detail = get_release(release_mbid)
+    result = import_tracks_for_album(album, detail.tracks, skip_existing=True)
+    remember_release(album, detail)
+    match.brani_creati = result.created
+    match.brani_aggiornati = result.updated
+
+
+def match_album(
+    album: Album,
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    margin: float = DEFAULT_MARGIN,
+    dry_run: bool = False,
+) -> MusicBrainzMatch:
+    """
+    Cerca l'album su MusicBrainz, sceglie la release e ne importa i brani
+    (solo riempiendo i dati mancanti). Se l'album ha già un MBID si salta la
+    ricerca. La decisione viene salvata salvo dry_run.
+    """
+    match = MusicBrainzMatch.objects.filter(album=album).first() or MusicBrainzMatch(album=album)
+    match.release_mbid = ""
+    match.punteggio = 0
+    match.messaggio = ""
+    match.brani_creati = match.brani_aggiornati = 0
+
+    release_date = album.data_rilascio.isoformat() if album.data_rilascio else None
+    try:
+        if album.mb_release_id:
+            # Release già nota (import manuale o run precedente): nessuna ricerca
+            match.stato, match.punteggio = MusicBrainzMatch.STATO_ABBINATO, 1.0
+            match.release_mbid = album.mb_release_id
+            if not dry_run:
+                _import_release(match, album, album.mb_release_id)
+                match.save()
+            return match
+        candidates = search_releases(album.artista_appartenenza.nome_artista, album.titolo_album, release_date)
+        if not candidates and release_date:
+            # L'anno in catalogo può essere quello della ristampa posseduta
+            candidates = search_releases(album.artista_appartenenza.nome_artista, album.titolo_album)
+        ranked = rank_candidates(album, candidates, album.numero_brani)
+        match.candidati = [_candidate_summary(item) for item in ranked[:MAX_STORED_CANDIDATES]]
+        match.stato, chosen = choose_release(ranked, threshold=threshold, margin=margin)
+        if ranked:
+            match.punteggio = ranked[0].score
+        if chosen is not None:
+            match.release_mbid = chosen.candidate.mbid
+            if not dry_run:
+                _import_release(match, album, chosen.candidate.mbid)
+    except MusicBrainzError as exc:
+        match.stato = MusicBrainzMatch.STATO_ERRORE
+        match.messaggio = str(exc)[:255]
+
+    if not dry_run:
+        match.save()
+    return match
@@ -1,4 +1,7 @@
+import asyncio
 import re
+import sqlite3
+import threading
 import time
 from dataclasses import dataclass
 from typing import Optional
@@ -6,9 +9,17 @@ from typing import Optional
 import requests
 from django.conf import settings
 
+from core.metrics import THROTTLE_WAIT
+
+from . import http, musicbrainz_local
+from .durations import format_duration
+from .async_client import httpx
+
 MUSICBRAINZ_API_URL = "https://musicbrainz.org/ws/2"
 REQUEST_TIMEOUT = 15
+MIN_REQUEST_INTERVAL = 1.0
 _last_request_at = 0.0
+_throttle_lock = threading.Lock()
 
 
 class MusicBrainzError(Exception):
@@ -33,6 +44,18 @@ class TrackCandidate:
     progressivo: Optional[str]
     durata: Optional[str]
     crediti: Optional[str]
+    durata_secondi: Optional[int] = None
+    posizione: Optional[int] = None
+    recording_mbid: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ReleaseDetail:
+    """Release letta per MBID: dati della release, MBID dell'artista e brani."""
+
+    release: ReleaseCandidate
+    artist_mbid: Optional[str]
+    tracks: list[TrackCandidate]
 
 
 def _user_agent() -> str:
@@ -47,40 +70,122 @@ def _escape_lucene(value: str) -> str:
     return re.sub(r'([+\-&|!(){}[\]^"~*?:\\/])', r"\\\1", value.strip())
 
 
-def _throttle() -> None:
+def _reserve_slot() -> float:
+    """
+    Prenota il prossimo slot libero (1 richiesta al secondo) e restituisce
+    quanto attendere. Condiviso da client sincrono e asincrono.
+    """
     global _last_request_at
-    min_interval = 1.0
-    elapsed = time.monotonic() - _last_request_at
-    if elapsed < min_interval:
-        time.sleep(min_interval - elapsed)
-    _last_request_at = time.monotonic()
+    with _throttle_lock:
+        now = time.monotonic()
+        wait = max(_last_request_at + MIN_REQUEST_INTERVAL - now, 0.0)
+        _last_request_at = now + wait
+    return wait
+
+
+def _throttle() -> None:
+    wait = _reserve_slot()
+    if wait:
+        time.sleep(wait)
+    THROTTLE_WAIT.observe(wait)
+
+
+async def _athrottle() -> None:
+    wait = _reserve_slot()
+    if wait:
+        await asyncio.sleep(wait)
+    THROTTLE_WAIT.observe(wait)
+
+
+def _headers() -> dict:
+    return {"User-Agent": _user_agent(), "Accept": "application/json"}
+
+
+def _retries() -> int:
+    return getattr(settings, "HTTP_RETRIES", 2)
+
+
+def _retry_wait(response, attempt: int) -> Optional[float]:
+    """
+    Attesa aggiuntiva prima del prossimo tentativo, None se l'errore è definitivo.
+    Dopo un errore di rete basta il throttling; 503 è anche il segnale di rate
+    limit di MusicBrainz e rispetta Retry-After.
+    """
+    if response is None:
+        return 0.0
+    if response.status_code not in http.RETRY_STATUSES:
+        return None
+    return http.retry_delay(response, attempt)
 
 
 def _get(path: str, params: Optional[dict] = None) -> dict:
-    _throttle()
     url = f"{MUSICBRAINZ_API_URL}/{path.lstrip('/')}"
+    retries = _retries()
+    # I retry sono gestiti qui, non da http.get: ogni tentativo passa dal throttling
+    for attempt in range(retries + 1):
+        _throttle()
+        try:
+            response = http.get(url, params=params, headers=_headers(), timeout=REQUEST_TIMEOUT, retries=0)
+            return response.json()
+        except http.CircuitOpenError as exc:
+            error, delay = exc, None
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            error, delay = exc, _retry_wait(None, attempt)
+        except requests.HTTPError as exc:
+            error, delay = exc, _retry_wait(exc.response, attempt)
+        except requests.RequestException as exc:
+            error, delay = exc, None
+        except ValueError as exc:
+            raise MusicBrainzError("Risposta MusicBrainz non valida.") from exc
+        if delay is None or attempt == retries:
+            raise MusicBrainzError(f"Richiesta a MusicBrainz fallita: {error}") from error
+        if delay:
+            http.pause(delay)
+
+
+async def _aget(path: str, params: Optional[dict] = None) -> dict:
+    """Come _get(), sul client httpx asincrono condiviso."""
+    url = f"{MUSICBRAINZ_API_URL}/{path.lstrip('/')}"
+    retries = _retries()
+    for attempt in range(retries + 1):
+        await _athrottle()
+        try:
+            response = await http.aget(url, params=params, headers=_headers(), timeout=REQUEST_TIMEOUT, retries=0)
+            return response.json()
+        except http.CircuitOpenError as exc:
+            error, delay = exc, None
+        except httpx.TransportError as exc:
+            error, delay = exc, _retry_wait(None, attempt)
+        except httpx.HTTPStatusError as exc:
+            error, delay = exc, _retry_wait(exc.response, attempt)
+        except httpx.HTTPError as exc:
+            error, delay = exc, None
+        except ValueError as exc:
+            raise MusicBrainzError("Risposta MusicBrainz non valida.") from exc
+        if delay is None or attempt == retries:
+            raise MusicBrainzError(f"Richiesta a MusicBrainz fallita: {error}") from error
+        if delay:
+            await http.apause(delay)
+
+
+def _use_local() -> bool:
+    return getattr(settings, "MUSICBRAINZ_BACKEND", "api") == "local"
+
+
+def _local(fetch, *args):
+    """Legge dal mirror locale (MUSICBRAINZ_BACKEND = "local"), con gli stessi errori delle API."""
     try:
-        response = requests.get(
-            url,
-            params=params,
-            headers={"User-Agent": _user_agent(), "Accept": "application/json"},
-            timeout=REQUEST_TIMEOUT,
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as exc:
-        raise MusicBrainzError(f"Richiesta a MusicBrainz fallita: {exc}") from exc
-    except ValueError as exc:
-        raise MusicBrainzError("Risposta MusicBrainz non valida.") from exc
+        payload = fetch(*args)
+    except (musicbrainz_local.MirrorUnavailable, sqlite3.Error) as exc:
+        raise MusicBrainzError(f"Mirror MusicBrainz locale non disponibile: {exc}") from exc
+    if payload is None:
+        raise MusicBrainzError(f"{args[0]} non presente nel mirror MusicBrainz locale.")
+    return payload
 
 
-def format_duration(length_ms: Optional[int]) -> Optional[str]:
-    if not length_ms:
-        return None
-    total_seconds = max(int(length_ms // 1000), 0)
-    minutes, seconds = divmod(total_seconds, 60)
-    formatted = f"{minutes}:{seconds:02d}"
-    return formatted[:5]
+async def _alocal(fetch, *args):
+    # Lettura da disco locale: in un thread per non bloccare l'event loop
+    return await asyncio.to_thread(_local, fetch, *args)
 
 
 def _release_label(release: dict) -> str:
@@ -92,12 +197,12 @@ def _release_label(release: dict) -> str:
     return ""
 
 
-def search_releases(
+def _search_params(
     artist_name: str,
     album_title: str,
-    release_date: Optional[str] = None,
-    limit: int = 10,
-) -> list[ReleaseCandidate]:
+    release_date: Optional[str],
+    limit: int,
+) -> dict:
     artist = _escape_lucene(artist_name)
     album = _escape_lucene(album_title)
     query_parts = [f'artist:"{artist}"', f'release:"{album}"']
@@ -105,14 +210,14 @@ def search_releases(
         year = str(release_date)[:4]
         if year.isdigit():
             query_parts.append(f"date:{year}")
-    payload = _get(
-        "release",
-        {
-            "query": " AND ".join(query_parts),
-            "fmt": "json",
-            "limit": limit,
-        },
-    )
+    return {
+        "query": " AND ".join(query_parts),
+        "fmt": "json",
+        "limit": limit,
+    }
+
+
+def _parse_releases(payload: dict) -> list[ReleaseCandidate]:
     candidates = []
     for release in payload.get("releases") or []:
         mbid = release.get("id")
@@ -133,11 +238,36 @@ def search_releases(
     return candidates
 
 
-def get_release_tracks(release_mbid: str) -> list[TrackCandidate]:
-    payload = _get(
-        f"release/{release_mbid}",
-        {"inc": "recordings+artist-credits+media", "fmt": "json"},
-    )
+def search_releases(
+    artist_name: str,
+    album_title: str,
+    release_date: Optional[str] = None,
+    limit: int = 10,
+) -> list[ReleaseCandidate]:
+    if _use_local():
+        payload = _local(musicbrainz_local.search_payload, artist_name, album_title, release_date, limit)
+    else:
+        payload = _get("release", _search_params(artist_name, album_title, release_date, limit))
+    return _parse_releases(payload)
+
+
+async def asearch_releases(
+    artist_name: str,
+    album_title: str,
+    release_date: Optional[str] = None,
+    limit: int = 10,
+) -> list[ReleaseCandidate]:
+    if _use_local():
+        payload = await _alocal(musicbrainz_local.search_payload, artist_name, album_title, release_date, limit)
+    else:
+        payload = await _aget("release", _search_params(artist_name, album_title, release_date, limit))
+    return _parse_releases(payload)
+
+
+RELEASE_TRACKS_PARAMS = {"inc": "recordings+artist-credits+media+labels", "fmt": "json"}
+
+
+def _parse_release_tracks(payload: dict) -> list[TrackCandidate]:
     tracks: list[TrackCandidate] = []
     media_list = payload.get("media") or []
     single_medium = len(media_list) <= 1
@@ -160,19 +290,91 @@ def get_release_tracks(release_mbid: str) -> list[TrackCandidate]:
 
             recording = track.get("recording") or {}
             crediti = _recording_credits(recording)
+            length_ms = track.get("length") or recording.get("length")
+            posizione = track.get("position")
 
             tracks.append(
                 TrackCandidate(
                     titolo_brano=title[:150],
                     sezione=sezione[:2] if sezione else None,
                     progressivo=progressivo,
-                    durata=format_duration(track.get("length") or recording.get("length")),
+                    durata=format_duration(length_ms),
                     crediti=crediti[:100] if crediti else None,
+                    durata_secondi=int(length_ms // 1000) if length_ms else None,
+                    posizione=int(posizione) if str(posizione or "").isdigit() else None,
+                    recording_mbid=recording.get("id") or None,
                 )
             )
     return tracks
 
 
+def _release_artist_mbid(release: dict) -> Optional[str]:
+    for entry in release.get("artist-credit") or []:
+        artist_id = (entry.get("artist") or {}).get("id")
+        if artist_id:
+            return artist_id
+    return None
+
+
+def _parse_release(release_mbid: str, payload: dict) -> ReleaseDetail:
+    media = payload.get("media") or []
+    release = ReleaseCandidate(
+        mbid=payload.get("id") or release_mbid,
+        title=(payload.get("title") or "").strip(),
+        date=(payload.get("date") or "").strip(),
+        country=(payload.get("country") or "").strip(),
+        label=_release_label(payload),
+        track_count=sum(int(medium.get("track-count") or len(medium.get("tracks") or [])) for medium in media),
+        medium_count=len(media),
+    )
+    return ReleaseDetail(release, _release_artist_mbid(payload), _parse_release_tracks(payload))
+
+
+def get_release(release_mbid: str) -> ReleaseDetail:
+    """Lookup diretto per MBID: nessuna ricerca Lucene."""
+    if _use_local():
+        return _parse_release(release_mbid, _local(musicbrainz_local.release_payload, release_mbid))
+    return _parse_release(release_mbid, _get(f"release/{release_mbid}", RELEASE_TRACKS_PARAMS))
+
+
+async def aget_release(release_mbid: str) -> ReleaseDetail:
+    if _use_local():
+        return _parse_release(release_mbid, await _alocal(musicbrainz_local.release_payload, release_mbid))
+    return _parse_release(release_mbid, await _aget(f"release/{release_mbid}", RELEASE_TRACKS_PARAMS))
+
+
+def get_release_tracks(release_mbid: str) -> list[TrackCandidate]:
+    return get_release(release_mbid).tracks
+
+
+async def aget_release_tracks(release_mbid: str) -> list[TrackCandidate]:
+    return (await aget_release(release_mbid)).tracks
+
+
+RECORDING_URL_PARAMS = {"inc": "url-rels", "fmt": "json"}
+
+
+def _parse_recording_urls(payload: dict) -> list[str]:
+    return [
+        relation["url"]["resource"]
+        for relation in payload.get("relations") or []
+        if (relation.get("url") or {}).get("resource")
+    ]
+
+
+def get_recording_urls(recording_mbid: str) -> list[str]:
+    """URL collegati a una registrazione (streaming, acquisto, video)."""
+    if _use_local():
+        return _parse_recording_urls(_local(musicbrainz_local.recording_payload, recording_mbid))
+    return _parse_recording_urls(_get(f"recording/{recording_mbid}", RECORDING_URL_PARAMS))
+
+
+async def aget_recording_urls(recording_mbid: str) -> list[str]:
+    if _use_local():
+        return _parse_recording_urls(await _alocal(musicbrainz_local.recording_payload, recording_mbid))
+    return _parse_recording_urls(await _aget(f"recording/{recording_mbid}", RECORDING_URL_PARAMS))
+
+
 def _recording_credits(recording: dict) -> Optional[str]:
     artist_credit = recording.get("artist-credit") or []
     names = []
@@ -0,0 +1,260 @@
+"""
+Mirror locale di MusicBrainz: estratto SQLite dei dump JSON ufficiali
+(https://metabrainz.org/datasets), caricato con ``manage.py ingest_musicbrainz_dump``.
+
+Con MUSICBRAINZ_BACKEND = "local" le funzioni di music.services.musicbrainz
+leggono da qui invece che dalle API: nessuna rete e nessun limite di 1 richiesta
+al secondo. Le funzioni restituiscono payload con la stessa forma delle risposte
+API, così il parsing resta unico.
+
+Ogni release è salvata ridotta ai campi usati dall'import, con il nome
+normalizzato di artista e titolo indicizzato per la ricerca.
+"""
+import bz2
+import gzip
+import json
+import lzma
+import os
+import sqlite3
+import tarfile
+import unicodedata
+from contextlib import closing
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS release (
+    mbid TEXT PRIMARY KEY,
+    artist_norm TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    year TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS release_artist_title_idx ON release (artist_norm, title_norm);
+CREATE INDEX IF NOT EXISTS release_title_idx ON release (title_norm);
+CREATE TABLE IF NOT EXISTS recording_url (
+    recording_mbid TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (recording_mbid, url)
+);
+"""
+
+
+class MirrorUnavailable(Exception):
+    """Il file del mirror locale non esiste o non è leggibile."""
+
+
+def db_path() -> str:
+    return str(getattr(settings, "MUSICBRAINZ_LOCAL_DB", "") or os.path.join(settings.BASE_DIR, "musicbrainz.sqlite3"))
+
+
+# Lettere che la decomposizione Unicode non riduce a ASCII
+_TRANSLITERATION = str.maketrans({"æ": "ae", "œ": "oe", "ø": "o", "ß": "ss", "ð": "d", "þ": "th", "ł": "l"})
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Minuscolo, senza accenti né punteggiatura: "Ágætis Byrjun" → "agaetis byrjun"."""
+    value = unicodedata.normalize("NFKD", (value or "").lower().translate(_TRANSLITERATION))
+    value = "".join(char for char in value if not unicodedata.combining(char)).lower()
+    return " ".join("".join(char if char.isalnum() else " " for char in value).split())
+
+
+def connect(path: Optional[str] = None, *, create: bool = False) -> sqlite3.Connection:
+    path = path or db_path()
+    if not create and not os.path.exists(path):
+        raise MirrorUnavailable(f"Mirror MusicBrainz non trovato in {path}: esegui ingest_musicbrainz_dump")
+    connection = sqlite3.connect(path)
+    if create:
+        connection.executescript(_SCHEMA)
+    return connection
+
+
+# --- Ingest -----------------------------------------------------------------
+
+
+def _artist_credit(credits: list) -> list:
+    return [
+        {
+            "name": entry.get("name") or (entry.get("artist") or {}).get("name") or "",
+            "joinphrase": entry.get("joinphrase") or "",
+            "artist": {"id": (entry.get("artist") or {}).get("id")},
+        }
+        for entry in credits or []
+    ]
+
+
+def _credit_name(credits: list) -> str:
+    return "".join(f"{entry['name']}{entry['joinphrase']}" for entry in credits)
+
+
+def trim_release(release: dict) -> dict:
+    """Riduce una release del dump ai campi letti da musicbrainz._parse_release()."""
+    media = []
+    for medium in release.get("media") or []:
+        tracks = [
+            {
+                "title": track.get("title"),
+                "number": track.get("number"),
+                "position": track.get("position"),
+                "length": track.get("length"),
+                "recording": {
+                    "id": (track.get("recording") or {}).get("id"),
+                    "length": (track.get("recording") or {}).get("length"),
+                    "artist-credit": _artist_credit((track.get("recording") or {}).get("artist-credit")),
+                },
+            }
+            for track in medium.get("tracks") or []
+        ]
+        media.append(
+            {
+                "position": medium.get("position"),
+                "track-count": medium.get("track-count") or len(tracks),
+                "tracks": tracks,
+            }
+        )
+    return {
+        "id": release.get("id"),
+        "title": release.get("title"),
+        "date": release.get("date") or "",
+        "country": release.get("country") or "",
+        "label-info": [
+            {"label": {"name": ((info or {}).get("label") or {}).get("name")}}
+            for info in release.get("label-info") or []
+        ],
+        "artist-credit": _artist_credit(release.get("artist-credit")),
+        "media": media,
+    }
+
+
+def _summary(payload: dict) -> dict:
+    """Voce nel formato dei risultati di ricerca /ws/2/release?query=..."""
+    return {
+        "id": payload["id"],
+        "title": payload["title"],
+        "date": payload["date"],
+        "country": payload["country"],
+        "label-info": payload["label-info"],
+        "artist-credit": payload["artist-credit"],
+        "track-count": sum(medium["track-count"] for medium in payload["media"]),
+        "medium-count": len(payload["media"]),
+    }
+
+
+def _recording_urls(release: dict) -> Iterator[tuple[str, str]]:
+    for medium in release.get("media") or []:
+        for track in medium.get("tracks") or []:
+            recording = track.get("recording") or {}
+            for relation in recording.get("relations") or []:
+                url = (relation.get("url") or {}).get("resource")
+                if recording.get("id") and url:
+                    yield recording["id"], url
+
+
+def iter_dump(path: str) -> Iterator[dict]:
+    """
+    Release di un dump JSON (una per riga): file semplice o compresso
+    (.gz, .bz2, .xz), oppure l'archivio release.tar.xz ufficiale.
+    """
+    if tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile() and member.name.rsplit("/", 1)[-1] == "release":
+                    yield from _iter_lines(archive.extractfile(member))
+        return
+    openers = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+    opener = openers.get(os.path.splitext(path)[1], open)
+    with opener(path, "rb") as handle:
+        yield from _iter_lines(handle)
+
+
+def _iter_lines(handle) -> Iterator[dict]:
+    for line in handle:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def ingest(
+    releases: Iterable[dict],
+    *,
+    path: Optional[str] = None,
+    artists: Optional[set[str]] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Carica le release nel mirror (sostituendo quelle già presenti).
+    Con ``artists`` (nomi normalizzati) tiene solo le release di quegli artisti.
+    """
+    count = 0
+    with closing(connect(path, create=True)) as connection:
+        rows, urls = [], []
+
+        def flush():
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO release VALUES (?, ?, ?, ?, ?, ?)", rows)
+                connection.executemany("INSERT OR IGNORE INTO recording_url VALUES (?, ?)", urls)
+            rows.clear()
+            urls.clear()
+
+        for release in releases:
+            if not release.get("id") or not release.get("title"):
+                continue
+            payload = trim_release(release)
+            artist_norm = normalize_name(_credit_name(payload["artist-credit"]))
+            if artists is not None and artist_norm not in artists:
+                continue
+            rows.append(
+                (
+                    payload["id"],
+                    artist_norm,
+                    normalize_name(payload["title"]),
+                    payload["date"][:4],
+                    json.dumps(_summary(payload)),
+                    json.dumps(payload),
+                )
+            )
+            urls.extend(_recording_urls(release))
+            count += 1
+            if len(rows) >= batch_size:
+                flush()
+        flush()
+    return count
+
+
+# --- Lettura (stessa forma delle risposte API) -------------------------------
+
+
+def search_payload(artist_name: str, album_title: str, release_date: Optional[str], limit: int) -> dict:
+    """Release dell'artista con lo stesso titolo normalizzato o che inizia con esso."""
+    artist, title = normalize_name(artist_name), normalize_name(album_title)
+    year = str(release_date or "")[:4]
+    query = (
+        "SELECT summary FROM release WHERE artist_norm = ? "
+        "AND (title_norm = ? OR title_norm BETWEEN ? AND ?)"
+    )
+    params = [artist, title, f"{title} ", f"{title} \uffff"]
+    if year.isdigit():
+        query += " AND year = ?"
+        params.append(year)
+    query += " ORDER BY title_norm <> ?, year, mbid LIMIT ?"
+    params += [title, limit]
+    with closing(connect()) as connection:
+        rows = connection.execute(query, params).fetchall()
+    return {"releases": [json.loads(summary) for (summary,) in rows]}
+
+
+def release_payload(release_mbid: str) -> Optional[dict]:
+    with closing(connect()) as connection:
+        row = connection.execute("SELECT payload FROM release WHERE mbid = ?", (release_mbid,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def recording_payload(recording_mbid: str) -> dict:
+    with closing(connect()) as connection:
+        rows = connection.execute(
+            "SELECT url FROM recording_url WHERE recording_mbid = ? ORDER BY url",
+            (recording_mbid,),
+        ).fetchall()
+    return {"relations": [{"url": {"resource": url}} for (url,) in rows]}
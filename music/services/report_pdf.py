@@ -0,0 +1,122 @@
+"""
+Report PDF di artisti e album (xhtml2pdf).
+
+La generazione legge l'intero catalogo e può richiedere decine di secondi:
+la vista report_artisti_pdf la accoda come job (task "report_artisti_pdf" in
+music/tasks.py) e serve l'ultimo PDF generato finché il catalogo non cambia
+(catalogue_version()).
+"""
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch
+from django.template.loader import render_to_string
+
+from core.metrics import PDF_BUILD
+from music.models import Album, Artista
+
+
+# Intervallo minimo (secondi) tra due segnali di avanzamento durante l'impaginazione
+PROGRESS_EVERY = 5
+
+
+class PdfError(Exception):
+    pass
+
+
+def catalogue_version() -> str:
+    """
+    Versione dei dati mostrati nel PDF, letta dal database: numero e ultima
+    modifica (aggiornato_il) di artisti e album. Cambia con ogni salvataggio,
+    anche da worker e comandi, e con le statistiche dei brani ricalcolate.
+    """
+    parts = [
+        model.objects.aggregate(totale=Count("pk"), ultimo=Max("aggiornato_il"))
+        for model in (Artista, Album)
+    ]
+    payload = ";".join(f"{part['totale']}:{part['ultimo'] and part['ultimo'].isoformat()}" for part in parts)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _link_callback(uri, rel):
+    """
+    Converte URL static/media in percorsi file assoluti per xhtml2pdf.
+    """
+    if uri.startswith(settings.MEDIA_URL):
+        path = os.path.join(settings.MEDIA_ROOT, uri.replace(settings.MEDIA_URL, ""))
+    elif uri.startswith(settings.STATIC_URL):
+        static_root = getattr(settings, "STATIC_ROOT", None) or os.path.join(settings.BASE_DIR, "static")
+        path = os.path.join(static_root, uri.replace(settings.STATIC_URL, ""))
+    else:
+        return uri
+    return path
+
+
+def _progress_link_callback(progress, immagini: int):
+    """
+    link_callback che riporta l'avanzamento mentre xhtml2pdf carica le copertine:
+    l'impaginazione è la fase lunga e non ha altri punti in cui segnalare che è viva.
+    """
+    caricate = 0
+    ultimo = time.monotonic()
+
+    def callback(uri, rel):
+        nonlocal caricate, ultimo
+        caricate += 1
+        if time.monotonic() - ultimo >= PROGRESS_EVERY:
+            ultimo = time.monotonic()
+            fatte = min(caricate, immagini)
+            progress(40 + 50 * fatte // max(immagini, 1), f"Impaginazione del PDF: {fatte}/{immagini} immagini")
+        return _link_callback(uri, rel)
+
+    return callback
+
+
+def build_artisti_pdf(dest, progress=None) -> None:
+    """
+    Scrive in ``dest`` (file o buffer) il PDF con:
+    - Elenco Artisti
+    - Per ogni artista: album in ordine di data_rilascio, con copertina, etichetta (editore) e catalogo
+
+    ``progress(percentuale, messaggio)``, se indicato, viene chiamato durante la
+    generazione (il task lo usa come segnale di vita del job).
+    """
+    try:
+        from xhtml2pdf import pisa
+    except ImportError:
+        raise PdfError("PDF non disponibile: installare xhtml2pdf.")
+
+    # Include "Classica" in coda, poi ordina per genere (Z->A), artista, supporto, anno, titolo
+    albums_ordered = Album.objects.catalogue_order()
+    artisti = Artista.objects.all().prefetch_related(
+        Prefetch("albums", queryset=albums_ordered),
+        "albums__stili",
+    ).order_by("nome_artista")
+
+    # Calcola statistiche totali
+    total_artisti = Artista.objects.count()
+    total_albums = Album.objects.filter(classica_in_coda=False).count()
+
+    link_callback = _link_callback
+    if progress is not None:
+        progress(20, "Lettura del catalogo")
+        link_callback = _progress_link_callback(progress, Album.objects.exclude(copertina="").count())
+
+    with PDF_BUILD.time():
+        # ordina gli album per data_rilascio discendente a livello di template
+        html = render_to_string(
+            "music/report_artisti_albums.html",
+            {
+                "artisti": artisti,
+                "MEDIA_URL": settings.MEDIA_URL,
+                "total_artisti": total_artisti,
+                "total_albums": total_albums,
+            },
+        )
+        if progress is not None:
+            progress(40, "Impaginazione del PDF")
+        pisa_status = pisa.CreatePDF(html, dest=dest, link_callback=link_callback, encoding="utf-8")
+    if pisa_status.err:
+        raise PdfError("Errore nella generazione del PDF")
@@ -0,0 +1,216 @@
+"""
+Indice della ricerca globale (SearchDocument): costruzione dei documenti e query.
+
+I documenti si costruiscono da .values() in blocco, con una query per tipo
+indipendentemente dal numero di righe. La migrazione 0012 ne contiene una copia
+che lavora sui modelli storici.
+
+Campi indicizzati (come la ricerca precedente):
+- artista: nome, profilo, componenti
+- album: titolo, nome artista, editore, genere, note
+- brano: titolo, crediti
+
+Su PostgreSQL la ricerca usa la colonna tsvector con indice GIN e ordina per
+ts_rank; sugli altri database ripiega su LIKE sul testo.
+"""
+import re
+from typing import Iterable, Optional
+
+from django.db import connection
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+
+from music.models import Album, Artista, Brano, SearchDocument
+
+ORDINE_TIPO = {
+    SearchDocument.TIPO_ARTISTA: 0,
+    SearchDocument.TIPO_ALBUM: 1,
+    SearchDocument.TIPO_BRANO: 2,
+}
+
+# Colonna e indice generati dal database (solo PostgreSQL), vedi migrazione 0012
+POSTGRES_VECTOR_SQL = [
+    """
+    ALTER TABLE music_searchdocument ADD COLUMN vettore tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(titolo, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(testo, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX searchdocument_vettore_gin ON music_searchdocument USING GIN (vettore)",
+]
+
+
+def _text(*values) -> str:
+    return " ".join(str(value).strip() for value in values if value).lower()
+
+
+def _artist_documents(Artista, ids=None):
+    rows = Artista.objects.all()
+    if ids is not None:
+        rows = rows.filter(pk__in=ids)
+    for row in rows.values("pk", "nome_artista", "profilo", "componenti").iterator():
+        yield dict(
+            tipo=SearchDocument.TIPO_ARTISTA,
+            oggetto_id=row["pk"],
+            artista_id=row["pk"],
+            titolo=row["nome_artista"],
+            artista_nome=row["nome_artista"],
+            testo=_text(row["nome_artista"], row["profilo"], row["componenti"]),
+        )
+
+
+def _album_documents(Album, ids=None):
+    rows = Album.objects.all()
+    if ids is not None:
+        rows = rows.filter(pk__in=ids)
+    fields = (
+        "pk",
+        "titolo_album",
+        "editore",
+        "genere",
+        "note",
+        "data_rilascio",
+        "copertina",
+        "artista_appartenenza",
+        "artista_appartenenza__nome_artista",
+    )
+    for row in rows.values(*fields).iterator():
+        artista_nome = row["artista_appartenenza__nome_artista"]
+        yield dict(
+            tipo=SearchDocument.TIPO_ALBUM,
+            oggetto_id=row["pk"],
+            artista_id=row["artista_appartenenza"],
+            album_id=row["pk"],
+            titolo=row["titolo_album"],
+            artista_nome=artista_nome,
+            album_titolo=row["titolo_album"],
+            anno=row["data_rilascio"].year if row["data_rilascio"] else None,
+            copertina=row["copertina"] or "",
+            testo=_text(row["titolo_album"], artista_nome, row["editore"], row["genere"], row["note"]),
+        )
+
+
+def _track_documents(Brano, ids=None):
+    rows = Brano.objects.all()
+    if ids is not None:
+        rows = rows.filter(pk__in=ids)
+    fields = (
+        "pk",
+        "titolo_brano",
+        "crediti",
+        "durata",
+        "album_appartenenza",
+        "album_appartenenza__titolo_album",
+        "album_appartenenza__artista_appartenenza",
+        "album_appartenenza__artista_appartenenza__nome_artista",
+    )
+    for row in rows.values(*fields).iterator():
+        yield dict(
+            tipo=SearchDocument.TIPO_BRANO,
+            oggetto_id=row["pk"],
+            artista_id=row["album_appartenenza__artista_appartenenza"],
+            album_id=row["album_appartenenza"],
+            titolo=row["titolo_brano"],
+            artista_nome=row["album_appartenenza__artista_appartenenza__nome_artista"],
+            album_titolo=row["album_appartenenza__titolo_album"],
+            crediti=row["crediti"] or "",
+            durata=row["durata"] or "",
+            testo=_text(row["titolo_brano"], row["crediti"]),
+        )
+
+
+def _replace(SearchDocument, tipo: str, documents: Iterable[dict], ids=None, batch_size: int = 1000) -> int:
+    """Sostituisce i documenti di un tipo (tutti, o solo quelli degli oggetti in ids)."""
+    existing = SearchDocument.objects.filter(tipo=tipo)
+    if ids is not None:
+        existing = existing.filter(oggetto_id__in=ids)
+    existing.delete()
+    created = SearchDocument.objects.bulk_create(
+        (SearchDocument(ordine_tipo=ORDINE_TIPO[tipo], **document) for document in documents),
+        batch_size=batch_size,
+    )
+    return len(created)
+
+
+def index_artista(artista: Artista) -> None:
+    """Aggiorna il documento dell'artista; se il nome è cambiato anche quelli di album e brani."""
+    previous = SearchDocument.objects.filter(tipo=SearchDocument.TIPO_ARTISTA, oggetto_id=artista.pk).first()
+    _replace(SearchDocument, SearchDocument.TIPO_ARTISTA, _artist_documents(Artista, [artista.pk]), [artista.pk])
+    if previous is not None and previous.titolo == artista.nome_artista:
+        return
+    album_ids = list(Album.objects.filter(artista_appartenenza=artista).values_list("pk", flat=True))
+    _replace(SearchDocument, SearchDocument.TIPO_ALBUM, _album_documents(Album, album_ids), album_ids)
+    brano_ids = list(Brano.objects.filter(album_appartenenza__in=album_ids).values_list("pk", flat=True))
+    _replace(SearchDocument, SearchDocument.TIPO_BRANO, _track_documents(Brano, brano_ids), brano_ids)
+
+
+def index_album(album: Album) -> None:
+    """Aggiorna il documento dell'album; se titolo o artista sono cambiati anche quelli dei brani."""
+    previous = SearchDocument.objects.filter(tipo=SearchDocument.TIPO_ALBUM, oggetto_id=album.pk).first()
+    _replace(SearchDocument, SearchDocument.TIPO_ALBUM, _album_documents(Album, [album.pk]), [album.pk])
+    if (
+        previous is not None
+        and previous.titolo == album.titolo_album
+        and previous.artista_id == album.artista_appartenenza_id
+    ):
+        return
+    brano_ids = list(Brano.objects.filter(album_appartenenza=album).values_list("pk", flat=True))
+    _replace(SearchDocument, SearchDocument.TIPO_BRANO, _track_documents(Brano, brano_ids), brano_ids)
+
+
+def index_brano(brano: Brano) -> None:
+    _replace(SearchDocument, SearchDocument.TIPO_BRANO, _track_documents(Brano, [brano.pk]), [brano.pk])
+
+
+def unindex(tipo: str, pk: int) -> None:
+    SearchDocument.objects.filter(tipo=tipo, oggetto_id=pk).delete()
+
+
+def rebuild_search_index() -> dict[str, int]:
+    """Ricostruisce l'intero indice."""
+    return {
+        SearchDocument.TIPO_ARTISTA: _replace(SearchDocument, SearchDocument.TIPO_ARTISTA, _artist_documents(Artista)),
+        SearchDocument.TIPO_ALBUM: _replace(SearchDocument, SearchDocument.TIPO_ALBUM, _album_documents(Album)),
+        SearchDocument.TIPO_BRANO: _replace(SearchDocument, SearchDocument.TIPO_BRANO, _track_documents(Brano)),
+    }
+
+
+# --- Ricerca ------------------------------------------------------------------
+
+
+def search_terms(query: Optional[str]) -> list[str]:
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def _matching(query: Optional[str]):
+    terms = search_terms(query)
+    if not terms:
+        return SearchDocument.objects.none(), None
+    documents = SearchDocument.objects.all()
+    if connection.vendor == "postgresql":
+        # Prefisso su ogni parola: "pink flo" trova "Pink Floyd"
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return documents.extra(where=["vettore @@ to_tsquery('simple', %s)"], params=[tsquery]), tsquery
+    for term in terms:
+        documents = documents.filter(testo__contains=term)
+    return documents, None
+
+
+def search_documents(query: Optional[str], tipo: Optional[str] = None):
+    """Documenti che contengono tutte le parole della query, dal più rilevante."""
+    documents, tsquery = _matching(query)
+    if tipo:
+        documents = documents.filter(tipo=tipo)
+    if tsquery is not None:
+        rank = RawSQL("ts_rank(vettore, to_tsquery('simple', %s))", [tsquery])
+        return documents.annotate(rank=rank).order_by("-rank", "ordine_tipo", "titolo", "pk")
+    return documents.order_by("ordine_tipo", "titolo", "pk")
+
+
+def count_by_type(query: Optional[str]) -> dict[str, int]:
+    """Numero di risultati per tipo, con una sola query raggruppata."""
+    documents, _tsquery = _matching(query)
+    counts = dict.fromkeys(ORDINE_TIPO, 0)
+    for row in documents.values("tipo").annotate(totale=Count("pk")).order_by():
+        counts[row["tipo"]] = row["totale"]
+    return counts
@@ -0,0 +1,59 @@
+"""
+Miniature delle immagini caricate (foto artisti, copertine): JPEG ridotti
+salvati in MEDIA_ROOT/miniature/<lato>/, generati alla prima richiesta.
+Se l'originale non è leggibile si usa l'immagine originale.
+"""
+import logging
+import os
+from io import BytesIO
+from typing import Optional
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = 160
+
+
+def thumbnail_name(name: str, size: int = THUMBNAIL_SIZE) -> str:
+    return f"miniature/{size}/{os.path.splitext(name)[0]}.jpg"
+
+
+def _render(field_file, size: int) -> bytes:
+    with field_file.open("rb") as handle:
+        img = Image.open(handle)
+        img.load()
+    if img.mode != "RGB":
+        # Sfondo bianco per le immagini con trasparenza
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    img.save(output, format="JPEG", quality=80, optimize=True)
+    return output.getvalue()
+
+
+def rebuild_thumbnail(field_file, size: int = THUMBNAIL_SIZE) -> bool:
+    """Rigenera la miniatura (es. dopo aver sostituito il file originale)."""
+    if not field_file or not field_file.name:
+        return False
+    default_storage.delete(thumbnail_name(field_file.name, size))
+    return thumbnail_url(field_file, size) is not None
+
+
+def thumbnail_url(field_file, size: int = THUMBNAIL_SIZE) -> Optional[str]:
+    """URL della miniatura di un ImageField, creandola se non esiste ancora."""
+    if not field_file or not field_file.name:
+        return None
+    name = thumbnail_name(field_file.name, size)
+    if not default_storage.exists(name):
+        try:
+            default_storage.save(name, ContentFile(_render(field_file, size)))
+        except (OSError, ValueError) as exc:
+            logger.warning("Miniatura non generata per %s: %s", field_file.name, exc)
+            return field_file.url
+    return default_storage.url(name)
@@ -0,0 +1,90 @@
+"""
+Aggiornamento dell'indice della ricerca globale (SearchDocument) al salvataggio
+e alla cancellazione di artisti, album e brani, e invalidazione dei conteggi
+dei filtri della lista album (music.services.facets) e della griglia artisti
+della homepage.
+
+I salvataggi con update_fields che non toccano campi indicizzati (es. le
+statistiche dell'album o il link di ascolto del brano) non aggiornano l'indice.
+Gli update() in blocco non emettono segnali: dopo di essi eseguire
+``manage.py rebuild_search_index``.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from music.models import Album, Artista, Brano, SearchDocument, Stile
+from music.services import search_index
+from music.services.cache_generation import bump_generation
+from music.services.facets import invalidate_facet_counts
+
+ARTISTA_FIELDS = {"nome_artista", "profilo", "componenti"}
+ALBUM_FIELDS = {
+    "titolo_album",
+    "artista_appartenenza",
+    "editore",
+    "genere",
+    "note",
+    "data_rilascio",
+    "copertina",
+}
+BRANO_FIELDS = {"titolo_brano", "album_appartenenza", "crediti", "durata"}
+# Campi mostrati nella griglia della homepage
+HOMEPAGE_FIELDS = {"nome_artista", "profilo", "foto_artista"}
+FACET_FIELDS = {"genere", "supporto", "editore", "closed", "data_rilascio"}
+
+
+def _touches(update_fields, fields) -> bool:
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=Artista, dispatch_uid="search_index_artista")
+def index_artista(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _touches(update_fields, ARTISTA_FIELDS):
+        search_index.index_artista(instance)
+
+
+@receiver(post_save, sender=Album, dispatch_uid="search_index_album")
+def index_album(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _touches(update_fields, ALBUM_FIELDS):
+        search_index.index_album(instance)
+
+
+@receiver(post_save, sender=Brano, dispatch_uid="search_index_brano")
+def index_brano(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _touches(update_fields, BRANO_FIELDS):
+        search_index.index_brano(instance)
+
+
+@receiver(post_delete, sender=Brano, dispatch_uid="search_unindex_brano")
+def unindex_brano(sender, instance, **kwargs):
+    search_index.unindex(SearchDocument.TIPO_BRANO, instance.pk)
+
+
+@receiver(post_save, sender=Album, dispatch_uid="facets_album_saved")
+def album_facets_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if _touches(update_fields, FACET_FIELDS):
+        invalidate_facet_counts()
+
+
+@receiver(post_delete, sender=Album, dispatch_uid="facets_album_deleted")
+@receiver(post_save, sender=Stile, dispatch_uid="facets_stile_saved")
+@receiver(post_delete, sender=Stile, dispatch_uid="facets_stile_deleted")
+def facets_changed(sender, **kwargs):
+    invalidate_facet_counts()
+
+
+@receiver(m2m_changed, sender=Album.stili.through, dispatch_uid="facets_album_stili")
+def album_stili_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_facet_counts()
+
+
+@receiver(post_save, sender=Artista, dispatch_uid="homepage_artista_saved")
+def homepage_artista_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if _touches(update_fields, HOMEPAGE_FIELDS):
+        bump_generation("artisti")
+
+
+@receiver(post_delete, sender=Artista, dispatch_uid="homepage_artista_deleted")
+def homepage_artista_deleted(sender, **kwargs):
+    bump_generation("artisti")
@@ -0,0 +1,132 @@
+"""
+Task eseguiti in background da ``manage.py run_worker`` (vedi music/services/jobs.py).
+
+Ogni task riceve il Job e i parametri salvati in Job.parametri; il valore
+restituito finisce in Job.risultato.
+"""
+import io
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command, load_command_class
+
+from music.models import Album, Artista, Brano, Job
+from music.services.brani_import import import_tracks_for_album, remember_release
+from music.services.cache_generation import bump_generation
+from music.services.jobs import JobError, report_progress, task
+from music.services.listening import resolve_listen_url
+from music.services.musicbrainz import get_release
+from music.services.report_pdf import PdfError, build_artisti_pdf
+from music.services.thumbnails import rebuild_thumbnail
+
+REPORT_ARTISTI_PDF = "report_artisti_pdf"
+IMPORTA_BRANI_ALBUM = "importa_brani_album"
+LOAD_ALBUM_COVERS = "load_album_covers"
+LOAD_ARTISTI_FOTO = "load_artisti_foto"
+RICALCOLA_ASCOLTO = "ricalcola_ascolto"
+RIGENERA_MINIATURE = "rigenera_miniature"
+
+# Immagini con miniatura: modello e campo per ciascun valore di "modello"
+IMMAGINI = {"artista": (Artista, "foto_artista"), "album": (Album, "copertina")}
+
+
+@task(REPORT_ARTISTI_PDF)
+def report_artisti_pdf(job):
+    report_progress(job, 10, "Generazione del PDF")
+    buffer = io.BytesIO()
+    try:
+        # Segnali di vita durante la generazione, che può durare minuti (requeue_stale)
+        build_artisti_pdf(buffer, progress=partial(report_progress, job))
+    except PdfError as exc:
+        raise JobError(str(exc))
+    job.file.save(f"artisti_albums_{job.pk}.pdf", ContentFile(buffer.getvalue()), save=False)
+    # Resta su disco solo l'ultimo report
+    precedenti = Job.objects.filter(nome=REPORT_ARTISTI_PDF).exclude(pk=job.pk).exclude(file="")
+    for vecchio in precedenti:
+        vecchio.file.delete(save=False)
+    precedenti.update(file="")
+    job.messaggio = "PDF pronto"
+    return {"byte": buffer.tell()}
+
+
+@task(IMPORTA_BRANI_ALBUM)
+def importa_brani_album(job, album_id, release_mbid, skip_existing=False, update_existing=False):
+    album = Album.objects.select_related("artista_appartenenza").filter(pk=album_id).first()
+    if album is None:
+        raise JobError(f"Album {album_id} non trovato.")
+    report_progress(job, 10, f"Lettura della release {release_mbid} da MusicBrainz")
+    # MusicBrainzError (rete, rate limit) non è definitivo: il job viene ritentato
+    detail = get_release(release_mbid)
+    if not detail.tracks:
+        raise JobError("Nessun brano trovato per la release selezionata.")
+
+    report_progress(job, 50, f"Import di {len(detail.tracks)} brani in '{album.titolo_album}'")
+    result = import_tracks_for_album(
+        album,
+        detail.tracks,
+        skip_existing=skip_existing,
+        update_existing=update_existing,
+    )
+    remember_release(album, detail)
+    job.messaggio = (
+        f"Import completato: {result.created} creati, "
+        f"{result.updated} aggiornati, {result.skipped} saltati."
+    )
+    return {"album": album.pk, "creati": result.created, "aggiornati": result.updated, "saltati": result.skipped}
+
+
+@task(RICALCOLA_ASCOLTO)
+def ricalcola_ascolto(job, brani):
+    """Risolve di nuovo i link di ascolto dei brani indicati (azione admin), nell'ordine dato."""
+    per_pk = Brano.objects.select_related("album_appartenenza__artista_appartenenza").in_bulk(brani)
+    selezionati = [per_pk[pk] for pk in brani if pk in per_pk]
+    for numero, brano in enumerate(selezionati, 1):
+        resolve_listen_url(brano, refresh=True)
+        report_progress(job, 100 * numero // len(selezionati), f"{numero}/{len(selezionati)}")
+    job.messaggio = f"Link di ascolto risolti: {len(selezionati)}"
+    return {"risolti": len(selezionati)}
+
+
+@task(RIGENERA_MINIATURE)
+def rigenera_miniature(job, modello, pks):
+    """Rigenera le miniature delle foto o delle copertine selezionate nell'admin."""
+    if modello not in IMMAGINI:
+        raise JobError(f"Modello senza miniature: {modello}")
+    model, campo = IMMAGINI[modello]
+    oggetti = list(model.objects.filter(pk__in=pks).only("pk", campo).order_by("pk"))
+    rigenerate = 0
+    for numero, oggetto in enumerate(oggetti, 1):
+        rigenerate += rebuild_thumbnail(getattr(oggetto, campo))
+        if numero % 20 == 0 or numero == len(oggetti):
+            report_progress(job, 100 * numero // len(oggetti), f"{numero}/{len(oggetti)}")
+    if modello == "artista":
+        # Stessi URL ma contenuto nuovo: la griglia della homepage va rigenerata
+        bump_generation("artisti")
+    job.messaggio = f"Miniature rigenerate: {rigenerate}"
+    return {"rigenerate": rigenerate}
+
+
+def import_accodato_message(job) -> str:
+    if job.stato == Job.STATO_IN_ESECUZIONE:
+        return f"Import già in corso (job #{job.pk}): i brani compariranno al termine."
+    return f"Import accodato (job #{job.pk}): i brani compariranno al termine, vedi la pagina dei job."
+
+
+def _run_loader(job, command_name, options):
+    command = load_command_class("music", command_name)
+    command.progress = lambda done, total: report_progress(job, 100 * done // total, f"{done}/{total}")
+    out = io.StringIO()
+    call_command(command, stdout=out, **options)
+    righe = [riga for riga in out.getvalue().splitlines() if riga.strip() and not riga.startswith("=")]
+    job.messaggio = "; ".join(righe[-4:])[:255]
+    return {"output": out.getvalue()}
+
+
+@task(LOAD_ALBUM_COVERS)
+def load_album_covers(job, **options):
+    return _run_loader(job, LOAD_ALBUM_COVERS, options)
+
+
+@task(LOAD_ARTISTI_FOTO)
+def load_artisti_foto(job, **options):
+    return _run_loader(job, LOAD_ARTISTI_FOTO, options)
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from music.models import Album, Artista, Brano, Job
+from music.services.jobs import run_pending
+from music.services.thumbnails import thumbnail_name
+
+
+class AdminChangelistTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.admin)
+        artisti = Artista.objects.bulk_create(Artista(nome_artista=f"Artista {n:02d}") for n in range(10))
+        albums = Album.objects.bulk_create(
+            Album(titolo_album=f"Album {n:02d}", artista_appartenenza=artisti[n % 10]) for n in range(30)
+        )
+        self.brani = Brano.objects.bulk_create(
+            Brano(titolo_brano=f"Brano {n:02d}", album_appartenenza=albums[n % 30], ascolto_url="https://youtu.be/x",
+                  ascolto_fonte="youtube")
+            for n in range(60)
+        )
+        self.album = albums[0]
+
+    def _queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        album_url = reverse("admin:music_album_changelist")
+        brano_url = reverse("admin:music_brano_changelist")
+        # Stesso numero di query qualunque sia il numero di righe mostrate
+        self.assertEqual(self._queries(album_url), self._queries(album_url, {"q": "Album 01"}))
+        self.assertEqual(self._queries(brano_url), self._queries(brano_url, {"q": "Brano 01"}))
+
+    def test_search_on_related_names(self):
+        response = self.client.get(reverse("admin:music_album_changelist"), {"q": "Artista 03"})
+        self.assertEqual(
+            sorted(album.titolo_album for album in response.context["cl"].result_list),
+            ["Album 03", "Album 13", "Album 23"],
+        )
+        response = self.client.get(reverse("admin:music_brano_changelist"), {"q": "Album 00"})
+        self.assertEqual(len(response.context["cl"].result_list), 2)
+
+    @patch("music.tasks.resolve_listen_url", return_value=("https://band.bandcamp.com/track/x", "bandcamp", False))
+    def test_recompute_listen_links_action(self, mock_resolve):
+        response = self.client.post(
+            reverse("admin:music_album_changelist"),
+            {"action": "ricalcola_ascolto_album", "_selected_action": [self.album.pk]},
+            follow=True,
+        )
+        self.assertContains(response, "Link azzerati: 2, ricerca accodata per 2 brani")
+        # Nessuna chiamata esterna durante la richiesta: le fa il worker
+        mock_resolve.assert_not_called()
+        self.assertFalse(Brano.objects.filter(album_appartenenza=self.album).exclude(ascolto_url="").exists())
+        self.assertEqual(Brano.objects.exclude(ascolto_url="").count(), 58)
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(mock_resolve.call_count, 2)
+        self.assertEqual(Job.objects.get().messaggio, "Link di ascolto risolti: 2")
+
+    def test_rebuild_thumbnails_action_runs_in_background(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        buffer = BytesIO()
+        Image.new("RGB", (400, 400), (0, 0, 255)).save(buffer, format="JPEG")
+        self.album.copertina = SimpleUploadedFile("copertina.jpg", buffer.getvalue())
+        self.album.save()
+        miniatura = f"{media}/{thumbnail_name(self.album.copertina.name)}"
+
+        with patch("music.tasks.rebuild_thumbnail") as mock_rebuild:
+            response = self.client.post(
+                reverse("admin:music_album_changelist"),
+                {"action": "rigenera_miniature_album", "_selected_action": [self.album.pk]},
+                follow=True,
+            )
+        self.assertContains(response, "Rigenerazione delle miniature accodata per 1 elementi")
+        mock_rebuild.assert_not_called()
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(Job.objects.get().messaggio, "Miniature rigenerate: 1")
+        with Image.open(miniatura) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 160))
@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from music.models import Album, Artista, Brano
+from music.services.album_stats import compute_album_stats, refresh_album_stats
+from music.services.brani_import import import_tracks_for_album
+from music.services.durations import parse_duration
+from music.services.musicbrainz import TrackCandidate
+
+
+class AlbumStatsServiceTestCase(TestCase):
+    def setUp(self):
+        self.artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.album = Album.objects.create(
+            titolo_album="The Wall",
+            artista_appartenenza=self.artista,
+        )
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("3:19"), 199)
+        self.assertEqual(parse_duration("1:02:03"), 3723)
+        self.assertIsNone(parse_duration("abc"))
+        self.assertIsNone(parse_duration(None))
+
+    def _brano(self, titolo, durata, sezione):
+        return Brano.objects.create(
+            titolo_brano=titolo,
+            durata=durata,
+            sezione=sezione,
+            album_appartenenza=self.album,
+        )
+
+    def test_compute_stats(self):
+        self._brano("One", "3:19", "a")
+        self._brano("Two", "2:27", "a")
+        self._brano("Three", None, "B")
+        self._brano("Four", "x", "b")
+
+        stats = compute_album_stats(self.album)
+
+        self.assertEqual(stats.numero_brani, 4)
+        self.assertEqual(stats.durata_totale_secondi, 199 + 147)
+        self.assertEqual(stats.numero_dischi, 2)
+
+    def test_tracks_without_section_count_as_one_disc(self):
+        self.assertEqual(compute_album_stats(self.album).numero_dischi, 0)
+        self._brano("One", "1:00", None)
+        self.assertEqual(compute_album_stats(self.album).numero_dischi, 1)
+
+    def test_import_refreshes_stats(self):
+        import_tracks_for_album(
+            self.album,
+            [
+                TrackCandidate("In the Flesh?", "a", "1", "3:19", None),
+                TrackCandidate("Hey You", "c", "1", "4:40", None),
+            ],
+        )
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.numero_brani, 2)
+        self.assertEqual(self.album.durata_totale_secondi, 199 + 280)
+        self.assertEqual(self.album.numero_dischi, 2)
+        self.assertEqual(self.album.durata_totale, "7:59")
+
+    def test_refresh_reports_no_change(self):
+        self.assertFalse(refresh_album_stats(self.album))
+
+    def test_recompute_command_repairs_drift(self):
+        Brano.objects.create(titolo_brano="Mother", durata="5:32", album_appartenenza=self.album)
+        Album.objects.filter(pk=self.album.pk).update(numero_brani=42)
+
+        out = StringIO()
+        call_command("recompute_album_stats", stdout=out)
+
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.numero_brani, 1)
+        self.assertEqual(self.album.durata_totale_secondi, 332)
+        self.assertIn("Album disallineati: 1", out.getvalue())
+
+
+class AlbumStatsViewsTestCase(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="staff", password="testpass123", is_staff=True)
+        self.artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.album = Album.objects.create(
+            titolo_album="Animals",
+            artista_appartenenza=self.artista,
+        )
+        self.client = Client()
+        self.client.login(username="staff", password="testpass123")
+
+    def test_crea_brano_updates_stats(self):
+        self.client.post(
+            reverse("crea_brano", kwargs={"pk": self.album.pk}),
+            {"titolo_brano": "Dogs", "durata": "17:04", "album_appartenenza": self.album.pk},
+        )
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.numero_brani, 1)
+        self.assertEqual(self.album.durata_totale_secondi, 1024)
+
+    def test_elimina_brano_updates_stats(self):
+        brano = Brano.objects.create(titolo_brano="Sheep", durata="10:25", album_appartenenza=self.album)
+        refresh_album_stats(self.album)
+
+        self.client.post(reverse("elimina_brano", kwargs={"pk": brano.pk}))
+
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.numero_brani, 0)
+        self.assertEqual(self.album.durata_totale_secondi, 0)
@@ -0,0 +1,114 @@
+from datetime import date
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from music.models import Album, AlbumDesiderato, Artista, Brano, Stile
+
+
+class CatalogoApiTestCase(TestCase):
+    def setUp(self):
+        self.artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.rock = Stile.objects.create(stile="Rock")
+        self.prog = Stile.objects.create(stile="Prog")
+        self.albums = []
+        for idx in range(3):
+            album = Album.objects.create(
+                titolo_album=f"Album {idx}",
+                artista_appartenenza=self.artista,
+                data_rilascio=date(1970 + idx, 1, 1),
+            )
+            album.stili.set([self.rock, self.prog])
+            self.albums.append(album)
+        self.brano = Brano.objects.create(
+            titolo_brano="Money",
+            sezione="b",
+            progressivo="1",
+            durata="6:23",
+            album_appartenenza=self.albums[0],
+        )
+        AlbumDesiderato.objects.create(artista=self.artista, titolo_album="Animals")
+        self.client = Client()
+
+    def test_album_list_includes_artist_and_styles(self):
+        response = self.client.get(reverse("api_album_list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        payload = response.json()
+        self.assertEqual(len(payload["results"]), 3)
+        first = payload["results"][0]
+        self.assertEqual(first["artista"]["nome_artista"], "Pink Floyd")
+        self.assertEqual(sorted(first["stili"]), ["Prog", "Rock"])
+        self.assertEqual(first["data_rilascio"], "1970-01-01")
+        self.assertIsNone(payload["next"])
+
+    def test_album_list_query_count_is_bounded(self):
+        for idx in range(10):
+            album = Album.objects.create(
+                titolo_album=f"Extra {idx}",
+                artista_appartenenza=self.artista,
+            )
+            album.stili.add(self.rock)
+
+        # album + artista (join) e stili (prefetch)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("api_album_list"))
+        self.assertEqual(len(response.json()["results"]), 13)
+
+    def test_cursor_pagination(self):
+        url = reverse("api_album_list")
+        response = self.client.get(url, {"limit": 2})
+        payload = response.json()
+        self.assertEqual([a["id"] for a in payload["results"]], [a.pk for a in self.albums[:2]])
+        self.assertIsNotNone(payload["next"])
+
+        payload = self.client.get(payload["next"]).json()
+        self.assertEqual([a["id"] for a in payload["results"]], [self.albums[2].pk])
+        self.assertIsNone(payload["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("api_album_list"), {"cursor": "!!"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_field_selection(self):
+        response = self.client.get(reverse("api_brani"), {"fields": "id,titolo_brano"})
+        self.assertEqual(response.json()["results"], [{"id": self.brano.pk, "titolo_brano": "Money"}])
+
+    def test_unknown_field_rejected(self):
+        response = self.client.get(reverse("api_artisti"), {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["error"])
+
+    def test_filter_tracks_by_album(self):
+        response = self.client.get(reverse("api_brani"), {"album": self.albums[1].pk})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_detail_not_found(self):
+        response = self.client.get(reverse("api_album", kwargs={"pk": 999999}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_etag_not_modified(self):
+        url = reverse("api_artista", kwargs={"pk": self.artista.pk})
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.artista.nome_artista = "Pink Floyd (UK)"
+        self.artista.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_wishlist(self):
+        response = self.client.get(reverse("api_album_desiderati"))
+        results = response.json()["results"]
+        self.assertEqual(results[0]["titolo_album"], "Animals")
+        self.assertEqual(results[0]["artista"]["id"], self.artista.pk)
+
+    def test_read_only(self):
+        response = self.client.post(reverse("api_artisti"))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,60 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from music.models import Album, Artista, StatisticaCollezione
+
+
+class CollectionStatsTestCase(TestCase):
+    def setUp(self):
+        artista = Artista.objects.create(nome_artista="Genesis")
+        Album.objects.create(
+            titolo_album="Foxtrot", artista_appartenenza=artista, editore="Charisma",
+            supporto="Vinile", deposito="A1", data_rilascio=date(1972, 10, 6), costo=30, closed=True,
+        )
+        Album.objects.create(
+            titolo_album="Selling England", artista_appartenenza=artista, editore="Charisma",
+            supporto="CD", deposito="A1", data_rilascio=date(1973, 10, 12), costo=12.5,
+        )
+        Album.objects.create(titolo_album="Demo", artista_appartenenza=artista, costo=5)
+
+    def _stat(self, dimensione, valore):
+        return StatisticaCollezione.objects.get(dimensione=dimensione, valore=valore)
+
+    def test_refresh_command_materialises_summary(self):
+        out = StringIO()
+        call_command("refresh_collection_stats", stdout=out)
+        self.assertIn("Statistiche aggiornate", out.getvalue())
+
+        totale = self._stat("totale", "")
+        self.assertEqual((totale.numero_album, totale.album_completati, totale.spesa_totale), (3, 1, 47.5))
+        self.assertEqual(totale.percentuale_completati, 33)
+        self.assertEqual(self._stat("editore", "Charisma").spesa_totale, 42.5)
+        self.assertEqual(self._stat("editore", "").numero_album, 1)
+        self.assertEqual(self._stat("anno", "1972").album_completati, 1)
+        self.assertEqual(self._stat("deposito", "A1").numero_album, 2)
+
+        # Un secondo refresh sostituisce il riepilogo invece di sommarlo
+        call_command("refresh_collection_stats", stdout=StringIO())
+        self.assertEqual(self._stat("totale", "").numero_album, 3)
+
+    def test_page_reads_only_the_summary_table(self):
+        call_command("refresh_collection_stats", stdout=StringIO())
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("statistiche_collezione"))
+        self.assertContains(response, "47,50 €")
+        self.assertContains(response, "Charisma")
+        self.assertFalse(any("music_album" in query["sql"] for query in ctx.captured_queries))
+
+    def test_page_is_staff_only(self):
+        User.objects.create_user("utente", password="pw")
+        self.client.login(username="utente", password="pw")
+        self.assertEqual(self.client.get(reverse("statistiche_collezione")).status_code, 403)
@@ -0,0 +1,75 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from music.models import Album, Artista, Stile
+
+
+def _counts(response, name):
+    facet = next(facet for facet in response.context["facets"] if facet["name"] == name)
+    return {item["label"]: item["count"] for item in facet["values"]}
+
+
+class AlbumFacetsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        artista = Artista.objects.create(nome_artista="Miles Davis")
+        self.fusion = Stile.objects.create(stile="Fusion")
+        self.cool = Stile.objects.create(stile="Cool")
+        self.kind_of_blue = Album.objects.create(
+            titolo_album="Kind of Blue", artista_appartenenza=artista, genere="Jazz",
+            supporto="Vinile", editore="Columbia", data_rilascio=date(1959, 8, 17), closed=True,
+        )
+        self.bitches_brew = Album.objects.create(
+            titolo_album="Bitches Brew", artista_appartenenza=artista, genere="Jazz",
+            supporto="CD", editore="Columbia", data_rilascio=date(1970, 3, 30),
+        )
+        self.tutu = Album.objects.create(
+            titolo_album="Tutu", artista_appartenenza=artista, genere="Fusion",
+            supporto="CD", editore="Warner", data_rilascio=date(1986, 9, 1),
+        )
+        self.kind_of_blue.stili.add(self.cool)
+        self.bitches_brew.stili.add(self.fusion, self.cool)
+        self.tutu.stili.add(self.fusion)
+
+    def test_counts_ignore_own_filter_and_apply_the_others(self):
+        response = self.client.get(reverse("album_list"), {"supporto": "CD"})
+        titoli = [album.titolo_album for album in response.context["lista_album"]]
+        self.assertEqual(sorted(titoli), ["Bitches Brew", "Tutu"])
+        # Il filtro attivo mostra ancora tutte le alternative...
+        self.assertEqual(_counts(response, "supporto"), {"CD": 2, "Vinile": 1})
+        # ...gli altri contano solo gli album su CD
+        self.assertEqual(_counts(response, "genere"), {"Fusion": 1, "Jazz": 1})
+        self.assertEqual(_counts(response, "stile"), {"Fusion": 2, "Cool": 1})
+        self.assertEqual(_counts(response, "decennio"), {"Anni 1980": 1, "Anni 1970": 1})
+        self.assertEqual(_counts(response, "stato"), {"In corso": 2})
+
+    def test_combined_filters(self):
+        params = {"stile": [self.cool.pk, self.fusion.pk], "decennio": ["1950", "1980"], "stato": "in_corso"}
+        response = self.client.get(reverse("album_list"), params)
+        self.assertEqual([album.titolo_album for album in response.context["lista_album"]], ["Tutu"])
+        self.assertTrue(response.context["filtri_attivi"])
+        # Valori malformati ignorati
+        response = self.client.get(reverse("album_list"), {"decennio": "1975", "stile": "x"})
+        self.assertEqual(len(response.context["lista_album"]), 3)
+        self.assertFalse(response.context["filtri_attivi"])
+
+    def test_counts_are_cached_and_invalidated_on_write(self):
+        url = reverse("album_list")
+        self.client.get(url)
+        # In cache: solo conteggio totale e pagina degli album
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        self.tutu.supporto = "Vinile"
+        self.tutu.save()
+        self.assertEqual(_counts(self.client.get(url), "supporto"), {"Vinile": 2, "CD": 1})
+
+        self.kind_of_blue.stili.remove(self.cool)
+        self.assertEqual(_counts(self.client.get(url), "stile"), {"Fusion": 2, "Cool": 1})
+
+        self.bitches_brew.delete()
+        self.assertEqual(_counts(self.client.get(url), "editore"), {"Columbia": 1, "Warner": 1})
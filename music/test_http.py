@@ -0,0 +1,155 @@
+import threading
+import time
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from music.services import circuit, http, musicbrainz
+from music.services.circuit import host_breaker
+from music.services.http import CircuitOpenError, DeadlineExceeded, fake_http
+
+URL = "https://api.example.org/search"
+
+
+class OutboundHttpTestCase(SimpleTestCase):
+    def test_retries_upstream_errors_with_backoff(self):
+        with fake_http() as fake:
+            fake.add(URL, status=503).add(URL, status=502).add(URL, json_data={"ok": True})
+            response = http.get(URL, params={"q": "dogs"})
+
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual(len(fake.sleeps), 2)
+        self.assertEqual(fake.requests[0]["params"], {"q": "dogs"})
+
+    @override_settings(HTTP_MAX_RETRY_AFTER=10)
+    def test_honours_retry_after(self):
+        with fake_http() as fake:
+            fake.add(URL, status=429, headers={"Retry-After": "3"}).add(URL, json_data={})
+            http.get(URL)
+        self.assertEqual(fake.sleeps, [3.0])
+
+    @override_settings(HTTP_MAX_RETRY_AFTER=10)
+    def test_retry_after_too_long_gives_up(self):
+        with fake_http() as fake:
+            fake.add(URL, status=503, headers={"Retry-After": "120"})
+            with self.assertRaises(requests.HTTPError):
+                http.get(URL)
+        self.assertEqual(len(fake.requests), 1)
+        self.assertEqual(fake.sleeps, [])
+
+    def test_client_errors_are_not_retried(self):
+        with fake_http() as fake:
+            fake.add(URL, status=404)
+            with self.assertRaises(requests.HTTPError):
+                http.get(URL)
+            self.assertFalse(host_breaker("api.example.org").is_open)
+        self.assertEqual(len(fake.requests), 1)
+
+    @override_settings(HTTP_MAX_RETRY_AFTER=10)
+    def test_deadline_caps_timeout_and_retries(self):
+        with fake_http() as fake:
+            fake.add(URL, status=503, headers={"Retry-After": "3"})
+            with self.assertRaises(requests.HTTPError):
+                http.get(URL, timeout=15, deadline=time.monotonic() + 1)
+            # Il Retry-After andrebbe oltre la scadenza: nessun secondo tentativo
+            self.assertEqual(len(fake.requests), 1)
+            self.assertEqual(fake.sleeps, [])
+            self.assertLessEqual(fake.requests[0]["timeout"], 1)
+
+            with self.assertRaises(DeadlineExceeded):
+                http.get(URL, deadline=time.monotonic())
+            self.assertEqual(len(fake.requests), 1)
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=2, HTTP_RETRIES=1)
+    def test_circuit_opens_after_repeated_failures(self):
+        with fake_http() as fake:
+            fake.add(URL, exc=requests.ConnectionError("down"))
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    http.get(URL)
+            self.assertEqual(len(fake.requests), 4)
+
+            with self.assertRaises(CircuitOpenError):
+                http.get(URL)
+            # Con il circuito aperto la richiesta non parte nemmeno
+            self.assertEqual(len(fake.requests), 4)
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=1)
+    def test_rate_limits_do_not_open_the_circuit(self):
+        breaker = host_breaker("api.example.org")
+        with fake_http() as fake:
+            fake.add(URL, status=503, headers={"Retry-After": "1"}).add(URL, status=429).add(URL, status=503)
+            for _ in range(2):
+                with self.assertRaises(requests.HTTPError):
+                    http.get(URL, retries=0)
+                self.assertFalse(breaker.is_open)
+
+            # 503 senza Retry-After: l'host è in errore
+            with self.assertRaises(requests.HTTPError):
+                http.get(URL, retries=0)
+            self.assertTrue(breaker.is_open)
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=1, HTTP_MAX_RETRY_AFTER=10)
+    def test_musicbrainz_rate_limits_keep_the_circuit_closed(self):
+        url = f"{musicbrainz.MUSICBRAINZ_API_URL}/release/mbid-1"
+        with fake_http() as fake, patch.object(musicbrainz, "_throttle"):
+            fake.add(url, status=503, headers={"Retry-After": "1"})
+            for _ in range(3):
+                with self.assertRaises(musicbrainz.MusicBrainzError):
+                    musicbrainz._get("release/mbid-1")
+            self.assertFalse(host_breaker(urlsplit(url).hostname).is_open)
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=1, CIRCUIT_RESET_TIMEOUT=0.01)
+    def test_half_open_trial_closes_circuit(self):
+        with fake_http() as fake:
+            fake.add(URL, exc=requests.ConnectionError("down")).add(URL, json_data={})
+            with self.assertRaises(requests.ConnectionError):
+                http.get(URL, retries=0)
+            breaker = host_breaker("api.example.org")
+            self.assertTrue(breaker.is_open)
+
+            time.sleep(0.02)
+            http.get(URL, retries=0)
+            self.assertFalse(breaker.is_open)
+
+    def test_closed_circuit_is_read_without_write_lock(self):
+        with fake_http() as fake, patch.object(circuit, "_transaction", side_effect=AssertionError("scrittura")):
+            fake.add(URL, json_data={})
+            http.get(URL)
+            self.assertFalse(host_breaker("api.example.org").is_open)
+
+    async def test_async_breaker_io_runs_off_the_event_loop(self):
+        loop_thread = threading.current_thread()
+        breaker_threads = []
+        breaker = host_breaker("api.example.org")
+
+        def tracked(method):
+            def inner():
+                breaker_threads.append(threading.current_thread())
+                return method()
+            return inner
+
+        breaker.allow = tracked(breaker.allow)
+        breaker.record_success = tracked(breaker.record_success)
+        with fake_http() as fake, patch.object(http, "host_breaker", return_value=breaker):
+            fake.add(URL, json_data={})
+            await http.aget(URL)
+        self.assertEqual(len(breaker_threads), 2)
+        self.assertNotIn(loop_thread, breaker_threads)
+
+    @override_settings(HTTP_MAX_RETRY_AFTER=10)
+    def test_musicbrainz_retries_go_through_the_throttle(self):
+        url = f"{musicbrainz.MUSICBRAINZ_API_URL}/release/mbid-1"
+        with fake_http() as fake, patch.object(musicbrainz, "_throttle") as throttle:
+            fake.add(url, status=503, headers={"Retry-After": "2"}).add(url, json_data={"id": "mbid-1"})
+            self.assertEqual(musicbrainz._get("release/mbid-1"), {"id": "mbid-1"})
+            self.assertEqual((throttle.call_count, len(fake.requests)), (2, 2))
+            self.assertEqual(fake.sleeps, [2.0])
+
+            fake.add(f"{musicbrainz.MUSICBRAINZ_API_URL}/release/missing", status=404)
+            with self.assertRaises(musicbrainz.MusicBrainzError):
+                musicbrainz._get("release/missing")
+        self.assertEqual(len(fake.requests), 3)
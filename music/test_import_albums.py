@@ -0,0 +1,89 @@
+import json
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+import openpyxl
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from music.models import Album, Artista
+
+HEADERS = ["titolo_album", "artista_appartenenza", "editore", "supporto", "costo", "closed", "data_rilascio", "stili"]
+
+
+class ImportAlbumsFingerprintTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = Path(directory) / "DatiMusica.xlsx"
+        self.rows = [
+            ["Foxtrot", "Genesis", "Charisma", "Vinile", 30, 1, 1972, "Prog/Rock"],
+            ["Nursery Cryme", "Genesis", "Charisma", "CD", 12.5, 0, "1971-11-12", "Prog"],
+        ]
+
+    def _import(self, *args):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(HEADERS)
+        for row in self.rows:
+            workbook.active.append(row)
+        workbook.save(self.path)
+        out = StringIO()
+        call_command("import_albums", "--file", str(self.path), *args, stdout=out)
+        return out.getvalue()
+
+    def test_reimport_of_unchanged_rows_writes_nothing(self):
+        self._import()
+        foxtrot = Album.objects.get(titolo_album="Foxtrot")
+        self.assertEqual(len(foxtrot.import_hash), 40)
+        self.assertEqual(sorted(foxtrot.stili.values_list("stile", flat=True)), ["Prog", "Rock"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            output = self._import("--update-existing")
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].split()[0] in ("INSERT", "UPDATE", "DELETE")]
+        self.assertEqual(writes, [])
+        self.assertIn("Differenze: 0 nuovi, 0 modificati, 2 invariati, 0 mancanti nel file", output)
+
+    def test_diff_reports_added_changed_and_missing(self):
+        self._import()
+        Album.objects.create(titolo_album="Demo", artista_appartenenza=Artista.objects.get())
+        self.rows[0][4] = 35
+        self.rows[0][7] = "Prog"
+        self.rows.append(["Trespass", "Genesis", "Charisma", "CD", 10, 0, 1970, "Prog"])
+        report = self.path.with_name("diff.json")
+
+        output = self._import("--update-existing", "--report", str(report))
+
+        self.assertIn("Differenze: 1 nuovi, 1 modificati, 1 invariati, 1 mancanti nel file", output)
+        self.assertIn("Foxtrot - Genesis (costo, stili)", output)
+        foxtrot = Album.objects.get(titolo_album="Foxtrot")
+        self.assertEqual((foxtrot.costo, list(foxtrot.stili.values_list("stile", flat=True))), (35, ["Prog"]))
+        self.assertTrue(Album.objects.filter(titolo_album="Trespass").exists())
+        diff = json.loads(report.read_text())
+        self.assertEqual(diff["nuovi"], ["Trespass - Genesis"])
+        self.assertEqual(diff["mancanti"], ["Demo - Genesis"])
+
+        # Senza --update-existing le modifiche sono solo segnalate
+        self.rows[1][4] = 99
+        output = self._import()
+        self.assertIn("Nursery Cryme - Genesis (costo)", output)
+        self.assertEqual(Album.objects.get(titolo_album="Nursery Cryme").costo, 12.5)
+
+    def test_albums_imported_before_fingerprints_only_get_the_hash(self):
+        genesis = Artista.objects.create(nome_artista="Genesis")
+        Album.objects.create(
+            titolo_album="Foxtrot", artista_appartenenza=genesis, editore="Charisma", supporto="Vinile",
+            costo=30, closed=True, data_rilascio=date(1972, 1, 1), genere="Prog",
+        ).stili.create(stile="Prog")
+        Album.objects.get().stili.create(stile="Rock")
+        self.rows = self.rows[:1]
+
+        output = self._import("--update-existing")
+
+        self.assertIn("0 modificati, 1 invariati", output)
+        self.assertIn("Album aggiornati: 0", output)
+        self.assertEqual(len(Album.objects.get().import_hash), 40)
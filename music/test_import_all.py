@@ -0,0 +1,148 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+import openpyxl
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from music.models import Album, Artista, Brano
+from music.services.import_pipeline import CatalogueIndex, Step, run_pipeline, split_balanced
+
+
+def _write_sheet(path, headers, rows):
+    workbook = openpyxl.Workbook()
+    workbook.active.append(headers)
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+class ImportAllTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.dir = Path(directory)
+        self.artisti = _write_sheet(self.dir / "artisti.xlsx", ["Artista"], [["Genesis"], ["Yes"]])
+        self.albums = _write_sheet(
+            self.dir / "album.xlsx",
+            ["titolo_album", "artista_appartenenza", "editore", "supporto"],
+            [["Foxtrot", "Genesis", "Charisma", "Vinile"], ["Fragile", "Yes", "Atlantic", "CD"]],
+        )
+        self.brani = _write_sheet(
+            self.dir / "brani.xlsx",
+            ["Tracce", "TitoloAlbum", "Artista", "ArtistaCompilation"],
+            [
+                ["Watcher of the Skies", "Foxtrot", "Genesis", None],
+                ["Roundabout", "Fragile", "Yes", None],
+                ["Supper's Ready", "Foxtrot", "Genesis", None],
+                ["Sconosciuto", "Inesistente", "Nessuno", None],
+            ],
+        )
+
+    def _import_all(self, *args):
+        out = StringIO()
+        call_command(
+            "import_all",
+            "--artisti-file", self.artisti,
+            "--albums-file", self.albums,
+            "--brani-file", self.brani,
+            "--covers-dir", str(self.dir / "copertine"),
+            "--foto-dir", str(self.dir / "foto"),
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_imports_catalogue_in_dependency_order_and_reports_timings(self):
+        output = self._import_all("--skip-images")
+
+        self.assertEqual(sorted(Artista.objects.values_list("nome_artista", flat=True)), ["Genesis", "Yes"])
+        self.assertEqual(Album.objects.get(titolo_album="Foxtrot").artista_appartenenza.nome_artista, "Genesis")
+        foxtrot = list(
+            Brano.objects.filter(album_appartenenza__titolo_album="Foxtrot")
+            .order_by("posizione")
+            .values_list("titolo_brano", "progressivo")
+        )
+        self.assertEqual(foxtrot, [("Watcher of the Skies", "001"), ("Supper's Ready", "002")])
+        self.assertIn("Brani senza album associato: 1", output)
+        for name in ("artisti", "album", "brani", "totale"):
+            self.assertRegex(output, rf"\n{name} +")
+        self.assertIn("passi eseguiti in sequenza", output)
+
+        # Reimport: nulla di nuovo, i brani esistenti vengono saltati
+        output = self._import_all("--skip-images")
+        self.assertEqual(Brano.objects.count(), 3)
+        self.assertIn("Brani saltati: 3", output)
+
+    def test_cover_step_does_not_overwrite_track_stats(self):
+        covers = self.dir / "copertine"
+        covers.mkdir()
+        (covers / "Foxtrot.jpg").write_bytes(b"jpeg")
+        media = override_settings(MEDIA_ROOT=str(self.dir / "media"))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._import_all()
+
+        foxtrot = Album.objects.get(titolo_album="Foxtrot")
+        self.assertTrue(foxtrot.copertina)
+        self.assertEqual(foxtrot.numero_brani, 2)
+        cover_updates = [
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith('UPDATE "music_album"') and '"copertina"' in q["sql"]
+        ]
+        self.assertEqual(len(cover_updates), 1)
+        self.assertNotIn('"numero_brani"', cover_updates[0])
+
+    def test_track_import_resolves_albums_from_the_shared_index(self):
+        self._import_all("--skip-images")
+        index = CatalogueIndex()
+        index.albums  # caricato prima, come farebbe il passo album
+
+        from music.management.commands.import_brani import Command
+
+        command = Command()
+        command.index = index
+        with CaptureQueriesContext(connection) as ctx:
+            call_command(command, "--file", self.brani, stdout=StringIO())
+        album_lookups = [
+            q["sql"] for q in ctx.captured_queries
+            if 'FROM "music_album"' in q["sql"] and "titolo_album" in q["sql"].split("WHERE")[-1]
+        ]
+        self.assertEqual(album_lookups, [])
+
+
+class PipelineTestCase(SimpleTestCase):
+    def test_dependents_of_failed_steps_are_skipped(self):
+        eseguiti = []
+
+        def run(name, fail=False):
+            def inner():
+                eseguiti.append(name)
+                if fail:
+                    raise RuntimeError(name)
+                return name
+            return inner
+
+        steps = [
+            Step("c", run("c"), ("b",)),
+            Step("a", run("a")),
+            Step("b", run("b", fail=True), ("a",)),
+            Step("d", run("d"), ("a",)),
+        ]
+        result = run_pipeline(steps)
+
+        self.assertEqual(eseguiti, ["a", "b", "d"])
+        self.assertEqual(result.failed, ["c", "b"])
+        self.assertTrue(steps[0].skipped)
+        self.assertEqual(steps[3].output, "d")
+
+    def test_split_balanced_spreads_weight(self):
+        groups = split_balanced([5, 4, 3, 2, 1], lambda n: n, 2)
+        self.assertEqual([sum(group) for group in groups], [8, 7])
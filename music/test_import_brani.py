@@ -5,12 +5,14 @@ from django.contrib.auth.models import User
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from music.models import Album, Artista, Brano
+from music.models import Album, Artista, Brano, Job
 from music.services.brani_import import import_tracks_for_album
+from music.services.durations import format_duration
+from music.services.jobs import run_pending
 from music.services.musicbrainz import (
     ReleaseCandidate,
+    ReleaseDetail,
     TrackCandidate,
-    format_duration,
     get_release_tracks,
     search_releases,
 )
@@ -66,6 +68,7 @@ class MusicBrainzServiceTestCase(TestCase):
         self.assertEqual(tracks[0].progressivo, "1")
         self.assertEqual(tracks[0].durata, "3:19")
         self.assertEqual(tracks[0].crediti, "Pink Floyd")
+        self.assertEqual(tracks[0].durata_secondi, 199)
 
     def test_format_duration(self):
         self.assertEqual(format_duration(199000), "3:19")
@@ -105,7 +108,7 @@ class ImportBraniAlbumViewTestCase(TestCase):
             TrackCandidate("The Thin Ice", "a", "2", "2:27", "Waters"),
         ]
 
-    @patch("music.views.get_release_tracks")
+    @patch("music.views.get_release")
     @patch("music.views.search_releases")
     def test_staff_can_open_import_page(self, mock_search, mock_tracks):
         mock_search.return_value = [self.release]
@@ -122,11 +125,11 @@ class ImportBraniAlbumViewTestCase(TestCase):
         response = self.client.get(reverse("importa_brani_album", kwargs={"pk": self.album.pk}))
         self.assertIn(response.status_code, (302, 403))
 
-    @patch("music.views.get_release_tracks")
+    @patch("music.views.get_release")
     @patch("music.views.search_releases")
     def test_preview_selected_release(self, mock_search, mock_tracks):
         mock_search.return_value = [self.release]
-        mock_tracks.return_value = self.tracks
+        mock_tracks.return_value = ReleaseDetail(self.release, "artist-1", self.tracks)
         self.client.login(username="staff", password="testpass123")
 
         response = self.client.get(
@@ -138,11 +141,9 @@ class ImportBraniAlbumViewTestCase(TestCase):
         self.assertContains(response, "In the Flesh?")
         self.assertContains(response, "Importa 2 brani")
 
-    @patch("music.views.get_release_tracks")
-    @patch("music.views.search_releases")
-    def test_import_creates_tracks(self, mock_search, mock_tracks):
-        mock_search.return_value = [self.release]
-        mock_tracks.return_value = self.tracks
+    @patch("music.tasks.get_release")
+    def test_import_creates_tracks(self, mock_tracks):
+        mock_tracks.return_value = ReleaseDetail(self.release, "artist-1", self.tracks)
         self.client.login(username="staff", password="testpass123")
 
         response = self.client.post(
@@ -150,20 +151,31 @@ class ImportBraniAlbumViewTestCase(TestCase):
             {"release_mbid": "release-1", "skip_existing": "on"},
         )
 
+        # La vista accoda il job e ritorna subito: l'import lo esegue il worker
         self.assertEqual(response.status_code, 302)
+        mock_tracks.assert_not_called()
+        self.assertEqual(self.album.brani.count(), 0)
+        self.assertEqual(run_pending(), 1)
         self.assertEqual(self.album.brani.count(), 2)
 
-    @patch("music.views.get_release_tracks")
-    @patch("music.views.search_releases")
-    def test_import_skips_existing_tracks(self, mock_search, mock_tracks):
+    def test_import_of_another_release_is_not_dropped(self):
+        self.client.login(username="staff", password="testpass123")
+        url = reverse("importa_brani_album", kwargs={"pk": self.album.pk})
+        for release in ("release-1", "release-1", "release-2"):
+            self.client.post(url, {"release_mbid": release})
+        self.assertEqual(
+            sorted(Job.objects.values_list("parametri__release_mbid", flat=True)), ["release-1", "release-2"]
+        )
+
+    @patch("music.tasks.get_release")
+    def test_import_skips_existing_tracks(self, mock_tracks):
         Brano.objects.create(
             titolo_brano="In the Flesh?",
             sezione="a",
             progressivo="1",
             album_appartenenza=self.album,
         )
-        mock_search.return_value = [self.release]
-        mock_tracks.return_value = self.tracks
+        mock_tracks.return_value = ReleaseDetail(self.release, "artist-1", self.tracks)
         self.client.login(username="staff", password="testpass123")
 
         response = self.client.post(
@@ -173,10 +185,15 @@ class ImportBraniAlbumViewTestCase(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(self.album.brani.count(), 2)
         messages = [str(message) for message in response.context["messages"]]
-        self.assertTrue(any("1 creati" in message for message in messages))
-        self.assertTrue(any("1 aggiornati" in message for message in messages))
+        self.assertTrue(any("Import accodato" in message for message in messages))
+        run_pending()
+        self.assertEqual(self.album.brani.count(), 2)
+        job = Job.objects.get()
+        self.assertEqual(job.stato, Job.STATO_COMPLETATO)
+        self.assertIn("1 creati", job.messaggio)
+        self.assertIn("1 aggiornati", job.messaggio)
+        self.assertEqual(job.risultato["creati"], 1)
 
     def test_import_tracks_for_album_service(self):
         tracks = [
@@ -187,6 +204,12 @@ class ImportBraniAlbumViewTestCase(TestCase):
         self.assertEqual(result.created, 2)
         self.assertEqual(self.album.brani.count(), 2)
 
+    def test_reimport_matches_non_ascii_titles(self):
+        Brano.objects.create(titolo_brano="Élan", album_appartenenza=self.album)
+        result = import_tracks_for_album(self.album, [TrackCandidate("Élan", "a", "1", "3:00", None)])
+        self.assertEqual(result.created, 0)
+        self.assertEqual(self.album.brani.count(), 1)
+
     def test_import_updates_position_for_existing_track(self):
         brano = Brano.objects.create(
             titolo_brano="In the Flesh?",
@@ -229,3 +252,87 @@ class ImportBraniAlbumViewTestCase(TestCase):
         self.assertEqual(brano.progressivo, "2")
         self.assertEqual(brano.durata, "4:00")
         self.assertEqual(brano.crediti, "Esistenti")
+
+    @patch("music.tasks.get_release")
+    def test_import_stores_musicbrainz_ids(self, mock_release):
+        tracks = [TrackCandidate("In the Flesh?", "a", "1", "3:19", "Waters", recording_mbid="rec-1")]
+        mock_release.return_value = ReleaseDetail(self.release, "artist-1", tracks)
+        self.client.login(username="staff", password="testpass123")
+
+        self.client.post(
+            reverse("importa_brani_album", kwargs={"pk": self.album.pk}),
+            {"release_mbid": "release-1", "skip_existing": "on"},
+        )
+        run_pending()
+
+        self.album.refresh_from_db()
+        self.artista.refresh_from_db()
+        self.assertEqual(self.album.mb_release_id, "release-1")
+        self.assertEqual(self.artista.mb_artist_id, "artist-1")
+        self.assertEqual(self.album.brani.get().mb_recording_id, "rec-1")
+
+    @patch("music.views.get_release")
+    @patch("music.views.search_releases")
+    def test_stored_release_skips_search(self, mock_search, mock_release):
+        Album.objects.filter(pk=self.album.pk).update(mb_release_id="release-1")
+        mock_release.return_value = ReleaseDetail(self.release, "artist-1", self.tracks)
+        self.client.login(username="staff", password="testpass123")
+        url = reverse("importa_brani_album", kwargs={"pk": self.album.pk})
+
+        response = self.client.get(url)
+
+        mock_search.assert_not_called()
+        mock_release.assert_called_once_with("release-1")
+        self.assertContains(response, "Importa 2 brani")
+        self.assertContains(response, "?cerca=1")
+
+        mock_search.return_value = [self.release]
+        self.client.get(url, {"cerca": "1"})
+        mock_search.assert_called_once()
+
+
+class BranoNumericFieldsTestCase(TestCase):
+    def setUp(self):
+        self.artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.album = Album.objects.create(
+            titolo_album="Ummagumma",
+            artista_appartenenza=self.artista,
+        )
+
+    def test_save_derives_numeric_fields(self):
+        brano = Brano.objects.create(
+            titolo_brano="Astronomy Domine",
+            progressivo="001",
+            durata="8:29",
+            album_appartenenza=self.album,
+        )
+        self.assertEqual(brano.posizione, 1)
+        self.assertEqual(brano.durata_secondi, 509)
+
+        brano.durata = "8:30"
+        brano.progressivo = "10"
+        brano.save()
+        brano.refresh_from_db()
+        self.assertEqual(brano.durata_secondi, 510)
+        self.assertEqual(brano.posizione, 10)
+
+    def test_import_keeps_musicbrainz_seconds(self):
+        import_tracks_for_album(
+            self.album,
+            [TrackCandidate("Sysyphus", "b", "B1", "125:4", None, durata_secondi=7545, posizione=5)],
+        )
+        brano = self.album.brani.get()
+        self.assertEqual(brano.durata_secondi, 7545)
+        self.assertEqual(brano.posizione, 5)
+
+    def test_album_view_orders_numerically(self):
+        for progressivo in ["10", "2", "1"]:
+            Brano.objects.create(
+                titolo_brano=f"Track {progressivo}",
+                sezione="a",
+                progressivo=progressivo,
+                album_appartenenza=self.album,
+            )
+        response = self.client.get(reverse("album_view", kwargs={"pk": self.album.pk}))
+        titles = [b.titolo_brano for b in response.context["brani_album"]]
+        self.assertEqual(titles, ["Track 1", "Track 2", "Track 10"])
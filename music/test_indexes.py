@@ -0,0 +1,89 @@
+"""
+Verifica con EXPLAIN che le query dei percorsi caldi usino gli indici previsti.
+Gira solo su PostgreSQL: con altri backend i test vengono saltati.
+"""
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.test import TestCase
+
+from music.models import Album, Artista, Brano, genere_normalizzato_sql
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN degli indici verificato solo su PostgreSQL")
+class HotPathIndexTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        artisti = Artista.objects.bulk_create(
+            Artista(nome_artista=f"Artista {idx:03d}") for idx in range(50)
+        )
+        albums = Album.objects.bulk_create(
+            Album(
+                titolo_album=f"Album {idx:03d}",
+                artista_appartenenza=artisti[idx % len(artisti)],
+                genere="Classica" if idx % 7 == 0 else "Rock",
+                closed=idx % 3 == 0,
+            )
+            for idx in range(200)
+        )
+        Brano.objects.bulk_create(
+            Brano(titolo_brano=f"Brano {idx:03d}", album_appartenenza=albums[idx % len(albums)])
+            for idx in range(600)
+        )
+        cls.artista = artisti[0]
+        cls.album = albums[0]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            # Con poche righe il planner sceglierebbe comunque la scansione sequenziale
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f"Indice {index_name} non usato:\n{plan}")
+
+    def test_artist_ordering(self):
+        self.assertUsesIndex(Artista.objects.order_by("nome_artista"), "artista_nome_idx")
+
+    def test_album_lookup_by_title_and_artist(self):
+        self.assertUsesIndex(
+            Album.objects.filter(titolo_album="Album 000", artista_appartenenza=self.artista),
+            "album_titolo_artista_idx",
+        )
+
+    def test_closed_albums_per_artist(self):
+        self.assertUsesIndex(
+            Album.objects.filter(artista_appartenenza=self.artista, closed=True).values("pk"),
+            "album_closed_artista_idx",
+        )
+
+    def test_genere_lower(self):
+        self.assertUsesIndex(
+            Album.objects.alias(genere_norm=genere_normalizzato_sql()).filter(genere_norm="classica").values("pk"),
+            "album_genere_lower_idx",
+        )
+
+    def test_track_title_lookup(self):
+        self.assertUsesIndex(
+            Brano.objects.alias(titolo_lower=Lower("titolo_brano")).filter(
+                album_appartenenza=self.album, titolo_lower=Lower(Value("Brano 000"))
+            ),
+            "brano_album_titolo_lower_idx",
+        )
+
+    def test_track_list_ordering(self):
+        self.assertUsesIndex(
+            Brano.objects.filter(album_appartenenza=self.album).order_by("sezione", "posizione"),
+            "brano_album_ordine_idx",
+        )
+
+    def test_catalogue_order(self):
+        self.assertUsesIndex(Album.objects.catalogue_order(), "album_catalogo_ordine_idx")
+
+    def test_admin_search_uses_trigram_indexes(self):
+        self.assertUsesIndex(Artista.objects.filter(nome_artista__icontains="ista 04"), "artista_nome_trgm_idx")
+        self.assertUsesIndex(Album.objects.filter(titolo_album__icontains="bum 01"), "album_titolo_trgm_idx")
+        self.assertUsesIndex(Brano.objects.filter(titolo_brano__icontains="ano 05"), "brano_titolo_trgm_idx")
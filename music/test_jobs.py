@@ -0,0 +1,228 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from music.models import Album, Artista, Job
+from music.services import jobs
+from music.services.album_stats import refresh_stats_for_album_ids
+from music.services.report_pdf import PdfError
+
+
+def _jpeg():
+    buffer = BytesIO()
+    Image.new("RGB", (40, 40), (200, 0, 0)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _fallisce(job):
+    raise RuntimeError("servizio non disponibile")
+
+
+def _definitivo(job):
+    raise jobs.JobError("album non trovato")
+
+
+def _con_progresso(job, passi):
+    jobs.report_progress(job, 50, "a metà")
+    return {"passi": passi}
+
+
+TEST_TASKS = {"fallisce": _fallisce, "definitivo": _definitivo, "progresso": _con_progresso}
+
+
+@patch.dict(jobs.TASKS, TEST_TASKS)
+class JobQueueTestCase(TestCase):
+    def test_enqueue_deduplicates_active_jobs_by_key(self):
+        primo = jobs.enqueue("progresso", chiave="k", passi=1)
+        self.assertEqual(jobs.enqueue("progresso", chiave="k", passi=2), primo)
+        Job.objects.filter(pk=primo.pk).update(stato=Job.STATO_COMPLETATO)
+        self.assertNotEqual(jobs.enqueue("progresso", chiave="k", passi=3), primo)
+        with self.assertRaises(jobs.UnknownTask):
+            jobs.enqueue("inesistente")
+
+    def test_claim_follows_priority_then_age(self):
+        normale = jobs.enqueue("progresso", passi=1)
+        alta = jobs.enqueue("progresso", priorita=Job.PRIORITA_ALTA, passi=2)
+        futuro = jobs.enqueue("progresso", priorita=Job.PRIORITA_ALTA, passi=3)
+        Job.objects.filter(pk=futuro.pk).update(esegui_dopo=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(jobs.claim_next("w").pk, alta.pk)
+        job = jobs.claim_next("w")
+        self.assertEqual((job.pk, job.stato, job.tentativi, job.worker), (normale.pk, Job.STATO_IN_ESECUZIONE, 1, "w"))
+        self.assertIsNone(jobs.claim_next("w"))
+
+    @override_settings(JOB_RETRY_BACKOFF=10)
+    def test_failures_are_retried_with_backoff_then_marked_failed(self):
+        with self.assertLogs("music.services.jobs", "WARNING") as logs:
+            job = jobs.enqueue("fallisce", max_tentativi=2)
+            job = jobs.run_job(jobs.claim_next())
+            self.assertEqual(job.stato, Job.STATO_IN_CODA)
+            self.assertGreater(job.esegui_dopo, timezone.now() + timedelta(seconds=5))
+            self.assertIn("RuntimeError", job.errore)
+
+            Job.objects.filter(pk=job.pk).update(esegui_dopo=timezone.now())
+            job = jobs.run_job(jobs.claim_next())
+            self.assertEqual((job.stato, job.tentativi), (Job.STATO_FALLITO, 2))
+            self.assertEqual(job.messaggio, "servizio non disponibile")
+
+            # JobError: nessun altro tentativo
+            jobs.enqueue("definitivo")
+            job = jobs.run_job(jobs.claim_next())
+            self.assertEqual((job.stato, job.tentativi), (Job.STATO_FALLITO, 1))
+        self.assertEqual(len(logs.output), 3)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue("progresso", passi=1)
+        job = jobs.claim_next()
+        due_ore_fa = timezone.now() - timedelta(hours=2)
+        Job.objects.filter(pk=job.pk).update(avviato_il=due_ore_fa, ultimo_segnale_il=due_ore_fa)
+
+        # Un job lungo che riporta l'avanzamento resta al suo worker
+        jobs.report_progress(job, 40, "ancora vivo")
+        self.assertEqual(jobs.requeue_stale(timeout=3600), 0)
+
+        Job.objects.filter(pk=job.pk).update(ultimo_segnale_il=due_ore_fa)
+        self.assertEqual(jobs.requeue_stale(timeout=3600), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).stato, Job.STATO_IN_CODA)
+
+    def test_stale_job_without_attempts_left_fails(self):
+        # Un job che uccide il worker (es. memoria esaurita) non riparte all'infinito
+        jobs.enqueue("progresso", max_tentativi=2, passi=1)
+        due_ore_fa = timezone.now() - timedelta(hours=2)
+        job = jobs.claim_next()
+        Job.objects.filter(pk=job.pk).update(ultimo_segnale_il=due_ore_fa)
+        self.assertEqual(jobs.requeue_stale(timeout=3600), 1)
+
+        job = jobs.claim_next()
+        Job.objects.filter(pk=job.pk).update(ultimo_segnale_il=due_ore_fa)
+        with self.assertLogs("music.services.jobs", "ERROR"):
+            self.assertEqual(jobs.requeue_stale(timeout=3600), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.stato, job.tentativi), (Job.STATO_FALLITO, 2))
+        self.assertIsNotNone(job.completato_il)
+        self.assertIn("tentativi esauriti", job.messaggio)
+        self.assertIsNone(jobs.claim_next())
+
+    def test_run_worker_once_executes_ready_jobs(self):
+        job = jobs.enqueue("progresso", passi=3)
+        out = StringIO()
+        call_command("run_worker", "--once", stdout=out)
+        job.refresh_from_db()
+        self.assertEqual((job.stato, job.progresso, job.risultato), (Job.STATO_COMPLETATO, 100, {"passi": 3}))
+        self.assertEqual(job.messaggio, "a metà")
+        self.assertIn("Job eseguiti: 1", out.getvalue())
+
+
+class JobViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.media = Path(media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.artista = Artista.objects.create(nome_artista="Genesis")
+        Album.objects.create(titolo_album="Foxtrot", artista_appartenenza=self.artista)
+
+    def test_report_pdf_is_built_in_background_and_reused(self):
+        url = reverse("report_artisti_pdf")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertContains(response, "Report in preparazione", status_code=202)
+        # Ricaricare la pagina non accoda un secondo job
+        self.client.get(url)
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.assertEqual(jobs.run_pending(), 1)
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+        # Catalogo cambiato: nuovo report, il file precedente viene eliminato
+        self.artista.nome_artista = "Genesis (UK)"
+        self.artista.save()
+        self.assertEqual(self.client.get(url).status_code, 202)
+        jobs.run_pending()
+        self.assertEqual(Job.objects.exclude(file="").count(), 1)
+        self.assertEqual(len(list((self.media / "job").iterdir())), 1)
+
+    def test_report_pdf_follows_catalogue_changes_and_retries_failures(self):
+        url = reverse("report_artisti_pdf")
+        self.client.get(url)
+        jobs.run_pending()
+
+        # Brani aggiunti fuori dalle viste: cambiano le statistiche mostrate nel PDF
+        album = Album.objects.get()
+        album.brani.create(titolo_brano="Supper's Ready")
+        refresh_stats_for_album_ids([album.pk])
+        self.assertEqual(self.client.get(url).status_code, 202)
+        self.assertEqual(Job.objects.count(), 2)
+
+        with patch("music.tasks.build_artisti_pdf", side_effect=PdfError("xhtml2pdf assente")):
+            with self.assertLogs("music.services.jobs", "WARNING"):
+                jobs.run_pending()
+        response = self.client.get(url)
+        self.assertContains(response, "xhtml2pdf assente", status_code=202)
+        self.assertEqual(Job.objects.filter(stato=Job.STATO_IN_CODA).count(), 1)
+        jobs.run_pending()
+        self.assertEqual(self.client.get(url)["Content-Type"], "application/pdf")
+
+    @patch("music.services.report_pdf.PROGRESS_EVERY", 0)
+    def test_report_pdf_reports_progress_while_building(self):
+        album = Album.objects.get()
+        album.copertina = SimpleUploadedFile("foxtrot.jpg", _jpeg())
+        album.save()
+        self.client.get(reverse("report_artisti_pdf"))
+        with patch("music.tasks.report_progress", wraps=jobs.report_progress) as progress:
+            jobs.run_pending()
+        messaggi = [call.args[2] for call in progress.call_args_list]
+        self.assertEqual(
+            messaggi,
+            [
+                "Generazione del PDF",
+                "Lettura del catalogo",
+                "Impaginazione del PDF",
+                "Impaginazione del PDF: 1/1 immagini",
+            ],
+        )
+        self.assertEqual(Job.objects.get().stato, Job.STATO_COMPLETATO)
+
+    def test_cover_loader_can_run_in_background(self):
+        images = self.media / "immagini"
+        images.mkdir()
+        (images / "Foxtrot.jpg").write_bytes(b"jpeg")
+        out = StringIO()
+        call_command("load_album_covers", "--images-dir", str(images), "--background", stdout=out)
+        self.assertIn("accodato", out.getvalue())
+        self.assertFalse(Album.objects.get().copertina)
+
+        jobs.run_pending()
+        job = Job.objects.get()
+        self.assertEqual((job.stato, job.progresso), (Job.STATO_COMPLETATO, 100))
+        self.assertIn("Album aggiornati: 1", job.messaggio)
+        self.assertTrue(Album.objects.get().copertina)
+
+    def test_job_page_is_staff_only(self):
+        jobs.enqueue("report_artisti_pdf")
+        User.objects.create_user("utente", password="pw")
+        self.client.login(username="utente", password="pw")
+        self.assertEqual(self.client.get(reverse("lista_job")).status_code, 403)
+
+        self.client.force_login(User.objects.create_user("staff", password="pw", is_staff=True))
+        response = self.client.get(reverse("lista_job"), {"stato": Job.STATO_IN_CODA})
+        self.assertContains(response, "report_artisti_pdf")
+        self.assertEqual(response.context["attivi"], 1)
@@ -1,10 +1,21 @@
+import asyncio
+import threading
+import time
 from unittest.mock import patch
 
+import requests
+from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from music.models import Album, Artista, Brano
+from music.services.circuit import host_breaker, reset_all
+from music.services.http import fake_http
 from music.services.listening import (
+    BANDCAMP_SEARCH_URL,
+    YOUTUBE_SEARCH_API_URL,
+    _race,
+    aresolve_listen_url,
     cache_listen_url,
     find_bandcamp_url,
     find_youtube_watch_url,
@@ -25,20 +36,20 @@ class ListeningServiceTestCase(TestCase):
             album_appartenenza=self.album,
         )
 
-    @patch("music.services.listening.requests.get")
-    def test_find_bandcamp_url_from_autocomplete(self, mock_get):
-        mock_response = mock_get.return_value
-        mock_response.headers = {"Content-Type": "application/json"}
-        mock_response.json.return_value = {
-            "results": [
-                {
-                    "itemtype": "t",
-                    "url": "https://artist.bandcamp.com/track/demo",
-                }
-            ]
-        }
-
-        url = find_bandcamp_url("Artist", "Album", "Track")
+    def test_find_bandcamp_url_from_autocomplete(self):
+        with fake_http() as fake:
+            fake.add(
+                BANDCAMP_SEARCH_URL,
+                json_data={
+                    "results": [
+                        {
+                            "itemtype": "t",
+                            "url": "https://artist.bandcamp.com/track/demo",
+                        }
+                    ]
+                },
+            )
+            url = find_bandcamp_url("Artist", "Album", "Track")
 
         self.assertEqual(url, "https://artist.bandcamp.com/track/demo")
 
@@ -48,19 +59,14 @@ class ListeningServiceTestCase(TestCase):
         self.assertIn("search_query=", url)
 
     @override_settings(YOUTUBE_API_KEY="test-key")
-    @patch("music.services.listening.requests.get")
-    def test_find_youtube_watch_url(self, mock_get):
-        mock_response = mock_get.return_value
-        mock_response.json.return_value = {
-            "items": [{"id": {"videoId": "abc123XYZ"}}]
-        }
-
-        url = find_youtube_watch_url("Pink Floyd", "The Wall", "Money")
+    def test_find_youtube_watch_url(self):
+        with fake_http() as fake:
+            fake.add(YOUTUBE_SEARCH_API_URL, json_data={"items": [{"id": {"videoId": "abc123XYZ"}}]})
+            url = find_youtube_watch_url("Pink Floyd", "The Wall", "Money")
 
         self.assertEqual(url, "https://www.youtube.com/watch?v=abc123XYZ")
-        mock_get.assert_called_once()
-        _, kwargs = mock_get.call_args
-        self.assertEqual(kwargs["params"]["key"], "test-key")
+        self.assertEqual(len(fake.requests), 1)
+        self.assertEqual(fake.requests[0]["params"]["key"], "test-key")
 
     @override_settings(YOUTUBE_API_KEY="")
     def test_find_youtube_watch_url_without_api_key(self):
@@ -93,6 +99,34 @@ class ListeningServiceTestCase(TestCase):
         self.assertEqual(self.brano.ascolto_url, url)
         self.assertEqual(self.brano.ascolto_fonte, "bandcamp")
 
+    @patch("music.services.listening.find_youtube_watch_url", return_value=None)
+    @patch("music.services.listening.find_bandcamp_url", return_value=None)
+    @patch("music.services.listening.get_recording_urls")
+    def test_resolve_uses_musicbrainz_recording_links(self, mock_urls, mock_bandcamp, mock_youtube):
+        self.brano.mb_recording_id = "rec-1"
+        mock_urls.return_value = [
+            "https://www.discogs.com/release/1",
+            "https://pinkfloyd.bandcamp.com/track/wish-you-were-here",
+        ]
+
+        url, source, from_cache = resolve_listen_url(self.brano)
+
+        mock_urls.assert_called_once_with("rec-1")
+        self.assertEqual((url, source, from_cache), ("https://pinkfloyd.bandcamp.com/track/wish-you-were-here", "bandcamp", False))
+
+    @patch("music.services.listening.find_youtube_watch_url", return_value=None)
+    @patch("music.services.listening.find_bandcamp_url")
+    @patch("music.services.listening.get_recording_urls")
+    def test_direct_sources_do_not_wait_for_musicbrainz(self, mock_urls, mock_bandcamp, mock_youtube):
+        self.brano.mb_recording_id = "rec-1"
+        mock_bandcamp.return_value = "https://pinkfloyd.bandcamp.com/track/wish-you-were-here"
+
+        url, source, _from_cache = resolve_listen_url(self.brano)
+
+        # MusicBrainz (1 richiesta/s) è interrogato solo se le fonti dirette non trovano nulla
+        self.assertEqual(source, "bandcamp")
+        mock_urls.assert_not_called()
+
     @patch("music.services.listening.find_youtube_watch_url")
     @patch("music.services.listening.find_bandcamp_url")
     def test_resolve_uses_cache(self, mock_bandcamp, mock_youtube):
@@ -192,3 +226,118 @@ class AscoltaBranoViewTestCase(TestCase):
 
         self.assertContains(response, "Ascolta")
         self.assertContains(response, reverse("ascolta_brano", kwargs={"pk": self.brano.pk}))
+
+
+class ListenRaceTestCase(TestCase):
+    def setUp(self):
+        reset_all()
+        self.addCleanup(reset_all)
+        artista = Artista.objects.create(nome_artista="Pink Floyd")
+        album = Album.objects.create(titolo_album="Animals", artista_appartenenza=artista)
+        self.brano = Brano.objects.create(titolo_brano="Dogs", album_appartenenza=album)
+
+    @patch("music.services.listening.find_youtube_watch_url")
+    @patch("music.services.listening.find_bandcamp_url")
+    def test_bandcamp_wins_even_if_youtube_answers_first(self, mock_bandcamp, mock_youtube):
+        def slow_bandcamp(*args, **kwargs):
+            time.sleep(0.1)
+            return "https://pinkfloyd.bandcamp.com/track/dogs"
+
+        mock_bandcamp.side_effect = slow_bandcamp
+        mock_youtube.return_value = "https://www.youtube.com/watch?v=dogs"
+
+        url, source, from_cache = resolve_listen_url(self.brano)
+
+        self.assertEqual((url, source, from_cache), ("https://pinkfloyd.bandcamp.com/track/dogs", "bandcamp", False))
+        mock_youtube.assert_called_once()
+
+    @override_settings(LISTEN_LOOKUP_DEADLINE=0.2)
+    @patch("music.services.listening.find_youtube_watch_url")
+    @patch("music.services.listening.find_bandcamp_url")
+    def test_global_deadline(self, mock_bandcamp, mock_youtube):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        mock_bandcamp.side_effect = lambda *args, **kwargs: release.wait(5) and None
+        mock_youtube.return_value = "https://www.youtube.com/watch?v=dogs"
+
+        start = time.monotonic()
+        url, source, _from_cache = resolve_listen_url(self.brano)
+
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(source, "youtube")
+        self.assertEqual(url, "https://www.youtube.com/watch?v=dogs")
+
+    def test_race_reuses_the_shared_threads(self):
+        threads, deadlines = set(), []
+
+        def finder(*args, deadline):
+            threads.add(threading.current_thread())
+            deadlines.append(deadline - time.monotonic())
+            return None
+
+        finders = [("bandcamp", finder), ("youtube", finder)]
+        for _ in range(20):
+            self.assertIsNone(_race(finders, "Pink Floyd", "Animals", "Dogs"))
+        # Nessun pool nuovo per ricerca: i thread (e le loro sessioni) vengono riusati
+        self.assertLessEqual(len(threads), settings.LISTEN_LOOKUP_WORKERS)
+        self.assertEqual(len(deadlines), 40)
+        self.assertTrue(all(0 < remaining <= settings.LISTEN_LOOKUP_DEADLINE for remaining in deadlines))
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=2)
+    def test_circuit_breaker_skips_failing_source(self):
+        with fake_http() as fake:
+            fake.add(BANDCAMP_SEARCH_URL, exc=requests.ConnectionError("down"))
+            for _ in range(2):
+                self.assertIsNone(find_bandcamp_url("A", "B", "C"))
+            self.assertTrue(host_breaker("bandcamp.com").is_open)
+            sent = len(fake.requests)
+
+            url, source, _from_cache = resolve_listen_url(self.brano)
+        self.assertEqual(len(fake.requests), sent)
+        self.assertIn("youtube.com/results", url)
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=1, CIRCUIT_RESET_TIMEOUT=0.05, HTTP_RETRIES=0)
+    def test_race_circuit_opens_then_half_open_trial_closes_it(self):
+        finders = [("bandcamp", find_bandcamp_url)]
+        with fake_http() as fake:
+            fake.add(BANDCAMP_SEARCH_URL, exc=requests.ConnectionError("down")).add(
+                BANDCAMP_SEARCH_URL,
+                json_data={"results": [{"itemtype": "t", "url": "https://pinkfloyd.bandcamp.com/track/dogs"}]},
+            )
+            self.assertIsNone(_race(finders, "Pink Floyd", "Animals", "Dogs"))
+            breaker = host_breaker("bandcamp.com")
+            self.assertTrue(breaker.is_open)
+
+            # Circuito aperto: nessuna richiesta
+            self.assertIsNone(_race(finders, "Pink Floyd", "Animals", "Dogs"))
+            self.assertEqual(len(fake.requests), 1)
+
+            # Half-open: la richiesta di prova parte e richiude il circuito
+            time.sleep(0.06)
+            self.assertEqual(
+                _race(finders, "Pink Floyd", "Animals", "Dogs"),
+                ("bandcamp", "https://pinkfloyd.bandcamp.com/track/dogs"),
+            )
+            self.assertEqual(len(fake.requests), 2)
+            self.assertFalse(breaker.is_open)
+
+    @patch("music.services.listening.afind_youtube_watch_url")
+    @patch("music.services.listening.afind_bandcamp_url")
+    async def test_async_race_cancels_lower_priority(self, mock_bandcamp, mock_youtube):
+        cancelled = asyncio.Event()
+
+        async def slow_youtube(*args):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        mock_bandcamp.return_value = "https://pinkfloyd.bandcamp.com/track/dogs"
+        mock_youtube.side_effect = slow_youtube
+        brano = await Brano.objects.select_related("album_appartenenza__artista_appartenenza").aget(pk=self.brano.pk)
+
+        url, source, _from_cache = await aresolve_listen_url(brano)
+
+        self.assertEqual(source, "bandcamp")
+        await asyncio.wait_for(cancelled.wait(), 1)
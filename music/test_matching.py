@@ -0,0 +1,113 @@
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from music.models import Album, Artista, Brano, MusicBrainzMatch
+from music.services.matching import albums_to_match, choose_release, rank_candidates
+from music.services.musicbrainz import MusicBrainzError, ReleaseCandidate, ReleaseDetail, TrackCandidate
+
+ANIMALS = ReleaseCandidate("mbid-animals", "Animals", "1977-01-23", "GB", "Harvest", 5, 1)
+ANIMALS_REISSUE = ReleaseCandidate("mbid-reissue", "Animals (2018 Remix)", "2022-09-16", "XE", "Pink Floyd Records", 5, 1)
+ANIMALS_LIVE = ReleaseCandidate("mbid-live", "Animals Live", "1977-05-01", "US", "Bootleg", 9, 2)
+TRACKS = [
+    TrackCandidate("Pigs on the Wing 1", "a", "1", "1:25", None, 85, 1),
+    TrackCandidate("Dogs", "a", "2", "17:04", None, 1024, 2),
+]
+
+
+class MatchingScoreTestCase(TestCase):
+    def setUp(self):
+        artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.album = Album.objects.create(
+            titolo_album="Animals",
+            artista_appartenenza=artista,
+            editore="Harvest",
+            data_rilascio=date(1977, 1, 23),
+        )
+
+    def test_original_release_ranks_first(self):
+        ranked = rank_candidates(self.album, [ANIMALS_LIVE, ANIMALS_REISSUE, ANIMALS])
+        self.assertEqual(ranked[0].candidate, ANIMALS)
+        self.assertEqual(ranked[0].score, 1.0)
+        state, chosen = choose_release(ranked)
+        self.assertEqual(state, MusicBrainzMatch.STATO_ABBINATO)
+        self.assertEqual(chosen.candidate, ANIMALS)
+
+    def test_close_candidates_with_different_tracklists_are_ambiguous(self):
+        album = Album(titolo_album="Animals", artista_appartenenza=self.album.artista_appartenenza)
+        other = ReleaseCandidate("mbid-other", "Animals", "1977-01-23", "GB", "Harvest", 12, 2)
+        state, chosen = choose_release(rank_candidates(album, [ANIMALS, other]))
+        self.assertEqual(state, MusicBrainzMatch.STATO_AMBIGUO)
+        self.assertIsNone(chosen)
+
+    def test_albums_to_match_selects_missing_tracks_or_durations(self):
+        complete = Album.objects.create(titolo_album="Meddle", artista_appartenenza=self.album.artista_appartenenza)
+        Brano.objects.create(titolo_brano="Echoes", durata="23:31", album_appartenenza=complete)
+        partial = Album.objects.create(titolo_album="Wish", artista_appartenenza=self.album.artista_appartenenza)
+        Brano.objects.create(titolo_brano="Welcome", album_appartenenza=partial)
+        self.assertEqual(list(albums_to_match()), [self.album, partial])
+
+
+@patch("music.services.matching.get_release", return_value=ReleaseDetail(ANIMALS, "artist-pf", TRACKS))
+@patch("music.services.matching.search_releases")
+class MatchMusicBrainzCommandTestCase(TestCase):
+    def setUp(self):
+        artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.album = Album.objects.create(titolo_album="Animals", artista_appartenenza=artista, editore="Harvest")
+        self.other = Album.objects.create(titolo_album="Obscured by Clouds", artista_appartenenza=artista)
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("match_musicbrainz", *args, stdout=out)
+        return out.getvalue()
+
+    def test_imports_matched_album_and_persists_decisions(self, mock_search, mock_tracks):
+        mock_search.side_effect = lambda artist, title, date=None: [ANIMALS] if title == "Animals" else []
+
+        self._run()
+
+        match = MusicBrainzMatch.objects.get(album=self.album)
+        self.assertEqual(match.stato, MusicBrainzMatch.STATO_ABBINATO)
+        self.assertEqual(match.release_mbid, "mbid-animals")
+        self.assertEqual(match.brani_creati, 2)
+        self.assertEqual(self.album.brani.count(), 2)
+        mock_tracks.assert_called_once_with("mbid-animals")
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.mb_release_id, "mbid-animals")
+        self.assertEqual(self.album.artista_appartenenza.mb_artist_id, "artist-pf")
+        self.assertEqual(MusicBrainzMatch.objects.get(album=self.other).stato, MusicBrainzMatch.STATO_NESSUNO)
+
+    def test_resume_skips_decided_albums_and_retries_errors(self, mock_search, mock_tracks):
+        MusicBrainzMatch.objects.create(album=self.album, stato=MusicBrainzMatch.STATO_AMBIGUO)
+        MusicBrainzMatch.objects.create(album=self.other, stato=MusicBrainzMatch.STATO_ERRORE)
+        mock_search.return_value = []
+
+        self._run()
+
+        # Solo l'album in errore viene rielaborato
+        self.assertEqual(mock_search.call_count, 1)
+        self.assertEqual(mock_search.call_args.args[1], "Obscured by Clouds")
+        self.assertEqual(MusicBrainzMatch.objects.get(album=self.other).stato, MusicBrainzMatch.STATO_NESSUNO)
+
+    def test_errors_are_recorded_and_dry_run_writes_nothing(self, mock_search, mock_tracks):
+        mock_search.side_effect = MusicBrainzError("Richiesta a MusicBrainz fallita: down")
+        output = self._run("--dry-run")
+        self.assertIn("DRY RUN", output)
+        self.assertFalse(MusicBrainzMatch.objects.exists())
+
+        self._run("--album", str(self.album.pk))
+        match = MusicBrainzMatch.objects.get(album=self.album)
+        self.assertEqual(match.stato, MusicBrainzMatch.STATO_ERRORE)
+        self.assertIn("down", match.messaggio)
+
+    def test_stored_release_skips_search(self, mock_search, mock_tracks):
+        Album.objects.filter(pk=self.album.pk).update(mb_release_id="mbid-animals")
+
+        self._run("--album", str(self.album.pk))
+
+        mock_search.assert_not_called()
+        mock_tracks.assert_called_once_with("mbid-animals")
+        self.assertEqual(MusicBrainzMatch.objects.get(album=self.album).stato, MusicBrainzMatch.STATO_ABBINATO)
@@ -0,0 +1,107 @@
+import json
+import lzma
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from music.models import Artista
+from music.services.musicbrainz import (
+    MusicBrainzError,
+    get_recording_urls,
+    get_release,
+    search_releases,
+)
+
+
+def _release(mbid, artist, title, date, tracks):
+    return {
+        "id": mbid,
+        "title": title,
+        "date": date,
+        "country": "GB",
+        "status": "Official",
+        "label-info": [{"catalog-number": "SHVL 815", "label": {"id": "l1", "name": "Harvest"}}],
+        "artist-credit": [{"name": artist, "joinphrase": "", "artist": {"id": f"artist-{artist}", "name": artist}}],
+        "media": [
+            {
+                "position": 1,
+                "format": "Vinyl",
+                "track-count": len(tracks),
+                "tracks": [
+                    {
+                        "title": title,
+                        "number": str(position),
+                        "position": position,
+                        "length": 60000 * position,
+                        "recording": {
+                            "id": f"rec-{mbid}-{position}",
+                            "artist-credit": [{"name": artist}],
+                            "relations": [{"url": {"resource": f"https://band.bandcamp.com/track/{position}"}}],
+                        },
+                    }
+                    for position, title in enumerate(tracks, start=1)
+                ],
+            }
+        ],
+    }
+
+
+DUMP = [
+    _release("mbid-animals", "Pink Floyd", "Animals", "1977-01-23", ["Pigs on the Wing 1", "Dogs"]),
+    _release("mbid-animals-remix", "Pink Floyd", "Animals (2018 Remix)", "2022-09-16", ["Dogs"]),
+    _release("mbid-agaetis", "Sigur Rós", "Ágætis byrjun", "1999-06-12", ["Svefn-g-englar"]),
+]
+
+
+class LocalMirrorTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dump = os.path.join(tmp.name, "release.json.xz")
+        with lzma.open(self.dump, "wt") as handle:
+            handle.write("\n".join(json.dumps(release) for release in DUMP))
+        self.db = os.path.join(tmp.name, "mirror.sqlite3")
+        settings = override_settings(MUSICBRAINZ_BACKEND="local", MUSICBRAINZ_LOCAL_DB=self.db)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _ingest(self, *args):
+        out = StringIO()
+        call_command("ingest_musicbrainz_dump", self.dump, *args, stdout=out)
+        return out.getvalue()
+
+    @patch("music.services.musicbrainz._get", side_effect=AssertionError("nessuna rete"))
+    def test_search_and_lookup_without_network(self, mock_get):
+        self.assertIn("Release caricate: 3", self._ingest())
+
+        releases = search_releases("PINK FLOYD", "animals")
+        self.assertEqual([release.mbid for release in releases], ["mbid-animals", "mbid-animals-remix"])
+        self.assertEqual(releases[0].label, "Harvest")
+        self.assertEqual(releases[0].track_count, 2)
+        self.assertEqual([r.mbid for r in search_releases("Pink Floyd", "Animals", "1977-01-23")], ["mbid-animals"])
+        # Nomi normalizzati: accenti e maiuscole non contano
+        self.assertEqual(search_releases("Sigur Ros", "Agaetis Byrjun")[0].mbid, "mbid-agaetis")
+
+        detail = get_release("mbid-animals")
+        self.assertEqual(detail.artist_mbid, "artist-Pink Floyd")
+        self.assertEqual([track.titolo_brano for track in detail.tracks], ["Pigs on the Wing 1", "Dogs"])
+        self.assertEqual(detail.tracks[1].durata, "2:00")
+        self.assertEqual(detail.tracks[1].recording_mbid, "rec-mbid-animals-2")
+        self.assertEqual(get_recording_urls("rec-mbid-animals-2"), ["https://band.bandcamp.com/track/2"])
+        mock_get.assert_not_called()
+
+    def test_catalogue_only_extract(self):
+        Artista.objects.create(nome_artista="Sigur Rós")
+        self.assertIn("Release caricate: 1", self._ingest("--solo-catalogo"))
+        self.assertEqual(search_releases("Pink Floyd", "Animals"), [])
+
+    def test_missing_mirror_or_release_raises_service_error(self):
+        with self.assertRaisesMessage(MusicBrainzError, "ingest_musicbrainz_dump"):
+            search_releases("Pink Floyd", "Animals")
+        self._ingest()
+        with self.assertRaises(MusicBrainzError):
+            get_release("missing")
@@ -0,0 +1,74 @@
+from unittest import skipUnless
+from unittest.mock import AsyncMock, patch
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import AsyncRequestFactory, TestCase
+
+from music import views_async
+from music.models import Album, Artista, Brano
+from music.services import listening, musicbrainz
+from music.services.async_client import httpx
+from music.services.http import fake_http
+from music.services.musicbrainz import ReleaseCandidate
+
+
+class AsyncLookupViewsTestCase(TestCase):
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.artista = Artista.objects.create(nome_artista="Pink Floyd")
+        self.album = Album.objects.create(titolo_album="Animals", artista_appartenenza=self.artista)
+        self.brano = Brano.objects.create(titolo_brano="Dogs", album_appartenenza=self.album)
+        self.staff = User.objects.create_user(username="staff", password="pwd", is_staff=True)
+
+    def _request(self, path, user):
+        request = self.factory.get(path)
+        request.user = user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return request
+
+    @patch("music.views_async.aresolve_listen_url", new_callable=AsyncMock)
+    async def test_ascolta_brano_redirects(self, mock_resolve):
+        mock_resolve.return_value = ("https://artist.bandcamp.com/track/dogs", "bandcamp", False)
+        response = await views_async.ascolta_brano(self._request("/", AnonymousUser()), self.brano.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], "https://artist.bandcamp.com/track/dogs")
+        called_brano = mock_resolve.call_args.args[0]
+        # Album e artista già caricati: nessuna query sincrona nel resolver
+        self.assertEqual(called_brano.album_appartenenza.artista_appartenenza.nome_artista, "Pink Floyd")
+
+    @patch("music.views_async.asearch_releases", new_callable=AsyncMock)
+    async def test_importa_brani_album_lists_releases(self, mock_search):
+        mock_search.return_value = [ReleaseCandidate("mbid-1", "Animals", "1977-01-23", "GB", "Harvest", 5, 1)]
+        response = await views_async.importa_brani_album(self._request("/", self.staff), self.album.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Harvest", response.content.decode())
+
+    async def test_importa_brani_album_requires_staff(self):
+        response = await views_async.importa_brani_album(self._request("/", AnonymousUser()), self.album.pk)
+        self.assertEqual(response.status_code, 302)
+
+
+@skipUnless(httpx is not None, "httpx non installato")
+class AsyncClientsTestCase(TestCase):
+    async def test_aget_release_tracks(self):
+        payload = {
+            "media": [
+                {"position": 1, "tracks": [{"title": "Dogs", "number": "2", "position": 2, "length": 1023000}]}
+            ]
+        }
+        with fake_http() as fake, patch.object(musicbrainz, "_athrottle", new_callable=AsyncMock):
+            fake.add(f"{musicbrainz.MUSICBRAINZ_API_URL}/release/mbid-1", json_data=payload)
+            tracks = await musicbrainz.aget_release_tracks("mbid-1")
+        self.assertEqual(tracks[0].titolo_brano, "Dogs")
+        self.assertEqual(tracks[0].durata_secondi, 1023)
+
+    async def test_afind_bandcamp_url(self):
+        payload = {"results": [{"itemtype": "t", "url": "https://artist.bandcamp.com/track/dogs"}]}
+        with fake_http() as fake:
+            fake.add(listening.BANDCAMP_SEARCH_URL, json_data=payload)
+            url = await listening.afind_bandcamp_url("Pink Floyd", "Animals", "Dogs")
+        self.assertEqual(url, "https://artist.bandcamp.com/track/dogs")
@@ -1,7 +1,7 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import Artista, Album, Brano
+from .models import Artista, Album, Brano, Stile
 from datetime import date
 
 class ArtistaEditTestCase(TestCase):
@@ -163,6 +163,16 @@ class AlbumBraniTestCase(TestCase):
         self.assertContains(response, '3')  # Numero di brani
         self.assertContains(response, 'badge')
     
+    def test_album_view_runs_constant_queries(self):
+        """Album con artista, brani e stili: tre query qualunque sia il numero di brani"""
+        self.album.stili.add(Stile.objects.create(stile='Rock opera'))
+        for n in range(20):
+            Brano.objects.create(titolo_brano=f'Extra {n}', sezione='d', progressivo=str(n), album_appartenenza=self.album)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('album_view', kwargs={'pk': self.album.pk}))
+        self.assertContains(response, 'Rock opera')
+        self.assertEqual(response.context['brani_album'].count(), 23)
+
     def test_empty_album_shows_message(self):
         """Test che un album senza brani mostri un messaggio appropriato"""
         # Crea un album vuoto
@@ -328,3 +338,93 @@ class BranoEditDeleteTestCase(TestCase):
         messages = list(response.context['messages'])
         self.assertEqual(len(messages), 1)
         self.assertIn('modificato con successo', str(messages[0]))
+
+
+class CatalogueOrderTestCase(TestCase):
+    """Test per la chiave di ordinamento materializzata "Classica in coda" """
+
+    def setUp(self):
+        self.bach = Artista.objects.create(nome_artista='Bach')
+        self.zappa = Artista.objects.create(nome_artista='Zappa')
+        self.classica = Album.objects.create(
+            titolo_album='Goldberg', genere='classica', artista_appartenenza=self.bach
+        )
+        self.rock = Album.objects.create(
+            titolo_album='Hot Rats', genere='Rock', artista_appartenenza=self.zappa
+        )
+        self.jazz = Album.objects.create(
+            titolo_album='Waka/Jawaka', genere='Jazz', artista_appartenenza=self.zappa
+        )
+
+    def test_sort_key_maintained_on_save(self):
+        self.assertTrue(self.classica.classica_in_coda)
+        self.assertFalse(self.rock.classica_in_coda)
+        self.assertEqual(self.rock.artista_ordinamento, 'Zappa')
+
+    def test_catalogue_order(self):
+        titoli = [a.titolo_album for a in Album.objects.catalogue_order()]
+        self.assertEqual(titoli, ['Hot Rats', 'Waka/Jawaka', 'Goldberg'])
+
+    def test_artist_rename_updates_albums(self):
+        self.zappa.nome_artista = 'Frank Zappa'
+        self.zappa.save()
+        self.rock.refresh_from_db()
+        self.assertEqual(self.rock.artista_ordinamento, 'Frank Zappa')
+
+    def test_refresh_catalogue_order_backfill(self):
+        Album.objects.update(classica_in_coda=False, artista_ordinamento='')
+        Album.objects.all().refresh_catalogue_order()
+        self.classica.refresh_from_db()
+        self.assertTrue(self.classica.classica_in_coda)
+        self.assertEqual(self.classica.artista_ordinamento, 'Bach')
+
+    def test_genre_with_spaces_is_classified_the_same_on_every_path(self):
+        self.rock.genere = ' CLASSICA '
+        self.rock.save()
+        self.assertTrue(self.rock.classica_in_coda)
+        Album.objects.update(classica_in_coda=False)
+        Album.objects.all().refresh_catalogue_order()
+        self.assertEqual(Album.objects.filter(classica_in_coda=True).count(), 2)
+
+    def test_album_list_uses_catalogue_order(self):
+        response = self.client.get(reverse('album_list'))
+        titoli = [a.titolo_album for a in response.context['lista_album']]
+        self.assertEqual(titoli, ['Hot Rats', 'Waka/Jawaka', 'Goldberg'])
+
+
+class DiscografiaTestCase(TestCase):
+    """Test per la discografia a pagine della pagina artista"""
+
+    def setUp(self):
+        self.artista = Artista.objects.create(nome_artista='Bach')
+        Album.objects.bulk_create(
+            Album(
+                titolo_album=f'Cantate {n:02d}',
+                genere='Barocco' if n < 25 else 'Classica',
+                artista_appartenenza=self.artista,
+                numero_brani=n,
+            )
+            for n in range(30)
+        )
+        Album.objects.all().refresh_catalogue_order()
+
+    def test_first_page_is_small_and_grouped_by_genre(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('artista_view', kwargs={'pk': self.artista.pk}))
+        page = response.context['discografia']
+        self.assertEqual(len(page), 20)
+        self.assertEqual(page.paginator.count, 30)
+        self.assertContains(response, '<h5 class="mt-3 mb-1 text-muted">Barocco</h5>', html=True)
+        self.assertNotContains(response, 'Cantate 25')
+        self.assertContains(response, reverse('discografia_artista', kwargs={'pk': self.artista.pk}) + '?page=2')
+
+    def test_fragment_continues_without_repeating_genre(self):
+        url = reverse('discografia_artista', kwargs={'pk': self.artista.pk})
+        response = self.client.get(url, {'page': 2})
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual([a.titolo_album for a in response.context['discografia']][0], 'Cantate 20')
+        # "Barocco" continua dalla pagina precedente, "Classica" inizia qui
+        self.assertNotContains(response, '>Barocco</h5>')
+        self.assertContains(response, '>Classica</h5>')
+        self.assertContains(response, '25 brani')
+        self.assertNotContains(response, 'discografia-altro')
@@ -1,23 +1,43 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
+
+# ASYNC_LOOKUP_VIEWS: viste asincrone per le ricerche esterne (profilo ASGI)
+if settings.ASYNC_LOOKUP_VIEWS:
+    importa_brani_view = views_async.importa_brani_album
+    ascolta_brano_view = views_async.ascolta_brano
+else:
+    importa_brani_view = views.importa_brani_album
+    ascolta_brano_view = views.ascolta_brano
 
 urlpatterns = [
     path('nuovo-artista/', views.CreaArtista.as_view(), name="crea_artista"),
     path('artista/<int:pk>/', views.VisualizzaArtista, name="artista_view"),
+    path('artista/<int:pk>/discografia/', views.discografia_artista, name="discografia_artista"),
     path('artista/<int:pk>/modifica/', views.ModificaArtista.as_view(), name="modifica_artista"),
     path('artista/<int:pk>/crea-album/', views.CreaAlbum, name="crea_album"),
     path('album/<int:pk>/', views.VisualizzaAlbum, name="album_view"),
     path('album/<int:pk>/modifica/', views.ModificaAlbum.as_view(), name="modifica_album"),
     path('album/<int:pk>/elimina/', views.EliminaAlbum.as_view(), name="elimina_album"),
     path('album/<int:pk>/crea-brano/', views.crea_brano, name="crea_brano"),
-    path('album/<int:pk>/importa-brani/', views.importa_brani_album, name="importa_brani_album"),
-    path('brano/<int:pk>/ascolta/', views.ascolta_brano, name="ascolta_brano"),
+    path('album/<int:pk>/importa-brani/', importa_brani_view, name="importa_brani_album"),
+    path('brano/<int:pk>/ascolta/', ascolta_brano_view, name="ascolta_brano"),
     path('brano/<int:pk>/modifica/', views.ModificaBrano.as_view(), name="modifica_brano"),
     path('brano/<int:pk>/elimina/', views.EliminaBrano.as_view(), name="elimina_brano"),
     path('report/artisti.pdf', views.report_artisti_pdf, name="report_artisti_pdf"),
+    path('statistiche/', views.StatisticheCollezione.as_view(), name="statistiche_collezione"),
+    path('job/', views.ListaJob.as_view(), name="lista_job"),
     path('album-desiderati/', views.ListaAlbumDesiderati.as_view(), name="album_desiderati"),
     path('album-desiderati/nuovo/', views.CreaAlbumDesiderato.as_view(), name="crea_album_desiderato"),
     path('album-desiderati/<int:pk>/modifica/', views.ModificaAlbumDesiderato.as_view(), name="modifica_album_desiderato"),
     path('album-desiderati/<int:pk>/elimina/', views.EliminaAlbumDesiderato.as_view(), name="elimina_album_desiderato"),
+    path('api/', api.api_root, name="api_root"),
+    path('api/artisti/', api.lista_artisti, name="api_artisti"),
+    path('api/artisti/<int:pk>/', api.dettaglio_artista, name="api_artista"),
+    path('api/album/', api.lista_album, name="api_album_list"),
+    path('api/album/<int:pk>/', api.dettaglio_album, name="api_album"),
+    path('api/brani/', api.lista_brani, name="api_brani"),
+    path('api/brani/<int:pk>/', api.dettaglio_brano, name="api_brano"),
+    path('api/album-desiderati/', api.lista_album_desiderati, name="api_album_desiderati"),
 
 ]
\ No newline at end of file
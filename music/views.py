@@ -1,27 +1,30 @@
+from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
+from django.views.generic.base import TemplateView
 from django.views.generic.list import ListView
 from django.http import HttpResponseRedirect
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.template.loader import render_to_string
-from django.conf import settings
-import os
 
+from . import tasks
 from .forms import AlbumModelForm, BranoModelForm, ArtistaModelForm, AlbumDesideratoForm
-from django.db.models import Prefetch, Case, When, IntegerField
+from django.db.models import Count
 
 from .mixins import StaffMixing
-from .models import Artista, Album, Brano, AlbumDesiderato
-from .services.brani_import import import_tracks_for_album
+from .models import Artista, Album, Brano, AlbumDesiderato, Job
+from .services.album_stats import refresh_album_stats
+from .services.collection_stats import load_collection_stats
+from .services.jobs import enqueue
 from .services.musicbrainz import (
     MusicBrainzError,
-    get_release_tracks,
+    get_release,
     search_releases,
 )
 from .services.listening import resolve_listen_url
+from .services.report_pdf import catalogue_version
 
 # Create your views here.
 
@@ -59,26 +62,37 @@ class ModificaAlbum(StaffMixing, UpdateView):
         messages.error(self.request, 'Errore di validazione: controlla i campi evidenziati e riprova.')
         return super().form_invalid(form)
 
+# Album per pagina della discografia (le successive arrivano scorrendo)
+DISCOGRAFIA_PAGE_SIZE = 20
+
+
+def _pagina_discografia(request, artista):
+    """
+    Pagina della discografia in ordine di catalogo (quindi raggruppata per genere).
+    Il numero di brani è quello denormalizzato sull'album: nessun COUNT per album.
+    """
+    albums_artista = (
+        Album.objects.filter(artista_appartenenza=artista)
+        .prefetch_related("stili")
+        .catalogue_order()
+    )
+    page = Paginator(albums_artista, DISCOGRAFIA_PAGE_SIZE).get_page(request.GET.get("page"))
+    genere_precedente = None
+    if page.has_previous():
+        # Il genere dell'ultimo album già mostrato: l'intestazione non si ripete
+        genere_precedente = albums_artista.values_list("genere", flat=True)[page.start_index() - 2]
+    return {"artista": artista, "discografia": page, "genere_precedente": genere_precedente}
+
+
 def VisualizzaArtista(request, pk):   
     artista = get_object_or_404(Artista, pk=pk)
-    albums_artista = Album.objects.filter(
-        artista_appartenenza = artista
-        ).annotate(
-            classica_in_coda=Case(
-                When(genere__iexact="Classica", then=1),
-                default=0,
-                output_field=IntegerField(),
-            )
-        ).order_by(
-            "classica_in_coda",
-            "-genere",
-            "artista_appartenenza__nome_artista",
-            "supporto",
-            "data_rilascio",
-            "titolo_album",
-        )
-    context = {"artista": artista, "discografia": albums_artista}
-    return render(request, "music/singolo_artista.html", context)
+    return render(request, "music/singolo_artista.html", _pagina_discografia(request, artista))
+
+
+def discografia_artista(request, pk):
+    """Frammento HTML con la pagina successiva della discografia (caricamento allo scroll)."""
+    artista = get_object_or_404(Artista, pk=pk)
+    return render(request, "music/_discografia_pagina.html", _pagina_discografia(request, artista))
 
 
 @login_required
@@ -104,12 +118,12 @@ def CreaAlbum(request, pk):
 
 
 def VisualizzaAlbum(request, pk):   
-    album = get_object_or_404(Album, pk=pk)
+    # Album e artista in join, brani e stili precaricati: tre query in tutto
+    album = get_object_or_404(Album.objects.with_detail(), pk=pk)
     artista = album.artista_appartenenza
-    # Usa la relazione inversa per ottenere i brani
-    brani_album = album.brani.all().order_by("sezione", "progressivo")
+    brani_album = album.brani.all()
     
-    context = {"album": album, "artista": artista, "brani_album": brani_album}
+    context = {"album": album, "artista": artista, "brani_album": brani_album, "stili": album.stili.all()}
     
     return render(request, "music/singolo_album.html", context)
 
@@ -124,109 +138,47 @@ def ascolta_brano(request, pk):
     return redirect(url)
 
 
-def _link_callback(uri, rel):
-    """
-    Converte URL static/media in percorsi file assoluti per xhtml2pdf.
-    """
-    if uri.startswith(settings.MEDIA_URL):
-        path = os.path.join(settings.MEDIA_ROOT, uri.replace(settings.MEDIA_URL, ""))
-    elif uri.startswith(settings.STATIC_URL):
-        static_root = getattr(settings, "STATIC_ROOT", None) or os.path.join(settings.BASE_DIR, "static")
-        path = os.path.join(static_root, uri.replace(settings.STATIC_URL, ""))
-    else:
-        return uri
-    return path
-
-
 def report_artisti_pdf(request):
     """
-    Produce un PDF con:
-    - Elenco Artisti
-    - Per ogni artista: album in ordine di data_rilascio, con copertina, etichetta (editore) e catalogo
+    PDF con elenco artisti e album (vedi music/services/report_pdf.py).
     Accesso non ristretto (solo lettura).
+
+    La generazione gira in background: se l'ultimo PDF corrisponde al catalogo
+    attuale (catalogue_version()) viene servito subito, altrimenti si accoda un
+    job (uno solo per versione) e si mostra una pagina che si ricarica finché è
+    pronto. Dopo un job fallito se ne accoda uno nuovo e si mostra l'errore.
     """
-    try:
-        from xhtml2pdf import pisa
-    except ImportError:
-        return HttpResponse("PDF non disponibile: installare xhtml2pdf.", status=500)
-
-    # Include "Classica" in coda, poi ordina per genere (Z->A), artista, supporto, anno, titolo
-    albums_ordered = (
-        Album.objects.all()
-        .annotate(
-            classica_in_coda=Case(
-                When(genere__iexact="Classica", then=1),
-                default=0,
-                output_field=IntegerField(),
-            )
-        )
-        .order_by(
-            "classica_in_coda",
-            "-genere",
-            "artista_appartenenza__nome_artista",
-            "supporto",
-            "data_rilascio",
-            "titolo_album",
-        )
-    )
-    artisti = Artista.objects.all().prefetch_related(
-        Prefetch("albums", queryset=albums_ordered),
-        "albums__stili",
-    ).order_by("nome_artista")
-    
-    # Calcola statistiche totali
-    total_artisti = Artista.objects.count()
-    total_albums = Album.objects.exclude(genere__iexact="Classica").count()
-    
-    # ordina gli album per data_rilascio discendente a livello di template
-    html = render_to_string(
-        "music/report_artisti_albums.html",
-        {
-            "artisti": artisti,
-            "MEDIA_URL": settings.MEDIA_URL,
-            "total_artisti": total_artisti,
-            "total_albums": total_albums,
-        },
-    )
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = 'inline; filename="artisti_albums.pdf"'
-    pisa_status = pisa.CreatePDF(html, dest=response, link_callback=_link_callback, encoding="utf-8")
-    if pisa_status.err:
-        return HttpResponse("Errore nella generazione del PDF", status=500)
-    return response
+    chiave = f"{tasks.REPORT_ARTISTI_PDF}:{catalogue_version()}"
+    ultimo = Job.objects.filter(nome=tasks.REPORT_ARTISTI_PDF, chiave=chiave).order_by("-creato_il").first()
+    if ultimo is not None and ultimo.stato == Job.STATO_COMPLETATO and ultimo.file:
+        return FileResponse(ultimo.file.open("rb"), content_type="application/pdf", filename="artisti_albums.pdf")
+    fallito = ultimo if ultimo is not None and ultimo.stato == Job.STATO_FALLITO else None
+    job = enqueue(tasks.REPORT_ARTISTI_PDF, chiave=chiave, priorita=Job.PRIORITA_ALTA, utente=request.user)
+    return render(request, "music/report_in_preparazione.html", {"job": job, "fallito": fallito}, status=202)
 
 @login_required
 @user_passes_test(lambda u: u.is_staff)
 def importa_brani_album(request, pk):
-    album = get_object_or_404(Album, pk=pk)
+    album = get_object_or_404(Album.objects.select_related("artista_appartenenza"), pk=pk)
     artista = album.artista_appartenenza
     release_mbid = request.GET.get("release_mbid") or request.POST.get("release_mbid")
+    # Release già abbinata: lookup diretto per MBID, senza ricerca (?cerca=1 per cambiarla)
+    if not release_mbid and request.GET.get("cerca") != "1":
+        release_mbid = album.mb_release_id or None
     release_date = album.data_rilascio.isoformat() if album.data_rilascio else None
 
     if request.method == "POST" and release_mbid:
-        skip_existing = request.POST.get("skip_existing") == "on"
-        update_existing = request.POST.get("update_existing") == "on"
-        try:
-            tracks = get_release_tracks(release_mbid)
-        except MusicBrainzError as exc:
-            messages.error(request, str(exc))
-            return redirect("importa_brani_album", pk=album.pk)
-
-        if not tracks:
-            messages.warning(request, "Nessun brano trovato per la release selezionata.")
-            return redirect("importa_brani_album", pk=album.pk)
-
-        result = import_tracks_for_album(
-            album,
-            tracks,
-            skip_existing=skip_existing,
-            update_existing=update_existing,
-        )
-        messages.success(
-            request,
-            f"Import completato: {result.created} creati, "
-            f"{result.updated} aggiornati, {result.skipped} saltati.",
+        # Lettura della release e import in background (task importa_brani_album)
+        job = enqueue(
+            tasks.IMPORTA_BRANI_ALBUM,
+            chiave=f"{tasks.IMPORTA_BRANI_ALBUM}:{album.pk}:{release_mbid}",
+            utente=request.user,
+            album_id=album.pk,
+            release_mbid=release_mbid,
+            skip_existing=request.POST.get("skip_existing") == "on",
+            update_existing=request.POST.get("update_existing") == "on",
         )
+        messages.info(request, tasks.import_accodato_message(job))
         return redirect("album_view", pk=album.pk)
 
     releases = []
@@ -235,16 +187,15 @@ def importa_brani_album(request, pk):
     api_error = None
 
     try:
-        releases = search_releases(
-            artista.nome_artista,
-            album.titolo_album,
-            release_date,
-        )
         if release_mbid:
-            tracks = get_release_tracks(release_mbid)
-            selected_release = next(
-                (candidate for candidate in releases if candidate.mbid == release_mbid),
-                None,
+            detail = get_release(release_mbid)
+            tracks = detail.tracks
+            selected_release = detail.release
+        else:
+            releases = search_releases(
+                artista.nome_artista,
+                album.titolo_album,
+                release_date,
             )
     except MusicBrainzError as exc:
         api_error = str(exc)
@@ -278,6 +229,7 @@ def crea_brano(request, pk):
             brano = form.save(commit=False)
             brano.album_appartenenza = album
             brano.save()
+            refresh_album_stats(album)
             messages.success(request, f'Brano "{brano.titolo_brano}" aggiunto con successo!')
             return HttpResponseRedirect(album.get_absolute_url())
     else:
@@ -291,6 +243,11 @@ class ModificaBrano(StaffMixing, UpdateView):
     model = Brano
     form_class = BranoModelForm
     template_name = "music/modifica_brano.html"
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        refresh_album_stats(self.object.album_appartenenza)
+        return response
     
     def get_success_url(self):
         messages.success(self.request, f'Brano "{self.object.titolo_brano}" modificato con successo!')
@@ -305,6 +262,12 @@ class ModificaBrano(StaffMixing, UpdateView):
 class EliminaBrano(StaffMixing, DeleteView):
     model = Brano
     template_name = "music/elimina_brano.html"
+
+    def form_valid(self, form):
+        album = self.object.album_appartenenza
+        response = super().form_valid(form)
+        refresh_album_stats(album)
+        return response
     
     def get_success_url(self):
         messages.success(self.request, f'Brano "{self.object.titolo_brano}" eliminato con successo!')
@@ -337,6 +300,39 @@ class EliminaAlbum(StaffMixing, DeleteView):
         return self.object.artista_appartenenza.get_absolute_url()
 
 
+class StatisticheCollezione(StaffMixing, TemplateView):
+    """Statistiche della collezione lette dal riepilogo materializzato (refresh_collection_stats)."""
+    template_name = "music/statistiche_collezione.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(load_collection_stats())
+        return context
+
+
+class ListaJob(StaffMixing, ListView):
+    """Stato dei job in background (report, import, caricamento immagini), filtrabile per stato."""
+    model = Job
+    template_name = "music/lista_job.html"
+    context_object_name = "jobs"
+    paginate_by = 50
+
+    def get_queryset(self):
+        jobs = Job.objects.select_related("creato_da").defer("errore", "risultato").order_by("-creato_il", "-pk")
+        stato = self.request.GET.get("stato")
+        if stato in dict(Job.STATO_CHOICES):
+            jobs = jobs.filter(stato=stato)
+        return jobs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        conteggi = dict(Job.objects.order_by().values_list("stato").annotate(totale=Count("pk")))
+        context["stati"] = [(stato, label, conteggi.get(stato, 0)) for stato, label in Job.STATO_CHOICES]
+        context["stato"] = self.request.GET.get("stato", "")
+        context["attivi"] = conteggi.get(Job.STATO_IN_CODA, 0) + conteggi.get(Job.STATO_IN_ESECUZIONE, 0)
+        return context
+
+
 class ListaAlbumDesiderati(ListView):
     model = AlbumDesiderato
     template_name = "music/album_desiderati.html"
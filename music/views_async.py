@@ -0,0 +1,95 @@
+"""
+Versioni asincrone delle viste che attendono servizi esterni (MusicBrainz,
+Bandcamp, YouTube). Sotto ASGI l'attesa non occupa un thread: pochi worker
+servono molte ricerche concorrenti. Si attivano con ASYNC_LOOKUP_VIEWS = True
+(vedi music/urls.py); il comportamento è lo stesso delle viste in views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import tasks
+from .models import Album, Brano
+from .services.jobs import enqueue
+from .services.listening import aresolve_listen_url
+from .services.musicbrainz import (
+    MusicBrainzError,
+    aget_release,
+    asearch_releases,
+)
+
+
+async def ascolta_brano(request, pk):
+    brano = await aget_object_or_404(
+        Brano.objects.select_related("album_appartenenza__artista_appartenenza"),
+        pk=pk,
+    )
+    refresh = request.GET.get("refresh") == "1"
+    url, _fonte, _from_cache = await aresolve_listen_url(brano, refresh=refresh)
+    return redirect(url)
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+async def importa_brani_album(request, pk):
+    album = await aget_object_or_404(
+        Album.objects.select_related("artista_appartenenza"),
+        pk=pk,
+    )
+    artista = album.artista_appartenenza
+    release_mbid = request.GET.get("release_mbid") or request.POST.get("release_mbid")
+    if not release_mbid and request.GET.get("cerca") != "1":
+        release_mbid = album.mb_release_id or None
+    release_date = album.data_rilascio.isoformat() if album.data_rilascio else None
+
+    if request.method == "POST" and release_mbid:
+        job = await sync_to_async(enqueue)(
+            tasks.IMPORTA_BRANI_ALBUM,
+            chiave=f"{tasks.IMPORTA_BRANI_ALBUM}:{album.pk}:{release_mbid}",
+            utente=await request.auser(),
+            album_id=album.pk,
+            release_mbid=release_mbid,
+            skip_existing=request.POST.get("skip_existing") == "on",
+            update_existing=request.POST.get("update_existing") == "on",
+        )
+        messages.info(request, tasks.import_accodato_message(job))
+        return redirect("album_view", pk=album.pk)
+
+    releases = []
+    tracks = []
+    selected_release = None
+    api_error = None
+
+    try:
+        if release_mbid:
+            detail = await aget_release(release_mbid)
+            tracks = detail.tracks
+            selected_release = detail.release
+        else:
+            releases = await asearch_releases(
+                artista.nome_artista,
+                album.titolo_album,
+                release_date,
+            )
+    except MusicBrainzError as exc:
+        api_error = str(exc)
+
+    existing_titles = {
+        title.lower()
+        async for title in album.brani.values_list("titolo_brano", flat=True)
+    }
+
+    context = {
+        "album": album,
+        "artista": artista,
+        "releases": releases,
+        "tracks": tracks,
+        "selected_release": selected_release,
+        "release_mbid": release_mbid,
+        "api_error": api_error,
+        "existing_titles": existing_titles,
+        "existing_count": await album.brani.acount(),
+    }
+    # Il template usa request.user e la sessione (accessi sincroni al database)
+    return await sync_to_async(render)(request, "music/importa_brani_album.html", context)